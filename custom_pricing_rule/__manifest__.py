@@ -7,7 +7,10 @@
     'category': 'Sales',
     'depends': ['base', 'sale', 'product', 'product_brand'],  # Dependencias necesarias
     'data': [
-        'views/product_pricelist_items_views.xml'
+        'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
+        'views/product_pricelist_items_views.xml',
+        'views/product_pricelist_price_views.xml',
     ],
     'installable': True,
     'application': False,
@@ -1,2 +1,4 @@
 from . import product_pricelist_item
 from . import product_pricelist
+from . import product_pricelist_price
+from . import product
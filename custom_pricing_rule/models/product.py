@@ -0,0 +1,86 @@
+from odoo import api, models
+from odoo.osv import expression
+
+from .product_pricelist_price import TEMPLATE_PRICE_FIELDS, VARIANT_PRICE_FIELDS
+
+
+class RuleTargetMixin(models.AbstractModel):
+    """Records referenced by pricelist items: deleting them changes items at the
+    database level (cascade / set null) without going through their ORM methods."""
+    _name = 'custom.pricing.rule.target.mixin'
+    _description = 'Pricelist Rule Target'
+
+    def _get_rule_target_domain(self):
+        """Domain of the pricelist items that target the records of ``self``
+        (none by default, each model using the mixin narrows it)."""
+        return expression.FALSE_DOMAIN
+
+    def unlink(self):
+        items = self.env['product.pricelist.item'].sudo().with_context(active_test=False).search(
+            self._get_rule_target_domain())
+        pricelists = items.pricelist_id
+        res = super().unlink()
+        pricelists._invalidate_rule_index()
+        return res
+
+
+class ProductTemplate(models.Model):
+    _name = 'product.template'
+    _inherit = ['product.template', 'custom.pricing.rule.target.mixin']
+
+    def _get_rule_target_domain(self):
+        # Variants go away with their template.
+        return ['|', ('product_tmpl_id', 'in', self.ids), ('product_id.product_tmpl_id', 'in', self.ids)]
+
+    def write(self, vals):
+        res = super().write(vals)
+        if TEMPLATE_PRICE_FIELDS & set(vals):
+            self.env['product.pricelist.price']._mark_products_dirty(
+                self.with_context(active_test=False).product_variant_ids.ids)
+        return res
+
+
+class ProductProduct(models.Model):
+    _name = 'product.product'
+    _inherit = ['product.product', 'custom.pricing.rule.target.mixin']
+
+    def _get_rule_target_domain(self):
+        return [('product_id', 'in', self.ids)]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        products = super().create(vals_list)
+        pricelists = self.env['product.pricelist'].sudo().search([('materialize_prices', '=', True)])
+        self.env['product.pricelist.price']._add_products(pricelists, products)
+        return products
+
+    def write(self, vals):
+        res = super().write(vals)
+        if VARIANT_PRICE_FIELDS & set(vals):
+            self.env['product.pricelist.price']._mark_products_dirty(self.ids)
+        return res
+
+
+class ProductCategory(models.Model):
+    _name = 'product.category'
+    _inherit = ['product.category', 'custom.pricing.rule.target.mixin']
+
+    def _get_rule_target_domain(self):
+        # Subcategories are deleted in cascade.
+        return [('categ_id', 'child_of', self.ids)]
+
+
+class ProductBrand(models.Model):
+    _name = 'product.brand'
+    _inherit = ['product.brand', 'custom.pricing.rule.target.mixin']
+
+    def _get_rule_target_domain(self):
+        return [('apply_brand', 'in', self.ids)]
+
+
+class ProductTag(models.Model):
+    _name = 'product.tag'
+    _inherit = ['product.tag', 'custom.pricing.rule.target.mixin']
+
+    def _get_rule_target_domain(self):
+        return [('apply_tag', 'in', self.ids)]
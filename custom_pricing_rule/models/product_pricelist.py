@@ -1,9 +1,63 @@
-from odoo import fields, models, api
+from collections import defaultdict
+
+from odoo import fields, models, api, tools
+
+# (bucket field, item field) pairs used to key the rule index.
+INDEX_KEYS = (
+    ('categ', 'categ_id'),
+    ('brand', 'apply_brand'),
+    ('country', 'apply_origin_country'),
+    ('tag', 'apply_tag'),
+    ('template', 'product_tmpl_id'),
+    ('variant', 'product_id'),
+)
+# Item fields the rule index depends on: the indexed targets, the date filters
+# and the ``_order`` of the items (``min_quantity``).
+RULE_INDEX_FIELDS = frozenset(field for _key, field in INDEX_KEYS) | {
+    'applied_on', 'min_quantity', 'date_start', 'date_end', 'pricelist_id',
+}
 
 
 class Pricelist(models.Model):
     _inherit = "product.pricelist"
 
+    materialize_prices = fields.Boolean(
+        string="Materialized Prices",
+        help="Keep a precomputed price per product for this pricelist, refreshed "
+             "incrementally when its rules or the products change.")
+    price_table_ids = fields.One2many('product.pricelist.price', 'pricelist_id', string="Materialized Prices")
+    price_table_date = fields.Datetime(string="Price Table Checked On", readonly=True, copy=False)
+    rule_index_version = fields.Integer(readonly=True, copy=False, default=0)
+
+    def init(self):
+        super().init()
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS product_pricelist_rule_index_seq")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        pricelists = super().create(vals_list)
+        self.env['product.pricelist.price']._add_products(pricelists.filtered('materialize_prices'))
+        return pricelists
+
+    def write(self, values):
+        res = super().write(values)
+        if 'materialize_prices' in values:
+            if values['materialize_prices']:
+                self.env['product.pricelist.price']._add_products(self)
+            else:
+                self.price_table_ids.sudo().unlink()
+        if 'currency_id' in values or 'company_id' in values:
+            self.env['product.pricelist.price']._mark_dirty(self)
+        return res
+
+    def _get_materialized_prices(self, products):
+        """``{product id: (price, rule id)}`` for unit quantity, read from the
+        price table when the pricelist is materialized."""
+        self.ensure_one()
+        if not self.materialize_prices:
+            return self._compute_price_rule(products, 1.0)
+        return self.env['product.pricelist.price']._get_prices(self, products)
+
     def _get_applicable_rules_domain(self, products, date, **kwargs):
         self and self.ensure_one()  # self is at most one record
         if products._name == 'product.template':
@@ -24,3 +78,137 @@ class Pricelist(models.Model):
             '|', ('date_start', '=', False), ('date_start', '<=', date),
             '|', ('date_end', '=', False), ('date_end', '>=', date),
         ]
+
+    def _invalidate_rule_index(self):
+        """Give the pricelists of ``self`` a new rule index version, so that every
+        worker rebuilds their index on next use while other pricelists keep theirs.
+
+        Versions come from a sequence: they are never reused, even when the
+        transaction that took one (and may have cached an index for it) rolls back.
+        """
+        if not self:
+            return
+        self.env.cr.execute("""
+            UPDATE product_pricelist
+               SET rule_index_version = nextval('product_pricelist_rule_index_seq')
+             WHERE id IN %s
+        """, [tuple(self.ids)])
+        self.invalidate_recordset(['rule_index_version'])
+
+    def _use_rule_index(self):
+        """The index can be disabled with the ``pricelist_rule_index`` context key
+        or the ``custom_pricing_rule.rule_index`` system parameter."""
+        if 'pricelist_rule_index' in self.env.context:
+            return bool(self.env.context['pricelist_rule_index'])
+        param = self.env['ir.config_parameter'].sudo().get_param('custom_pricing_rule.rule_index', 'True')
+        return param.lower() not in ('0', 'false')
+
+    def _get_applicable_rules(self, products, date, **kwargs):
+        self and self.ensure_one()  # self is at most one record
+        if not self or not products or not self._use_rule_index():
+            return super()._get_applicable_rules(products, date, **kwargs)
+
+        rows, buckets = self._get_rule_index(self.id)
+        if not rows:
+            return self.env['product.pricelist.item']
+
+        # Same semantics as _get_applicable_rules_domain: each attribute is
+        # matched against the union of the products' values.
+        if products._name == 'product.template':
+            template_ids = set(products.ids)
+            variant_ids = None
+        else:
+            template_ids = set(products.product_tmpl_id.ids)
+            variant_ids = set(products.ids)
+        values = {
+            'categ': {int(categ_id) for path in products.categ_id.mapped('parent_path') for categ_id in path.split('/')[:-1]},
+            'brand': set(products.product_brand_id.ids),
+            'country': set(products.country_of_origin.ids),
+            'tag': set(products.product_tag_ids.ids),
+            'template': template_ids,
+            'variant': variant_ids,
+        }
+        date = fields.Datetime.to_datetime(date) if date else fields.Datetime.now()
+
+        positions = set()
+        for bucket in buckets.values():
+            positions.update(bucket.get(None, ()))
+        for key, bucket_values in values.items():
+            bucket = buckets[key]
+            if key == 'variant' and bucket_values is None:
+                # Template pricing: variant rules match through their template.
+                for position in bucket.get('__all__', ()):
+                    if rows[position]['variant_template'] in template_ids:
+                        positions.add(position)
+                continue
+            for value in bucket_values:
+                positions.update(bucket.get(value, ()))
+
+        rule_ids = []
+        for position in sorted(positions):
+            row = rows[position]
+            if row['date_start'] and row['date_start'] > date:
+                continue
+            if row['date_end'] and row['date_end'] < date:
+                continue
+            if any(row[key] and row[key] not in values[key] for key in ('categ', 'brand', 'country', 'tag', 'template')):
+                continue
+            if row['variant']:
+                if variant_ids is None and row['variant_template'] not in template_ids:
+                    continue
+                if variant_ids is not None and row['variant'] not in variant_ids:
+                    continue
+            rule_ids.append(row['id'])
+        return self.env['product.pricelist.item'].browse(rule_ids)
+
+    def _get_product_rules(self, products, date=None, qty_in_product_uom=1.0):
+        """First applicable rule per product, as ``_compute_price_rule`` would pick it.
+
+        :returns: ``{product id: product.pricelist.item}``; products falling back
+            to the list price are omitted
+        """
+        self and self.ensure_one()  # self is at most one record
+        rules = self._get_applicable_rules(products, date or fields.Datetime.now())
+        return rules._get_first_applicable_rules(products, qty_in_product_uom)
+
+    @api.model
+    def _get_rule_index(self, pricelist_id):
+        """Rules of the pricelist in ``_order``, bucketed by the record each one targets.
+
+        Returns ``(rows, buckets)``: ``rows`` is the ordered tuple of rule
+        attributes and ``buckets`` maps each attribute to ``{value: positions}``,
+        where the ``None`` key holds the rules that don't restrict it.
+        Cached per ``rule_index_version``, see ``_invalidate_rule_index``.
+        """
+        version = self.browse(pricelist_id).sudo().rule_index_version
+        return self._build_rule_index(pricelist_id, version)
+
+    @api.model
+    @tools.ormcache('pricelist_id', 'version')
+    def _build_rule_index(self, pricelist_id, version):
+        # Entries of previous versions are never hit again and age out of the LRU.
+        items = self.env['product.pricelist.item'].sudo().with_context(active_test=False).search([
+            ('pricelist_id', '=', pricelist_id),
+        ])
+        rows = []
+        buckets = {key: defaultdict(list) for key, _field in INDEX_KEYS}
+        for position, item in enumerate(items):
+            row = {key: item[field].id or False for key, field in INDEX_KEYS}
+            row.update(
+                id=item.id,
+                variant_template=item.product_id.product_tmpl_id.id,
+                date_start=item.date_start,
+                date_end=item.date_end,
+            )
+            rows.append(row)
+            for key, _field in INDEX_KEYS:
+                buckets[key][row[key] or None].append(position)
+            if row['variant']:
+                buckets['variant']['__all__'].append(position)
+        # A rule restricted on several attributes is reachable from any of them;
+        # the unrestricted bucket only needs rules restricted on none.
+        restricted = {position for key, bucket in buckets.items() for value, bucket_positions in bucket.items()
+                      if value is not None for position in bucket_positions}
+        for key in buckets:
+            buckets[key][None] = [p for p in buckets[key][None] if p not in restricted]
+        return tuple(rows), {key: {value: tuple(p) for value, p in bucket.items()} for key, bucket in buckets.items()}
@@ -1,7 +1,11 @@
+from collections import defaultdict
+
 from odoo import fields, models, api, _
 from odoo.exceptions import ValidationError
 from odoo.tools import format_datetime, formatLang
 
+from .product_pricelist import RULE_INDEX_FIELDS
+
 
 class ProductPricelistItem(models.Model):
     _inherit = 'product.pricelist.item'
@@ -58,7 +62,10 @@ class ProductPricelistItem(models.Model):
                     values.update(dict(product_id=None, product_tmpl_id=None, categ_id=None, apply_brand=None, apply_tag=None))
                 elif applied_on == '6_product_tag':
                     values.update(dict(product_id=None, product_tmpl_id=None, categ_id=None, apply_brand=None, apply_origin_country=None))
-        return super().create(vals_list)
+        items = super().create(vals_list)
+        items._invalidate_rule_index()
+        items._mark_price_table_dirty()
+        return items
 
     def write(self, values):
         if values.get('applied_on', False):
@@ -84,7 +91,50 @@ class ProductPricelistItem(models.Model):
             elif applied_on == '6_product_tag':
                 values.update(dict(product_id=None, product_tmpl_id=None, categ_id=None, apply_brand=None,
                                    apply_origin_country=None))
-        return super().write(values)
+        self._mark_price_table_dirty()
+        pricelists = self.pricelist_id
+        res = super().write(values)
+        # Prices and labels are read from the rules themselves, not from the index
+        if RULE_INDEX_FIELDS & set(values):
+            (pricelists | self.pricelist_id).sudo()._invalidate_rule_index()
+        self._mark_price_table_dirty()
+        return res
+
+    def unlink(self):
+        self._mark_price_table_dirty()
+        pricelists = self.pricelist_id
+        res = super().unlink()
+        pricelists.sudo()._invalidate_rule_index()
+        return res
+
+    def _get_price_table_product_domain(self):
+        """Domain of the products whose price can be affected by the rule
+        (``None`` for every product)."""
+        self.ensure_one()
+        if self.applied_on == "0_product_variant":
+            return [('id', '=', self.product_id.id)]
+        elif self.applied_on == "1_product":
+            return [('product_tmpl_id', '=', self.product_tmpl_id.id)]
+        elif self.applied_on == "2_product_category":
+            return [('categ_id', 'child_of', self.categ_id.ids)]
+        elif self.applied_on == "4_product_brand":
+            return [('product_brand_id', '=', self.apply_brand.id)]
+        elif self.applied_on == "5_product_origin_country":
+            return [('country_of_origin', '=', self.apply_origin_country.id)]
+        elif self.applied_on == "6_product_tag":
+            return [('product_tag_ids', 'in', self.apply_tag.ids)]
+        return None
+
+    def _mark_price_table_dirty(self):
+        """Flag the materialized prices the rules in ``self`` can affect."""
+        PriceTable = self.env['product.pricelist.price']
+        for item in self.filtered('pricelist_id'):
+            PriceTable._mark_dirty(item.pricelist_id, product_domain=item._get_price_table_product_domain())
+
+    def _invalidate_rule_index(self):
+        """Drop the cached rule indexes of the pricelists of ``self``
+        (see ``product.pricelist._get_rule_index``)."""
+        self.pricelist_id.sudo()._invalidate_rule_index()
 
     def _is_applicable_for(self, product, qty_in_product_uom):
         """Check whether the current rule is valid for the given product & qty.
@@ -138,12 +188,69 @@ class ProductPricelistItem(models.Model):
 
         return res
 
+    def _get_first_applicable_rules(self, products, qty_in_product_uom=1.0):
+        """Batch counterpart of :meth:`_is_applicable_for`.
 
+        Product and rule attributes are read once for the whole sets, rules are
+        bucketed by what they target and each product only looks at the
+        buckets matching its own attributes.
 
+        :param products: product.product or product.template recordset
+        :param float qty_in_product_uom: quantity, expressed in product UoM
+        :returns: ``{product id: first rule of self, in self's order, that is
+            applicable to the product}``; products without rule are omitted
+        :rtype: dict
+        """
+        buckets = defaultdict(list)
+        min_quantities = []
+        for position, rule in enumerate(self):
+            min_quantities.append(rule.min_quantity)
+            if rule.applied_on == "2_product_category":
+                key = rule.categ_id and ('categ', rule.categ_id.id)
+            elif rule.applied_on == "4_product_brand":
+                key = ('brand', rule.apply_brand.id)
+            elif rule.applied_on == "5_product_origin_country":
+                key = ('country', rule.apply_origin_country.id)
+            elif rule.applied_on == "6_product_tag":
+                key = rule.apply_tag and ('tag', rule.apply_tag.id)
+            elif rule.applied_on == "1_product":
+                key = rule.product_tmpl_id and ('template', rule.product_tmpl_id.id)
+            elif rule.applied_on == "0_product_variant":
+                key = rule.product_id and ('variant', rule.product_id.id)
+            else:
+                key = ('global', None)
+            if key:
+                buckets[key].append(position)
 
+        is_product_template = products._name == 'product.template'
+        rules = list(self)
+        result = {}
+        for product in products:
+            if is_product_template:
+                template_id = product.id
+                # product self acceptable on template if has only one variant
+                variant_id = product.product_variant_count == 1 and product.product_variant_id.id
+            else:
+                template_id = product.product_tmpl_id.id
+                variant_id = product.id
+            keys = [
+                ('global', None),
+                ('brand', product.product_brand_id.id),
+                ('country', product.country_of_origin.id),
+                ('template', template_id),
+                ('variant', variant_id),
+            ]
+            keys += [('categ', int(categ_id)) for categ_id in (product.categ_id.parent_path or '').split('/')[:-1]]
+            keys += [('tag', tag_id) for tag_id in product.product_tag_ids.ids]
 
-
-
-
-
-
+            first = None
+            for key in keys:
+                for position in buckets.get(key, ()):
+                    if first is not None and position >= first:
+                        break
+                    if not min_quantities[position] or qty_in_product_uom >= min_quantities[position]:
+                        first = position
+                        break
+            if first is not None:
+                result[product.id] = rules[first]
+        return result
@@ -0,0 +1,154 @@
+from psycopg2.extras import execute_values
+
+from odoo import fields, models, api
+
+# Product fields the computed price depends on, besides the pricelist rules.
+TEMPLATE_PRICE_FIELDS = {
+    'categ_id', 'product_brand_id', 'country_of_origin', 'product_tag_ids',
+    'list_price', 'standard_price', 'uom_id', 'currency_id', 'company_id',
+}
+VARIANT_PRICE_FIELDS = {
+    'product_tag_ids', 'additional_product_tag_ids', 'standard_price', 'lst_price',
+    'product_template_attribute_value_ids',
+}
+
+
+class ProductPricelistPrice(models.Model):
+    """Materialized price of a product in a pricelist, for unit quantity.
+
+    Rows are flagged ``dirty`` when a rule or a product attribute they depend
+    on changes, and recomputed by the refresh cron or when they are read.
+    """
+    _name = 'product.pricelist.price'
+    _description = 'Materialized Pricelist Price'
+    _order = 'pricelist_id, product_id'
+
+    pricelist_id = fields.Many2one('product.pricelist', string="Pricelist", required=True, ondelete='cascade', index=True)
+    product_id = fields.Many2one('product.product', string="Product", required=True, ondelete='cascade', index=True)
+    rule_id = fields.Many2one('product.pricelist.item', string="Rule", ondelete='set null')
+    currency_id = fields.Many2one(related='pricelist_id.currency_id')
+    price = fields.Monetary(string="Price", currency_field='currency_id')
+    dirty = fields.Boolean(string="To Recompute", default=True, index=True)
+
+    _sql_constraints = [
+        ('pricelist_product_uniq', 'unique(pricelist_id, product_id)', "A product can only have one price per pricelist."),
+    ]
+
+    @api.model
+    def _get_dependent_pricelists(self, pricelists):
+        """Materialized pricelists whose prices derive from ``pricelists``
+        (themselves or through rules based on them, recursively)."""
+        result = pricelists
+        todo = pricelists
+        while todo:
+            todo = self.env['product.pricelist.item'].sudo().search([
+                ('base', '=', 'pricelist'), ('base_pricelist_id', 'in', todo.ids),
+            ]).pricelist_id - result
+            result |= todo
+        return result.filtered('materialize_prices')
+
+    @api.model
+    def _mark_dirty(self, pricelists, product_domain=None, product_ids=None):
+        """Flag the rows of ``pricelists`` (and the pricelists based on them) for
+        the products matching ``product_domain`` or ``product_ids`` (all if both
+        are ``None``)."""
+        pricelists = self._get_dependent_pricelists(pricelists)
+        if not pricelists:
+            return
+        domain = [('pricelist_id', 'in', pricelists.ids), ('dirty', '=', False)]
+        if product_ids is not None:
+            domain.append(('product_id', 'in', list(product_ids)))
+        elif product_domain:
+            products = self.env['product.product'].with_context(active_test=False)._search(product_domain)
+            domain.append(('product_id', 'in', products))
+        self.sudo().search(domain).write({'dirty': True})
+
+    @api.model
+    def _mark_products_dirty(self, product_ids):
+        """Flag every materialized price of the given products."""
+        pricelists = self.env['product.pricelist'].sudo().search([('materialize_prices', '=', True)])
+        if pricelists and product_ids:
+            self._mark_dirty(pricelists, product_ids=product_ids)
+
+    @api.model
+    def _get_materialized_products_domain(self):
+        return [('sale_ok', '=', True)]
+
+    @api.model
+    def _add_products(self, pricelists, products=None):
+        """Create the missing (dirty) rows of ``pricelists`` for ``products``,
+        by default every product matching ``_get_materialized_products_domain``."""
+        if products is None:
+            products = self.env['product.product'].search(self._get_materialized_products_domain())
+        else:
+            products = products.filtered_domain(self._get_materialized_products_domain())
+        if not pricelists or not products:
+            return
+        self.env.cr.execute("""
+            INSERT INTO product_pricelist_price (pricelist_id, product_id, dirty, create_uid, create_date, write_uid, write_date)
+                 SELECT pl.id, pp.id, TRUE, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                   FROM unnest(%(pricelists)s) AS pl(id), unnest(%(products)s) AS pp(id)
+            ON CONFLICT (pricelist_id, product_id) DO NOTHING
+        """, {'uid': self.env.uid, 'pricelists': pricelists.ids, 'products': products.ids})
+        self.invalidate_model()
+
+    def _refresh(self):
+        """Recompute the price and rule of the rows in ``self``, one
+        ``_compute_price_rule`` call per pricelist."""
+        values = []
+        for pricelist in self.pricelist_id:
+            rows = self.filtered(lambda row: row.pricelist_id == pricelist)
+            results = pricelist._compute_price_rule(rows.product_id, 1.0)
+            values += [
+                (row.id, results[row.product_id.id][0], results[row.product_id.id][1] or None)
+                for row in rows
+            ]
+        if not values:
+            return
+        self.flush_model()
+        execute_values(self.env.cr._obj, """
+            UPDATE product_pricelist_price AS row
+               SET price = data.price::numeric, rule_id = data.rule_id::integer, dirty = FALSE,
+                   write_date = NOW() AT TIME ZONE 'UTC'
+              FROM (VALUES %s) AS data(id, price, rule_id)
+             WHERE row.id = data.id
+        """, values, page_size=1000)
+        self.invalidate_model(['price', 'rule_id', 'dirty', 'write_date'])
+
+    @api.model
+    def _get_prices(self, pricelist, products):
+        """Materialized ``{product id: (price, rule id)}``, recomputing the dirty
+        or missing rows first. Products outside the materialized scope are
+        computed on the fly."""
+        pricelist.ensure_one()
+        rows = self.search([('pricelist_id', '=', pricelist.id), ('product_id', 'in', products.ids)])
+        missing = products - rows.product_id
+        if missing:
+            self._add_products(pricelist, missing)
+            rows = self.search([('pricelist_id', '=', pricelist.id), ('product_id', 'in', products.ids)])
+        rows.filtered('dirty')._refresh()
+        result = {row.product_id.id: (row.price, row.rule_id.id) for row in rows}
+        outside = products.filtered(lambda product: product.id not in result)
+        if outside:
+            result.update(pricelist._compute_price_rule(outside, 1.0))
+        return result
+
+    @api.model
+    def _cron_refresh(self, batch_size=5000):
+        """Flag the rows whose rules entered or left their validity window since
+        the last run, then recompute the dirty rows in batches."""
+        now = fields.Datetime.now()
+        pricelists = self.env['product.pricelist'].search([('materialize_prices', '=', True)])
+        for pricelist in pricelists:
+            since = pricelist.price_table_date
+            if since:
+                items = pricelist.item_ids.filtered(lambda item: any(
+                    date and since < date <= now for date in (item.date_start, item.date_end)))
+                items._mark_price_table_dirty()
+            pricelist.price_table_date = now
+
+        while True:
+            rows = self.search([('dirty', '=', True)], limit=batch_size)
+            rows._refresh()
+            if len(rows) < batch_size:
+                break
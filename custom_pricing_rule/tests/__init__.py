@@ -0,0 +1,2 @@
+from . import test_pricing_rules
+from . import test_pricing_benchmark
@@ -0,0 +1,127 @@
+import os
+import random
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.base.tests.common import DISABLED_MAIL_CONTEXT
+
+APPLIED_ON = [
+    '3_global', '2_product_category', '1_product', '0_product_variant',
+    '4_product_brand', '5_product_origin_country', '6_product_tag',
+]
+
+
+def get_bench_scales(default='10000:100,50000:1000,200000:10000'):
+    """Catalog sizes to benchmark, as ``(products, rules)`` pairs.
+
+    Overridable with ``CUSTOM_PRICING_BENCH_SCALES``, e.g. ``"2000:50,10000:500"``.
+    """
+    scales = os.environ.get('CUSTOM_PRICING_BENCH_SCALES') or default
+    return [tuple(int(value) for value in scale.split(':')) for scale in scales.split(',') if scale]
+
+
+class PricingCatalogCase(TransactionCase):
+    """Builds reproducible synthetic catalogs and pricelists for the pricing tests."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, **DISABLED_MAIL_CONTEXT, tracking_disable=True))
+        cls.now = fields.Datetime.now()
+
+    @classmethod
+    def _create_catalog(cls, product_count, rule_count, seed=42, brand_count=50, tag_count=30, categ_count=40):
+        """Create ``product_count`` products spread over brands, tags, countries and a
+        category tree, and one pricelist with ``rule_count`` rules mixing every
+        ``applied_on`` kind, minimum quantities and validity windows."""
+        rng = random.Random(seed)
+        env = cls.env
+        brands = env['product.brand'].create([{'name': f'Bench Brand {i}'} for i in range(brand_count)])
+        tags = env['product.tag'].create([{'name': f'Bench Tag {i}'} for i in range(tag_count)])
+        countries = env['res.country'].search([], limit=20)
+
+        root = env['product.category'].create({'name': 'Bench Root'})
+        categories = root
+        for i in range(categ_count):
+            categories |= env['product.category'].create({
+                'name': f'Bench Categ {i}',
+                'parent_id': rng.choice(categories).id,
+            })
+
+        products = env['product.product']
+        for start in range(0, product_count, 1000):
+            products |= env['product.product'].create([{
+                'name': f'Bench Product {i}',
+                'default_code': f'BENCH-{seed}-{i}',
+                'list_price': rng.randint(10, 1000),
+                'categ_id': rng.choice(categories).id,
+                'product_brand_id': rng.choice(brands).id if rng.random() < 0.9 else False,
+                'country_of_origin': rng.choice(countries).id if rng.random() < 0.8 else False,
+                'product_tag_ids': [(6, 0, rng.sample(tags.ids, rng.randint(0, 3)))],
+            } for i in range(start, min(start + 1000, product_count))])
+
+        pricelist = env['product.pricelist'].create({'name': f'Bench Pricelist {seed}'})
+        one_day = timedelta(days=1)
+        item_vals = []
+        for _i in range(rule_count):
+            applied_on = rng.choice(APPLIED_ON)
+            product = rng.choice(products)
+            vals = {
+                'pricelist_id': pricelist.id,
+                'applied_on': applied_on,
+                'compute_price': 'percentage',
+                'percent_price': rng.randint(1, 50),
+                'min_quantity': rng.choice([0, 0, 0, 5, 10]),
+            }
+            if applied_on == '2_product_category':
+                vals['categ_id'] = rng.choice(categories).id
+            elif applied_on == '1_product':
+                vals['product_tmpl_id'] = product.product_tmpl_id.id
+            elif applied_on == '0_product_variant':
+                vals['product_id'] = product.id
+            elif applied_on == '4_product_brand':
+                vals['apply_brand'] = rng.choice(brands).id
+            elif applied_on == '5_product_origin_country':
+                vals['apply_origin_country'] = rng.choice(countries).id
+            elif applied_on == '6_product_tag':
+                vals['apply_tag'] = rng.choice(tags).id
+            window = rng.random()
+            if window < 0.1:
+                vals['date_end'] = cls.now - one_day  # expired
+            elif window < 0.2:
+                vals['date_start'] = cls.now + one_day  # not started
+            elif window < 0.3:
+                vals.update(date_start=cls.now - one_day, date_end=cls.now + one_day)
+            item_vals.append(vals)
+        env['product.pricelist.item'].create(item_vals)
+        return products, pricelist
+
+    def _reference_first_rule(self, pricelist, product, qty=1.0, date=None):
+        """First rule of ``pricelist`` for ``product`` following the stock semantics:
+        rules in ``_order``, restricted by dates, minimum quantity and target."""
+        date = date or self.now
+        for rule in pricelist.with_context(active_test=False).item_ids.sorted():
+            if rule.date_start and rule.date_start > date or rule.date_end and rule.date_end < date:
+                continue
+            if rule.min_quantity and qty < rule.min_quantity:
+                continue
+            applied_on = rule.applied_on
+            if applied_on == '2_product_category':
+                matches = rule.categ_id in product.categ_id.search([('id', 'parent_of', product.categ_id.id)])
+            elif applied_on == '1_product':
+                matches = rule.product_tmpl_id == product.product_tmpl_id
+            elif applied_on == '0_product_variant':
+                matches = rule.product_id == product
+            elif applied_on == '4_product_brand':
+                matches = rule.apply_brand == product.product_brand_id
+            elif applied_on == '5_product_origin_country':
+                matches = rule.apply_origin_country == product.country_of_origin
+            elif applied_on == '6_product_tag':
+                matches = rule.apply_tag in product.product_tag_ids
+            else:
+                matches = True
+            if matches:
+                return rule
+        return self.env['product.pricelist.item']
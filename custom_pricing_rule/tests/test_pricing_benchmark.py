@@ -0,0 +1,97 @@
+import contextlib
+import logging
+import time
+import tracemalloc
+
+from odoo.tests import tagged
+
+from .common import PricingCatalogCase, get_bench_scales
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', '-standard', 'pricing_benchmark')
+class TestPricingBenchmark(PricingCatalogCase):
+    """Pricing engine at catalog scale.
+
+    Not part of the standard run: ``--test-tags pricing_benchmark``, with the
+    sizes from ``CUSTOM_PRICING_BENCH_SCALES`` (see ``get_bench_scales``).
+    """
+
+    sample_size = 1000
+
+    @contextlib.contextmanager
+    def _measure(self, results, label):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.env.cr.sql_log_count
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[label] = {
+                'time': elapsed,
+                'queries': self.env.cr.sql_log_count - queries,
+                'memory': peak,
+            }
+
+    def _run_scale(self, product_count, rule_count):
+        products, pricelist = self._create_catalog(product_count, rule_count, seed=product_count + rule_count)
+        sample = products[:self.sample_size]
+        indexed = pricelist.with_context(pricelist_rule_index=True)
+        domain = pricelist.with_context(pricelist_rule_index=False)
+        results = {}
+
+        with self._measure(results, 'domain: price per product'):
+            expected = {product.id: domain._compute_price_rule(product, 1.0)[product.id] for product in sample}
+        indexed._get_rule_index(pricelist.id)  # build outside the measurement
+        with self._measure(results, 'index: price per product'):
+            prices = {product.id: indexed._compute_price_rule(product, 1.0)[product.id] for product in sample}
+        self.assertEqual(prices, expected)
+
+        with self._measure(results, 'domain: batch prices'):
+            expected = domain._compute_price_rule(sample, 1.0)
+        with self._measure(results, 'index: batch prices'):
+            prices = indexed._compute_price_rule(sample, 1.0)
+        self.assertEqual(prices, expected)
+
+        rules = domain._get_applicable_rules(sample, self.now)
+        with self._measure(results, 'per record: first rule'):
+            expected = {}
+            for product in sample:
+                rule = next((rule for rule in rules if rule._is_applicable_for(product, 1.0)), None)
+                if rule:
+                    expected[product.id] = rule
+        with self._measure(results, 'batch: first rule'):
+            matched = rules._get_first_applicable_rules(sample, 1.0)
+        self.assertEqual(matched, expected)
+
+        with self._measure(results, 'index: full catalog rules'):
+            indexed._get_product_rules(products)
+
+        for product in sample[:50]:
+            self.assertEqual(
+                matched.get(product.id, rules.browse()),
+                self._reference_first_rule(pricelist, product),
+                product.display_name,
+            )
+
+        self.assertLessEqual(results['index: price per product']['queries'], results['domain: price per product']['queries'])
+        self.assertLessEqual(results['index: batch prices']['queries'], results['domain: batch prices']['queries'])
+
+        _logger.info("Pricing benchmark: %s products, %s rules (sample of %s)", product_count, rule_count, len(sample))
+        for label, values in results.items():
+            _logger.info(
+                "  %-28s %9.3fs %7d queries %10.1f KiB",
+                label, values['time'], values['queries'], values['memory'] / 1024,
+            )
+        return results
+
+    def test_pricing_benchmark(self):
+        for product_count, rule_count in get_bench_scales():
+            with self.subTest(products=product_count, rules=rule_count):
+                self._run_scale(product_count, rule_count)
@@ -0,0 +1,120 @@
+from odoo.tests import tagged
+
+from .common import PricingCatalogCase
+
+
+@tagged('post_install', '-at_install')
+class TestPricingRules(PricingCatalogCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.products, cls.pricelist = cls._create_catalog(300, 150)
+
+    def _domain_rules(self, products):
+        return self.pricelist.with_context(pricelist_rule_index=False)._get_applicable_rules(products, self.now)
+
+    def _indexed_rules(self, products):
+        return self.pricelist.with_context(pricelist_rule_index=True)._get_applicable_rules(products, self.now)
+
+    def test_index_matches_domain(self):
+        for products in (self.products[:1], self.products[7:8], self.products[:50], self.products):
+            self.assertEqual(self._indexed_rules(products).ids, self._domain_rules(products).ids)
+        templates = self.products[:40].product_tmpl_id
+        self.assertEqual(self._indexed_rules(templates).ids, self._domain_rules(templates).ids)
+
+    def test_batch_matches_per_record(self):
+        for products in (self.products, self.products[:60].product_tmpl_id):
+            rules = self._domain_rules(products)
+            for qty in (1.0, 10.0):
+                batch = rules._get_first_applicable_rules(products, qty)
+                for product in products:
+                    expected = next((rule for rule in rules if rule._is_applicable_for(product, qty)), None)
+                    self.assertEqual(batch.get(product.id), expected, product.display_name)
+
+    def test_stock_semantics(self):
+        rules = self.pricelist._get_product_rules(self.products)
+        for product in self.products[:80]:
+            expected = self._reference_first_rule(self.pricelist, product)
+            self.assertEqual(rules.get(product.id, expected.browse()), expected, product.display_name)
+
+    def test_compute_price_rule_index_vs_domain(self):
+        products = self.products[:100]
+        indexed = self.pricelist.with_context(pricelist_rule_index=True)._compute_price_rule(products, 1.0)
+        domain = self.pricelist.with_context(pricelist_rule_index=False)._compute_price_rule(products, 1.0)
+        self.assertEqual(indexed, domain)
+
+    def test_index_invalidation(self):
+        product = self.products[0]
+        self.pricelist._get_product_rules(product)  # warm the cache
+        rule = self.env['product.pricelist.item'].create({
+            'pricelist_id': self.pricelist.id,
+            'applied_on': '0_product_variant',
+            'product_id': product.id,
+            'compute_price': 'fixed',
+            'fixed_price': 1.0,
+        })
+        self.assertEqual(self.pricelist._get_product_rules(product)[product.id], rule)
+        rule.write({'product_id': self.products[1].id})
+        self.assertNotEqual(self.pricelist._get_product_rules(product).get(product.id), rule)
+        rule.unlink()
+        self.assertEqual(self._indexed_rules(product).ids, self._domain_rules(product).ids)
+
+    def test_index_invalidation_scope(self):
+        other = self.env['product.pricelist'].create({'name': 'Other Pricelist'})
+        brand = self.env['product.brand'].create({'name': 'Scoped Brand'})
+        item = self.env['product.pricelist.item'].create({
+            'pricelist_id': self.pricelist.id,
+            'applied_on': '4_product_brand',
+            'apply_brand': brand.id,
+            'compute_price': 'fixed',
+            'fixed_price': 1.0,
+        })
+        # Only the fields the index depends on give a new version
+        version = self.pricelist.rule_index_version
+        item.fixed_price = 2.0
+        self.assertEqual(self.pricelist.rule_index_version, version)
+        item.min_quantity = 5.0
+        self.assertNotEqual(self.pricelist.rule_index_version, version)
+
+        other_version = other.rule_index_version
+        version = self.pricelist.rule_index_version
+        brand.unlink()
+        self.assertNotEqual(self.pricelist.rule_index_version, version)
+        self.assertEqual(other.rule_index_version, other_version)
+        self.assertEqual(self._indexed_rules(self.products).ids, self._domain_rules(self.products).ids)
+
+    def test_materialized_prices(self):
+        PriceTable = self.env['product.pricelist.price']
+        products = self.products[:100]
+        products.write({'sale_ok': True})
+        self.pricelist.materialize_prices = True
+        PriceTable._cron_refresh()
+        rows = PriceTable.search([('pricelist_id', '=', self.pricelist.id), ('product_id', 'in', products.ids)])
+        self.assertEqual(len(rows), len(products))
+        self.assertFalse(rows.filtered('dirty'))
+        expected = self.pricelist._compute_price_rule(products, 1.0)
+        self.assertEqual(self.pricelist._get_materialized_prices(products), expected)
+
+        # A product attribute change only flags that product
+        brand = self.env['product.brand'].create({'name': 'Bench Brand New'})
+        products[0].product_brand_id = brand
+        self.assertEqual(rows.filtered('dirty').product_id, products[0])
+
+        # A brand rule flags the products of the brand
+        self.env['product.pricelist.item'].create({
+            'pricelist_id': self.pricelist.id,
+            'applied_on': '4_product_brand',
+            'apply_brand': brand.id,
+            'compute_price': 'fixed',
+            'fixed_price': 3.0,
+        })
+        products[1].product_brand_id = brand
+        self.assertEqual(rows.filtered('dirty').product_id, products[:2])
+        self.assertEqual(
+            self.pricelist._get_materialized_prices(products),
+            self.pricelist._compute_price_rule(products, 1.0),
+        )
+        self.assertFalse(rows.filtered('dirty'))
+
+        self.pricelist.materialize_prices = False
+        self.assertFalse(rows.exists())
@@ -1,6 +1,6 @@
 {
     'name': 'B4B SYNC',
-    'version': '17.0.1.1.0',
+    'version': '17.0.1.3.0',
     'category': 'Tools',
     'summary': 'Sincronización unificada de Productos, Imágenes, Ventas y Compras entre instancias de Odoo',
     'description': '''
@@ -32,8 +32,14 @@
         'views/sync_dashboard_views.xml',
         'views/sync_config_views.xml',
         'views/sync_pictures_views.xml',
+        'views/sync_event_views.xml',
         'views/sale_order_views.xml',
         'views/account_move_views.xml',
+        'views/sync_purchase_batch_views.xml',
+        'views/sync_dead_letter_views.xml',
+        'views/sync_run_views.xml',
+        'views/sync_reconcile_views.xml',
+        'views/sync_notify_views.xml',
         'views/product_pricelist_views.xml',
         'wizards/sync_pictures_wizard_views.xml',
         'views/menu_views.xml',
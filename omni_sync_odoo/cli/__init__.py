@@ -0,0 +1 @@
+from . import omni_sync
@@ -0,0 +1,306 @@
+"""Sincronizaciones masivas desde la línea de comandos, fuera de los workers HTTP.
+
+Uso::
+
+    odoo-bin --addons-path=... omni_sync -c odoo.conf -d base --sync-config "Remoto" \\
+        --sync-type products,images --batch-size 200 --concurrency 4
+
+Usa los mismos motores que los botones y las acciones programadas, así que
+cada paso queda registrado en los logs de sincronización como cualquier otra
+ejecución. El trabajo se confirma por tramos (``--progress-interval``): si el
+proceso se interrumpe, ``--resume`` continúa desde el último tramo confirmado.
+
+Con ``--concurrency`` mayor a 1 (o con la conexión en modo repartido) los
+productos, las imágenes y los pedidos se reparten en unidades de trabajo
+(``sync.run``) que procesan varios hilos de este proceso; los workers del cron
+y otros procesos pueden tomar unidades de la misma ejecución.
+"""
+import logging
+import optparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import odoo
+from odoo.cli import Command
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+SYNC_TYPES = ('products', 'images', 'pricelists', 'orders')
+# Tipos que se pueden repartir en unidades de trabajo (ver ``sync.run``)
+SHARDED_TYPES = ('products', 'images', 'orders')
+DEFAULT_PROGRESS_INTERVAL = 60
+
+
+class OmniSync(Command):
+    """Ejecuta sincronizaciones de B4B SYNC sin pasar por un worker HTTP"""
+    name = 'omni_sync'
+
+    def run(self, cmdargs):
+        parser = odoo.tools.config.parser
+        parser.prog = f'{Path(sys.argv[0]).name} {self.name}'
+        group = optparse.OptionGroup(parser, "Omni Sync")
+        group.add_option('--sync-config', dest='sync_config',
+                         help="ID o nombre de la conexión a sincronizar.")
+        group.add_option('--sync-type', dest='sync_type', default='all',
+                         help="Tipos separados por comas: %s. Por defecto los habilitados en la conexión."
+                              % ', '.join(SYNC_TYPES))
+        group.add_option('--batch-size', dest='sync_batch_size', type='int',
+                         help="Registros por lote; reemplaza el de la conexión solo en esta ejecución.")
+        group.add_option('--concurrency', dest='sync_concurrency', type='int', default=1,
+                         help="Hilos que procesan unidades de trabajo a la vez (por defecto 1: sin repartir).")
+        group.add_option('--dry-run', dest='sync_dry_run', action='store_true', default=False,
+                         help="Muestra lo que se sincronizaría sin modificar nada.")
+        group.add_option('--resume', dest='sync_resume', action='store_true', default=False,
+                         help="Continúa desde el punto en que se detuvo la última ejecución.")
+        group.add_option('--progress-interval', dest='sync_progress_interval', type='int',
+                         default=DEFAULT_PROGRESS_INTERVAL,
+                         help="Segundos entre confirmaciones y líneas de avance (por defecto %default).")
+        parser.add_option_group(group)
+        opt = odoo.tools.config.parse_config(cmdargs)
+
+        dbname = odoo.tools.config['db_name']
+        if not dbname or not opt.sync_config:
+            parser.error("Indique la base (-d) y la conexión (--sync-config).")
+        kinds = [kind.strip() for kind in opt.sync_type.split(',') if kind.strip()]
+        unknown = set(kinds) - set(SYNC_TYPES) - {'all'}
+        if unknown:
+            parser.error("Tipos de sincronización desconocidos: %s" % ', '.join(sorted(unknown)))
+
+        registry = odoo.registry(dbname)
+        with registry.cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            config = self._find_config(env, opt.sync_config)
+            if not config:
+                parser.error("No existe la conexión %r." % opt.sync_config)
+            if opt.sync_batch_size:
+                config = config.with_context(omni_sync_batch_size=opt.sync_batch_size)
+            if 'all' in kinds:
+                kinds = [kind for kind, enabled in zip(SYNC_TYPES, (
+                    config.sync_products, config.sync_images, config.sync_pricelists, config.sync_sales,
+                )) if enabled]
+            runner = SyncRunner(config, opt)
+            if opt.sync_dry_run:
+                runner.dry_run(kinds)
+                cr.rollback()
+                return
+            success = runner.run(kinds)
+        if not success:
+            sys.exit(1)
+
+    def _find_config(self, env, value):
+        Config = env['omni.sync.config'].with_context(active_test=False)
+        if value.isdigit():
+            return Config.browse(int(value)).exists()
+        return Config.search([('name', '=', value)], limit=1)
+
+
+class SyncRunner:
+    """Ejecuta los tipos pedidos para una conexión, confirmando por tramos."""
+
+    def __init__(self, config, opt):
+        self.config = config
+        self.env = config.env
+        self.concurrency = max(1, opt.sync_concurrency)
+        self.resume = opt.sync_resume
+        self.interval = max(1, opt.sync_progress_interval)
+        self.start_time = time.time()
+        self.env.cr.execute("SELECT COALESCE(MAX(id), 0) FROM sync_pictures_log")
+        self.first_log_id = self.env.cr.fetchone()[0] + 1
+
+    def _sharded(self, kind):
+        return kind in SHARDED_TYPES and (self.concurrency > 1 or self.config.sync_sharding)
+
+    def _print(self, message, *args):
+        print(('[%7.1fs] ' % (time.time() - self.start_time)) + (message % args if args else message), flush=True)
+
+    # ------------------------------------------------------------------
+    # Simulación
+    # ------------------------------------------------------------------
+    def dry_run(self, kinds):
+        config = self.config
+        client = config._get_remote_connection()
+        self._print("Conexión %s, lotes de %s, %s hilo(s) (simulación)",
+                    config.name, config._get_batch_size(100), self.concurrency)
+        state = (config.sync_resume_state or {}) if self.resume else {}
+        for kind in kinds:
+            if self._sharded(kind):
+                units = getattr(config, f'_plan_{kind}_units')()
+                self._print("%s: %s unidades de trabajo", kind, len(units))
+            elif kind == 'products':
+                count = client.execute_kw('product.product', 'search_count', [[('active', '=', True)]])
+                self._print("products: %s productos remotos, desde la posición %s",
+                            count, (state.get('products') or {}).get('offset', 0))
+            elif kind == 'images':
+                wizard = self.env['sync.pictures.wizard'].new({'config_id': config.id})
+                for brand in wizard._get_brands():
+                    domain = [] if brand == 'TOTAL' else [('product_brand_id.name', '=', brand)]
+                    count = client.execute_kw('product.product', 'search_count', [domain])
+                    self._print("images: marca %s, %s productos remotos", brand, count)
+                if state.get('images'):
+                    self._print("images: se continuaría desde %s", state['images'])
+            elif kind == 'pricelists':
+                count = self.env['product.pricelist'].search_count([('sync_to_remote', '=', True)])
+                self._print("pricelists: %s listas marcadas para enviar", count)
+            elif kind == 'orders':
+                self._print("orders: %s pedidos pendientes de reenviar", len(config._pending_sale_orders()))
+        self._print("RPC: %s llamadas", client.stats.totals['call_count'])
+
+    # ------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------
+    def run(self, kinds):
+        """Ejecuta ``kinds`` en orden; devuelve ``False`` si se interrumpió o falló."""
+        self._print("Conexión %s: %s (lotes de %s, %s hilo(s))", self.config.name, ', '.join(kinds),
+                    self.config._get_batch_size(100), self.concurrency)
+        success = True
+        try:
+            for kind in kinds:
+                if self._sharded(kind):
+                    self._run_sharded(kind)
+                else:
+                    getattr(self, f'_run_{kind}')()
+                self.env.cr.commit()
+        except KeyboardInterrupt:
+            self.env.cr.rollback()
+            self._print("Interrumpido: lo confirmado se conserva; use --resume para continuar.")
+            success = False
+        except Exception as e:
+            self.env.cr.rollback()
+            _logger.exception("Error sincronizando la conexión %s", self.config.name)
+            self._print("Error: %s. Lo confirmado se conserva; use --resume para continuar.", e)
+            success = False
+        self.config.update_stats()
+        self.env.cr.commit()
+        self._report()
+        return success
+
+    def _take_lock(self):
+        # El lock de la conexión dura hasta el fin de la transacción: se toma en cada tramo
+        if not self.config._try_sync_lock():
+            raise UserError("La conexión %s está sincronizándose en otra ejecución." % self.config.name)
+
+    def _run_resumable(self, kind):
+        """Ejecuta el paso programado de ``kind`` en tramos de ``interval`` segundos,
+        guardando el punto de continuación en el mismo lugar que el cron."""
+        config = self.config
+        step = getattr(config, f'_scheduled_sync_{kind}')
+        resume = (config.sync_resume_state or {}).get(kind) if self.resume else None
+        while True:
+            self._take_lock()
+            resume = step(resume, time.time() + self.interval, 'manual')
+            state = dict(config.sync_resume_state or {})
+            if resume is None:
+                state.pop(kind, None)
+            else:
+                state[kind] = resume
+            config.sync_resume_state = state or False
+            self.env.cr.commit()
+            self._print_progress(kind, resume)
+            if resume is None:
+                return
+
+    def _run_products(self):
+        self._run_resumable('products')
+
+    def _run_images(self):
+        self._run_resumable('images')
+
+    def _run_pricelists(self):
+        self._take_lock()
+        self.config._scheduled_sync_pricelists(None, None, 'manual')
+        self.env.cr.commit()
+        self._print_progress('pricelists')
+
+    def _run_orders(self):
+        config = self.config
+        orders = config._pending_sale_orders()
+        client = config._get_remote_connection()
+        done = 0
+        for chunk in split_every(config._get_batch_size(50), orders.ids, orders.browse):
+            self._take_lock()
+            config._push_sale_orders(client, chunk)
+            self.env.cr.commit()
+            done += len(chunk)
+            self._print("orders: %s/%s pedidos enviados (%s sincronizados)",
+                        done, len(orders), len(orders[:done].filtered('is_synced')))
+
+    def _run_sharded(self, kind):
+        """Planifica (o retoma) la ejecución repartida de ``kind`` y la procesa con
+        ``concurrency`` hilos, en rondas de ``interval`` segundos."""
+        config = self.config
+        Run = self.env['sync.run']
+        run = Run.search([('config_id', '=', config.id), ('kind', '=', kind)], limit=1)
+        if self.resume and run.state == 'failed':
+            run.action_retry_failed_units()
+        else:
+            run = config._plan_sync_run(kind, 'manual')
+        self.env.cr.commit()
+        self._print("%s: ejecución repartida %s con %s unidades", kind, run.id, run.unit_count)
+
+        Unit = self.env['sync.work.unit']
+        dbname, uid = self.env.cr.dbname, self.env.uid
+
+        def worker(deadline):
+            thread = threading.current_thread()
+            thread.dbname = dbname
+            thread.uid = uid
+            return Unit._process_work_units(deadline)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='omni_sync_cli') as executor:
+            while True:
+                deadline = time.time() + self.interval
+                processed = sum(future.result() for future in [
+                    executor.submit(worker, deadline) for _i in range(self.concurrency)])
+                # Nueva transacción para ver lo que confirmaron los hilos
+                self.env.cr.commit()
+                run.invalidate_recordset()
+                self._print("%s: %s/%s unidades (%s fallidas), %.0f%%", kind, run.done_count + run.failed_count,
+                            run.unit_count, run.failed_count, run.progress)
+                if run.state != 'running':
+                    break
+                if not processed:
+                    # Las unidades que quedan las tiene otro proceso: se espera a que termine
+                    time.sleep(min(self.interval, 5))
+        if run.failed_count:
+            self._print("%s: %s unidades fallidas; use --resume para reintentarlas.", kind, run.failed_count)
+
+    # ------------------------------------------------------------------
+    # Avance y resumen
+    # ------------------------------------------------------------------
+    def _totals(self, sync_type=None):
+        domain = [('config_id', '=', self.config.id), ('id', '>=', self.first_log_id)]
+        if sync_type:
+            domain.append(('sync_type', '=', sync_type))
+        logs = self.env['sync.pictures.log'].search(domain)
+        return {
+            'synced': sum(logs.mapped('products_synced')) + sum(logs.mapped('pricelists_synced')),
+            'skipped': sum(logs.mapped('products_skipped')),
+            'failed': sum(logs.mapped('products_failed')) + sum(logs.mapped('pricelists_failed'))
+                      + len(logs.filtered(lambda log: log.status == 'failed')),
+            'calls': sum(logs.mapped('rpc_call_count')),
+            'bytes': sum(logs.mapped('rpc_bytes_received')) + sum(logs.mapped('rpc_bytes_sent')),
+        }
+
+    def _print_progress(self, kind, resume=None):
+        totals = self._totals(kind)
+        elapsed = max(time.time() - self.start_time, 0.001)
+        self._print("%s: %s sincronizados, %s omitidos, %s fallidos (%.1f/seg)%s", kind, totals['synced'],
+                    totals['skipped'], totals['failed'], totals['synced'] / elapsed,
+                    ' - continúa en %s' % resume if resume else '')
+
+    def _report(self):
+        elapsed = max(time.time() - self.start_time, 0.001)
+        totals = self._totals()
+        print("\nResumen de %s" % self.config.name, flush=True)
+        print("  Duración:        %.1f seg" % elapsed)
+        print("  Sincronizados:   %s (%.1f/seg)" % (totals['synced'], totals['synced'] / elapsed))
+        print("  Omitidos:        %s" % totals['skipped'])
+        print("  Fallidos:        %s" % totals['failed'])
+        print("  Llamadas RPC:    %s (%.1f/seg)" % (totals['calls'], totals['calls'] / elapsed))
+        print("  Transferido:     %.1f MB (%.2f MB/seg)" % (totals['bytes'] / 1048576,
+                                                            totals['bytes'] / 1048576 / elapsed), flush=True)
@@ -0,0 +1,34 @@
+import json
+import logging
+
+from odoo import http
+from odoo.http import request
+
+from ..models.sync_notify import NOTIFY_ROUTE
+
+_logger = logging.getLogger(__name__)
+
+
+class OmniSyncNotifyController(http.Controller):
+
+    @http.route(NOTIFY_ROUTE, type='http', auth='public', methods=['POST'], csrf=False, save_session=False)
+    def notify(self, **kwargs):
+        """Recibe los avisos de cambios del remoto y los deja en cola para descargarlos.
+
+        El cuerpo es ``{"subscription_id": n, "notifications": [{"model", "ids",
+        "write_date"}]}`` y la conexión se identifica por el token de la cabecera
+        ``X-Omni-Sync-Token``. La descarga no se hace aquí: se junta con los
+        demás avisos y la hace la acción programada.
+        """
+        config = request.env['omni.sync.config'].sudo()._find_by_notify_token(
+            request.httprequest.headers.get('X-Omni-Sync-Token'))
+        if not config:
+            return request.make_json_response({'error': 'forbidden'}, status=403)
+        try:
+            body = json.loads(request.httprequest.get_data() or b'{}')
+            notifications = request.env['omni.sync.notification'].sudo()._parse(body['notifications'])
+        except (ValueError, KeyError, TypeError):
+            return request.make_json_response({'error': 'bad request'}, status=400)
+        buffered = request.env['omni.sync.notification'].sudo()._buffer(config, notifications)
+        _logger.debug("%s avisos de cambios recibidos para %s", buffered, config.name)
+        return request.make_json_response({'buffered': buffered})
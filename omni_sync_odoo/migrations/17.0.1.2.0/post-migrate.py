@@ -0,0 +1,49 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Asigna la conexión y la fecha de sincronización a los documentos ya enviados.
+
+    Antes solo quedaba constancia de la conexión dentro del HTML de ``sync_log``,
+    así que se reutiliza la misma coincidencia que hacía ``update_stats``.
+    """
+    if not version:
+        return
+
+    cr.execute("SELECT id, name, remote_database FROM omni_sync_config")
+    for config_id, name, database in cr.fetchall():
+        cr.execute(
+            """
+            UPDATE sale_order
+               SET sync_config_id = %s, sync_date = write_date, sync_status = 'synced'
+             WHERE is_synced
+               AND sync_config_id IS NULL
+               AND (sync_log LIKE %s OR sync_log LIKE %s)
+            """,
+            (config_id, f'%>{database}<%', f'%>{name}<%'),
+        )
+        _logger.info("Pedidos de venta asociados a la conexión %s: %s", name, cr.rowcount)
+
+        cr.execute(
+            """
+            UPDATE account_move
+               SET sync_config_id = %s, sync_date = write_date
+             WHERE is_synced
+               AND move_type = 'out_invoice'
+               AND sync_config_id IS NULL
+               AND sync_log LIKE %s
+            """,
+            (config_id, f'%>{name}<%'),
+        )
+        _logger.info("Facturas asociadas a la conexión %s: %s", name, cr.rowcount)
+
+    # Pedidos sincronizados sin conexión identificable: al menos cuentan en la serie
+    cr.execute(
+        """
+        UPDATE sale_order
+           SET sync_date = write_date, sync_status = 'synced'
+         WHERE is_synced AND sync_date IS NULL
+        """
+    )
@@ -0,0 +1,68 @@
+import logging
+import re
+
+_logger = logging.getLogger(__name__)
+
+REMOTE_REF_RE = re.compile(r'Referencia Remota\s*</div>\s*<div[^>]*>\s*(.*?)\s*</div>', re.S)
+REMOTE_ID_RE = re.compile(r'ID Remoto\s*</div>\s*<div[^>]*>\s*(\d+)\s*</div>', re.S)
+LINE_COUNT_RE = re.compile(r'L[íi]neas Sinc\.\s*</div>\s*<div[^>]*>\s*(\d+)\s*</div>', re.S)
+SYNC_DATE_RE = re.compile(r'Sincronizado el:\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})')
+
+
+def _column_exists(cr, table, column):
+    cr.execute(
+        "SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = %s",
+        (table, column),
+    )
+    return bool(cr.fetchone())
+
+
+def _migrate_table(cr, table, model):
+    """Convierte el HTML almacenado en ``sync_log`` en registros ``sync.event``."""
+    if not _column_exists(cr, table, 'sync_log'):
+        return
+
+    cr.execute(
+        f"""
+        SELECT id, sync_log, sync_config_id, write_date, create_uid
+          FROM {table}
+         WHERE sync_log IS NOT NULL AND sync_log != ''
+        """
+    )
+    rows = []
+    for res_id, html, config_id, write_date, create_uid in cr.fetchall():
+        if 'Sincronización Omitida' in html:
+            status, remote_ref, remote_id, line_count = 'skipped', None, None, 0
+        else:
+            ref_match = REMOTE_REF_RE.search(html)
+            id_match = REMOTE_ID_RE.search(html)
+            lines_match = LINE_COUNT_RE.search(html)
+            status = 'synced'
+            remote_ref = ref_match.group(1) if ref_match else None
+            remote_id = int(id_match.group(1)) if id_match else None
+            line_count = int(lines_match.group(1)) if lines_match else 0
+        date_match = SYNC_DATE_RE.search(html)
+        event_date = date_match.group(1) if date_match else write_date
+        rows.append((model, res_id, config_id, status, remote_ref, remote_id, line_count,
+                     event_date, event_date, create_uid, create_uid))
+
+    for index in range(0, len(rows), 1000):
+        chunk = rows[index:index + 1000]
+        cr.execute(
+            """
+            INSERT INTO sync_event (res_model, res_id, config_id, status, remote_ref, remote_id,
+                                    line_count, create_date, write_date, create_uid, write_uid)
+            VALUES """ + ', '.join(['%s'] * len(chunk)),
+            chunk,
+        )
+    _logger.info("%s eventos de sincronización creados desde %s.sync_log", len(rows), table)
+
+    # El resumen ahora se genera bajo demanda: se libera el espacio del HTML (y su TOAST)
+    cr.execute(f"ALTER TABLE {table} DROP COLUMN sync_log")
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    _migrate_table(cr, 'sale_order', 'sale.order')
+    _migrate_table(cr, 'account_move', 'account.move')
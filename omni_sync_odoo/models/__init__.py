@@ -1,5 +1,18 @@
+from . import sync_stats_mixin
+from . import sync_rpc_mixin
+from . import sync_event
 from . import sync_config
+from . import sync_circuit
 from . import sync_pictures_log
 from . import sync_product_map
+from . import sync_pricelist
 from . import sale_order
 from . import account_move
+from . import sync_receive
+from . import sync_attachment
+from . import sync_purchase_batch
+from . import sync_dead_letter
+from . import sync_run
+from . import sync_reconcile
+from . import sync_notify
+from . import sync_remote_status
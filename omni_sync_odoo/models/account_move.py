@@ -1,12 +1,14 @@
 from odoo import models, fields, api, _
-import xmlrpc.client
+from odoo.exceptions import UserError
 import logging
+import time
 
 _logger = logging.getLogger(__name__)
 
 
 class AccountMove(models.Model):
-    _inherit = "account.move"
+    _name = "account.move"
+    _inherit = ["account.move", "omni.sync.event.mixin"]
 
     is_synced = fields.Boolean(
         string="Sincronizado", 
@@ -14,12 +16,6 @@ class AccountMove(models.Model):
         copy=False,
         help="Indica si esta factura ha disparado la creación de una orden de compra en la instancia remota."
     )
-    sync_log = fields.Html(
-        string="Resumen de Sincronización", 
-        readonly=True, 
-        copy=False,
-        help="Registro visual del proceso de creación de la orden de compra remota."
-    )
     remote_order_ref = fields.Char(
         string="Referencia Remota", 
         readonly=True, 
@@ -31,6 +27,20 @@ class AccountMove(models.Model):
         default=False, 
         help="Identificador técnico para facturas que provienen de procesos de sincronización remota."
     )
+    sync_config_id = fields.Many2one(
+        'omni.sync.config',
+        string="Conexión Sincronizada",
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help="Conexión remota en la que se creó la orden de compra a partir de esta factura."
+    )
+    sync_date = fields.Datetime(
+        string="Fecha de Sincronización",
+        readonly=True,
+        copy=False,
+        help="Fecha y hora en la que se creó la orden de compra remota."
+    )
 
     def action_post(self):
         """Extensión de la validación de factura para sincronizar compras."""
@@ -52,195 +62,212 @@ class AccountMove(models.Model):
 
     def _sync_to_remote_purchase(self, config_rec):
         """Lógica interna para conectar con el remoto y crear la OC."""
-        url = config_rec.remote_url
-        db = config_rec.remote_database
-        username = config_rec.remote_username
-        password = config_rec.remote_password
+        client = config_rec._get_rpc_client()
+        Event = self.env['sync.event']
+        DeadLetter = self.env['sync.dead.letter']
+        moves = self.filtered(lambda m: m.move_type == "out_invoice" and not m.is_synced and not m.is_remote_order)
 
         try:
-            common = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common")
-            uid = common.authenticate(db, username, password, {})
-            if not uid:
-                return
-
-            models_proxy = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object")
-
-            # Validar módulo de compras en remoto
-            try:
-                models_proxy.execute_kw(
-                    db, uid, password,
-                    'purchase.order', 'search',
-                    [[]], {'limit': 1}
-                )
-            except Exception:
-                self.message_post(
-                    body=_("Error: El módulo de Compras no está instalado en el servidor remoto.")
-                )
+            if not client.authenticate():
                 return
-
-            for move in self:
-                if move.move_type != "out_invoice" or move.is_synced or move.is_remote_order:
-                    continue
-
-                vendor_partner = move.partner_id
-                if not vendor_partner:
-                    continue
-
-                # ------------------------------
-                # Partner remoto (buscar / crear)
-                # ------------------------------
-                domain = []
-                if vendor_partner.vat:
-                    domain = [('vat', '=', vendor_partner.vat)]
-                else:
-                    domain = [('name', '=', vendor_partner.name)]
-
-                remote_partner_ids = models_proxy.execute_kw(
-                    db, uid, password,
-                    'res.partner', 'search',
-                    [domain],
-                    {'limit': 1}
-                )
-
-                if not remote_partner_ids:
-                    _logger.info(
-                        "Proveedor no encontrado en remoto, creando: %s", vendor_partner.name
-                    )
-
-                    remote_partner_id = models_proxy.execute_kw(
-                        db, uid, password,
-                        'res.partner', 'create',
-                        [{
-                            'name': vendor_partner.name,
-                            'vat': vendor_partner.vat,
-                            'email': vendor_partner.email,
-                            'phone': vendor_partner.phone,
-                            'supplier_rank': 1,
-                            'company_type': 'company',
-                        }]
-                    )
-                else:
-                    remote_partner_id = remote_partner_ids[0]
-
-                # ------------------------------
-                # Líneas de la OC
-                # ------------------------------
-                order_lines = []
-                for line in move.invoice_line_ids:
-                    if not line.product_id or not line.product_id.default_code:
-                        continue
-
-                    remote_prod_ids = models_proxy.execute_kw(
-                        db, uid, password,
-                        'product.product', 'search',
-                        [[('default_code', '=', line.product_id.default_code)]],
-                        {'limit': 1}
+        except Exception as e:
+            # Sin conexión ninguna factura pudo enviarse
+            _logger.exception("Error en sincronización de compras")
+            for move in moves:
+                Event._log_event(move, config_rec, 'failed', error_message=str(e))
+                DeadLetter._capture('purchase', move, config_rec, e)
+            moves.message_post(
+                body=_("Error en sincronización remota con %s: %s")
+                % (config_rec.name, str(e))
+            )
+            return
+
+        for move in moves:
+            with client.track() as rpc_stats:
+                start_time = time.time()
+                try:
+                    # Un error deshace lo escrito para esta factura; las demás se siguen enviando
+                    with self.env.cr.savepoint():
+                        move._push_remote_purchase(client, config_rec, rpc_stats)
+                except Exception as e:
+                    _logger.exception("Error en sincronización de compras de %s", move.name)
+                    Event._log_event(move, config_rec, 'failed', error_message=str(e),
+                                     duration=time.time() - start_time, **Event._rpc_stats_values(rpc_stats))
+                    DeadLetter._capture('purchase', move, config_rec, e)
+                    move.message_post(
+                        body=_("Error en sincronización remota con %s: %s")
+                        % (config_rec.name, str(e))
                     )
 
-                    if not remote_prod_ids:
-                        continue
+    def _push_remote_purchase(self, client, config_rec, rpc_stats):
+        """Crea en el remoto la OC correspondiente a esta factura."""
+        self.ensure_one()
+        move = self
+        start_time = time.time()
+
+        if not move.partner_id:
+            return
+
+        # Toda la OC en una llamada; los remotos sin el endpoint se resuelven llamada por llamada
+        payload = move._prepare_remote_purchase_payload(config_rec)
+        results = config_rec._call_receive_endpoint(client, 'purchase.order', 'omni_receive_purchases', [payload])
+        result = results[0] if results is not None else move._push_remote_purchase_legacy(client, payload)
+        move._apply_remote_purchase_result(
+            config_rec, result,
+            duration=time.time() - start_time,
+            **self.env['sync.event']._rpc_stats_values(rpc_stats),
+        )
+
+    def _apply_remote_purchase_result(self, config_rec, result, **event_values):
+        """Refleja en la factura el resultado de ``omni_receive_purchases`` (o del
+        envío llamada por llamada) y registra el evento; un resultado fallido se lanza."""
+        self.ensure_one()
+        move = self
+        if not result.get('ok'):
+            raise UserError(result.get('error') or _('El servidor remoto rechazó la orden de compra.'))
+        line_count = sum(1 for line in result['lines'] if line['status'] == 'synced')
+        self.env['sync.dead.letter']._resolve('purchase', move, config_rec)
+
+        if not result['id']:
+            move.message_post(
+                body=_("No se encontraron productos válidos para crear la Orden de Compra.")
+            )
+            self.env['sync.event']._log_event(move, config_rec, 'skipped', **event_values)
+            return
+
+        purchase_id = result['id']
+        remote_ref = result['name'] or str(purchase_id)
+
+        move.write({
+            'is_synced': True,
+            'remote_order_ref': remote_ref,
+            'remote_order_id': purchase_id,
+            'sync_config_id': config_rec.id,
+            'sync_date': fields.Datetime.now(),
+        })
+        self.env['sync.event']._log_event(
+            move, config_rec, 'synced',
+            remote_id=purchase_id,
+            remote_ref=remote_ref,
+            line_count=line_count,
+            **event_values,
+        )
+
+        move.message_post(
+            body=_(
+                "Orden de Compra creada en remoto [%s] (Referencia: %s)"
+            ) % (config_rec.name, remote_ref)
+        )
+
+    def _push_remote_purchase_legacy(self, client, payload):
+        """Crea la OC llamada por llamada, para remotos con una versión del
+        módulo sin ``omni_receive_purchases``. Devuelve lo mismo que ese endpoint."""
+        self.ensure_one()
+        # Validar módulo de compras en remoto
+        try:
+            client.execute_kw(
+                'purchase.order', 'search',
+                [[]], {'limit': 1}
+            )
+        except Exception:
+            raise UserError(_("El módulo de Compras no está instalado en el servidor remoto."))
+
+        # ------------------------------
+        # Partner remoto (buscar / crear)
+        # ------------------------------
+        partner = payload['partner']
+        if partner['vat']:
+            domain = [('vat', '=', partner['vat'])]
+        else:
+            domain = [('name', '=', partner['name'])]
+
+        remote_partner_ids = client.execute_kw(
+            'res.partner', 'search',
+            [domain],
+            {'limit': 1}
+        )
+
+        if not remote_partner_ids:
+            _logger.info(
+                "Proveedor no encontrado en remoto, creando: %s", partner['name']
+            )
 
-                    order_lines.append((0, 0, {
-                        'name': line.name,
-                        'product_id': remote_prod_ids[0],
-                        'product_qty': line.quantity,
-                        'price_unit': line.price_unit,
-                        'date_planned': fields.Datetime.now(),
-                    }))
+            remote_partner_id = client.execute_kw(
+                'res.partner', 'create',
+                [dict(partner, supplier_rank=1, company_type='company')]
+            )
+        else:
+            remote_partner_id = remote_partner_ids[0]
+
+        # ------------------------------
+        # Líneas de la OC (una sola búsqueda para todas las referencias)
+        # ------------------------------
+        remote_products = {}
+        codes = list({line['default_code'] for line in payload['lines']})
+        if codes:
+            for product in client.execute_kw('product.product', 'search_read',
+                                             [[('default_code', 'in', codes)]], {'fields': ['default_code']}):
+                remote_products.setdefault(product['default_code'], product['id'])
+
+        order_lines, line_results = [], []
+        for line in payload['lines']:
+            product_id = remote_products.get(line['default_code'])
+            line_results.append({'default_code': line['default_code'], 'status': 'synced' if product_id else 'not_found'})
+            if product_id:
+                order_lines.append((0, 0, {
+                    'name': line['name'],
+                    'product_id': product_id,
+                    'product_qty': line['product_qty'],
+                    'price_unit': line['price_unit'],
+                    'date_planned': fields.Datetime.now(),
+                }))
+        if not order_lines:
+            return {'ok': True, 'id': False, 'name': False, 'lines': line_results}
+
+        # ------------------------------
+        # Crear Orden de Compra
+        # ------------------------------
+        # Validar campos existentes en el remoto antes de enviarlos
+        remote_fields = client.execute_kw('purchase.order', 'fields_get', [[]], {'attributes': ['string']})
+
+        po_vals = {
+            'partner_id': remote_partner_id,
+            'partner_ref': payload['partner_ref'],
+            'order_line': order_lines,
+        }
 
-                if not order_lines:
-                    move.message_post(
-                        body=_("No se encontraron productos válidos para crear la Orden de Compra.")
-                    )
-                    continue
-
-                # ------------------------------
-                # Crear Orden de Compra
-                # ------------------------------
-                # Validar campos existentes en el remoto antes de enviarlos
-                remote_fields = models_proxy.execute_kw(db, uid, password, 'purchase.order', 'fields_get', [[]], {'attributes': ['string']})
-                
-                # Obtener la URL base de esta instancia para enviarla como origen
-                base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
-                origin_info = f"{base_url} ({self.env.cr.dbname})"
-                
-                po_vals = {
-                    'partner_id': remote_partner_id,
-                    'partner_ref': move.name,
-                    'order_line': order_lines,
-                }
-
-                if 'is_synced' in remote_fields:
-                    po_vals['is_synced'] = True
-                if 'sync_connection_name' in remote_fields:
-                    po_vals['sync_connection_name'] = origin_info
-
-                purchase_id = models_proxy.execute_kw(
-                    db, uid, password,
-                    'purchase.order', 'create',
-                    [po_vals]
-                )
-
-                # Confirmar automáticamente
-                if config_rec.auto_confirm_po:
-                    models_proxy.execute_kw(
-                        db, uid, password,
-                        'purchase.order', 'button_confirm',
-                        [[purchase_id]]
-                    )
+        if 'is_synced' in remote_fields:
+            po_vals['is_synced'] = True
+        if 'sync_connection_name' in remote_fields:
+            po_vals['sync_connection_name'] = payload['sync_connection_name']
+
+        purchase_id = client.execute_kw(
+            'purchase.order', 'create',
+            [po_vals]
+        )
+
+        # Confirmar automáticamente
+        if payload['confirm']:
+            client.execute_kw(
+                'purchase.order', 'button_confirm',
+                [[purchase_id]]
+            )
 
-                # Obtener el nombre de la OC remota
-                remote_po_name = models_proxy.execute_kw(db, uid, password, 'purchase.order', 'read', [[purchase_id]], {'fields': ['name']})
-                remote_ref = remote_po_name[0].get('name') if remote_po_name else str(purchase_id)
-
-                log_html = f"""
-                    <div style="width: 100%; margin-top: 10px; font-family: sans-serif;">
-                        <table style="width: 100%; border-collapse: separate; border-spacing: 10px; table-layout: fixed;">
-                            <tr>
-                                <td style="width: 25%; background: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 5px solid #007bff; box-shadow: 0 2px 4px rgba(0,0,0,0.05);">
-                                    <div style="font-size: 11px; color: #666; text-uppercase; font-weight: bold; margin-bottom: 5px;">Referencia Remota</div>
-                                    <div style="font-size: 16px; color: #007bff; font-weight: bold;">{remote_ref}</div>
-                                </td>
-                                <td style="width: 25%; background: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 5px solid #28a745; box-shadow: 0 2px 4px rgba(0,0,0,0.05);">
-                                    <div style="font-size: 11px; color: #666; text-uppercase; font-weight: bold; margin-bottom: 5px;">ID Remoto</div>
-                                    <div style="font-size: 16px; color: #28a745; font-weight: bold;">{purchase_id}</div>
-                                </td>
-                                <td style="width: 25%; background: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 5px solid #ffc107; box-shadow: 0 2px 4px rgba(0,0,0,0.05);">
-                                    <div style="font-size: 11px; color: #666; text-uppercase; font-weight: bold; margin-bottom: 5px;">Conexión</div>
-                                    <div style="font-size: 14px; color: #333; font-weight: bold; word-break: break-all;">{config_rec.name}</div>
-                                </td>
-                                <td style="width: 25%; background: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 5px solid #17a2b8; box-shadow: 0 2px 4px rgba(0,0,0,0.05);">
-                                    <div style="font-size: 11px; color: #666; text-uppercase; font-weight: bold; margin-bottom: 5px;">Líneas Sinc.</div>
-                                    <div style="font-size: 16px; color: #17a2b8; font-weight: bold;">{len(order_lines)}</div>
-                                </td>
-                            </tr>
-                        </table>
-                        <div style="text-align: right; padding: 10px; font-size: 11px; color: #999; font-style: italic;">
-                            Sincronizado el: {fields.Datetime.now()}
-                        </div>
-                    </div>
-                """
-                move.write({
-                    'is_synced': True,
-                    'remote_order_ref': remote_ref,
-                    'sync_log': log_html
-                })
-
-                move.message_post(
-                    body=_(
-                        "Orden de Compra creada en remoto [%s] (Referencia: %s)"
-                    ) % (config_rec.name, remote_ref)
-                )
+        # Obtener el nombre de la OC remota
+        remote_po_name = client.execute_kw('purchase.order', 'read', [[purchase_id]], {'fields': ['name']})
+        remote_ref = remote_po_name[0].get('name') if remote_po_name else str(purchase_id)
+        return {'ok': True, 'id': purchase_id, 'name': remote_ref, 'lines': line_results}
 
-        except Exception as e:
-            _logger.exception("Error en sincronización de compras")
-            self.message_post(
-                body=_("Error en sincronización remota con %s: %s")
-                % (config_rec.name, str(e))
-            )
 
 class PurchaseOrder(models.Model):
-    _inherit = "purchase.order"
+    _name = "purchase.order"
+    _inherit = ["purchase.order", "omni.sync.stats.mixin"]
+
+    # En el destino la conexión se identifica por el origen que envió la OC
+    _sync_stats_config_field = 'sync_connection_name'
+    _sync_stats_date_field = 'create_date'
+    _sync_stats_status_field = 'state'
+    _sync_stats_failed_values = ('cancel',)
 
     is_synced = fields.Boolean(
         string="Sincronizado", 
@@ -255,14 +282,3 @@ class PurchaseOrder(models.Model):
         help="Nombre de la base de datos o URL de origen que envió los datos para crear esta orden de compra."
     )
 
-    # Campos para el dashboard
-    @api.model
-    def get_sync_stats(self):
-        """Devuelve estadísticas de sincronización para el dashboard"""
-        synced_orders = self.search([('is_synced', '=', True)])
-        total_count = len(synced_orders)
-        avg_value = sum(synced_orders.mapped('amount_total')) / total_count if total_count > 0 else 0.0
-        return {
-            'total_count': total_count,
-            'avg_value': avg_value,
-        }
@@ -1,6 +1,6 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
-import xmlrpc.client
+import time
 
 class SaleOrderLine(models.Model):
     _inherit = 'sale.order.line'
@@ -17,7 +17,13 @@ class SaleOrderLine(models.Model):
     ], string="Estado Sinc.", readonly=True, copy=False, help="Estado detallado de la sincronización para esta línea específica.")
 
 class SaleOrder(models.Model):
-    _inherit = 'sale.order'
+    _name = 'sale.order'
+    _inherit = ['sale.order', 'omni.sync.stats.mixin', 'omni.sync.event.mixin']
+
+    _sync_stats_config_field = 'sync_config_id'
+    _sync_stats_date_field = 'sync_date'
+    _sync_stats_status_field = 'sync_status'
+    _sync_stats_failed_values = ('failed',)
 
     is_synced = fields.Boolean(
         string="Sincronizado", 
@@ -34,12 +40,6 @@ class SaleOrder(models.Model):
         string="Nombre del archivo",
         help="Nombre técnico del archivo PDF de la guía."
     )
-    sync_log = fields.Html(
-        string="Resumen de Sincronización", 
-        readonly=True, 
-        copy=False,
-        help="Registro visual detallado del resultado de la sincronización, incluyendo IDs remotos y marcas de tiempo."
-    )
     remote_order_ref = fields.Char(
         string="Referencia Remota", 
         readonly=True, 
@@ -53,16 +53,27 @@ class SaleOrder(models.Model):
     )
 
     # Campos para el dashboard
-    @api.model
-    def get_sync_stats(self):
-        """Devuelve estadísticas de sincronización para el dashboard de ventas"""
-        synced_orders = self.search([('is_synced', '=', True)])
-        total_count = len(synced_orders)
-        avg_value = sum(synced_orders.mapped('amount_total')) / total_count if total_count > 0 else 0.0
-        return {
-            'total_count': total_count,
-            'avg_value': avg_value,
-        }
+    sync_config_id = fields.Many2one(
+        'omni.sync.config',
+        string="Conexión Sincronizada",
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help="Conexión remota contra la que se intentó el último envío del pedido."
+    )
+    sync_date = fields.Datetime(
+        string="Fecha de Sincronización",
+        readonly=True,
+        copy=False,
+        help="Fecha y hora del último intento de sincronización del pedido."
+    )
+    sync_status = fields.Selection([
+        ('synced', 'Sincronizado'),
+        ('failed', 'No Sincronizado')
+    ], string="Estado Sinc.", readonly=True, copy=False, help="Resultado del último intento de sincronización del pedido.")
+
+    def _get_sync_stats_domain(self):
+        return ['|', ('is_synced', '=', True), ('sync_status', '=', 'failed')]
 
     def action_confirm(self):
         """Extensión de la confirmación para disparar la sincronización automática."""
@@ -71,10 +82,13 @@ class SaleOrder(models.Model):
             # Sincronizar automáticamente al confirmar si no está sincronizado y NO es un pedido remoto
             if not order.is_synced and not order.is_remote_order:
                 try:
-                    order.action_sync_order()
+                    action = order.action_sync_order()
                 except Exception as e:
                     # No bloqueamos la confirmación si falla la sincronización, pero lo registramos
                     order.message_post(body=f"Error en sincronización automática: {str(e)}")
+                    continue
+                if order.sync_status == 'failed':
+                    order.message_post(body=f"Error en sincronización automática: {action['params']['message']}")
         return res
 
     def action_sync_order(self):
@@ -95,175 +109,205 @@ class SaleOrder(models.Model):
             if not config_rec or not config_rec.active or not config_rec.sync_sales:
                 raise UserError(_('No hay una configuración válida para sincronización de ventas.'))
 
-            url = config_rec.remote_url
-            db = config_rec.remote_database
-            user = config_rec.remote_username
-            password = config_rec.remote_password
+            client = config_rec._get_rpc_client()
+            start_time = time.time()
+            payload = None
 
             try:
-                common = xmlrpc.client.ServerProxy(f'{url}/xmlrpc/2/common')
-                uid = common.authenticate(db, user, password, {})
-                if not uid:
-                    raise UserError(_('Autenticación fallida en el servidor remoto.'))
+                # Un error deshace lo escrito en el intento; el fallo se registra después, fuera del savepoint
+                with self.env.cr.savepoint():
+                    if not client.authenticate():
+                        raise UserError(_('Autenticación fallida en el servidor remoto.'))
 
-                models_rpc = xmlrpc.client.ServerProxy(f'{url}/xmlrpc/2/object')
+                    # Partner de la compañía (Contacto de la compañía de origen)
+                    if not order.company_id.partner_id:
+                        raise UserError(_('La compañía del pedido no tiene un partner asignado. Por favor, asigne un contacto a la compañía.'))
 
-                # Validar si el modelo sale.order existe en el remoto
-                try:
-                    models_rpc.execute_kw(db, uid, password, 'sale.order', 'search', [[]], {'limit': 1})
-                except Exception:
-                    raise UserError(_('El módulo de Ventas (sale.order) no parece estar instalado en el servidor remoto.'))
-
-                # Partner de la compañía (Contacto de la compañía de origen)
-                company_partner = order.company_id.partner_id
-                if not company_partner:
-                    raise UserError(_('La compañía del pedido no tiene un partner asignado. Por favor, asigne un contacto a la compañía.'))
-
-                # Buscamos en el remoto un partner que coincida con los datos de nuestra compañía
-                partner_domain = [('name', '=', company_partner.name)]
-                if company_partner.vat:
-                    partner_domain = ['|', ('vat', '=', company_partner.vat)] + partner_domain
-                
-                partner_ids = models_rpc.execute_kw(db, uid, password, 'res.partner', 'search', [partner_domain], {'limit': 1})
-
-                if partner_ids:
-                    remote_partner_id = partner_ids[0]
-                else:
-                    # Si no existe, lo creamos con los datos de nuestra compañía
-                    remote_partner_id = models_rpc.execute_kw(db, uid, password, 'res.partner', 'create', [{
-                        'name': company_partner.name,
-                        'vat': company_partner.vat,
-                        'street': company_partner.street,
-                        'city': company_partner.city,
-                        'phone': company_partner.phone,
-                        'email': company_partner.email,
-                        'is_company': True,
-                    }])
-
-                # Líneas del pedido
-                remote_lines = []
-                for line in order.order_line:
-                    if not line.product_id.default_code:
-                        continue
-
-                    prod_ids = models_rpc.execute_kw(
-                        db, uid, password, 'product.product', 'search',
-                        [[('default_code', '=', line.product_id.default_code)]],
-                        {'limit': 1}
+                    # Todo el pedido en una llamada; los remotos sin el endpoint se resuelven llamada por llamada
+                    payload = order._prepare_remote_order_payload(config_rec)
+                    # La guía viaja antes y por partes: la creación no depende del tamaño del PDF
+                    config_rec._upload_payload_attachments(client, payload)
+                    results = config_rec._call_receive_endpoint(client, 'sale.order', 'omni_receive_orders', [payload])
+                    result = results[0] if results is not None else order._push_remote_order_legacy(client, payload)
+                    order._apply_remote_order_result(
+                        config_rec, result,
+                        duration=time.time() - start_time,
+                        **self.env['sync.event']._rpc_stats_values(client.stats),
                     )
 
-                    if prod_ids:
-                        remote_lines.append((0, 0, {
-                            'product_id': prod_ids[0],
-                            'product_uom_qty': line.product_uom_qty,
-                            'name': line.name,
-                        }))
-                        line.write({'is_synced': True, 'sync_status': 'synced'})
-                    else:
-                        line.write({'is_synced': False, 'sync_status': 'failed'})
-
-                if not remote_lines:
-                    # Si no hay líneas válidas, simplemente registramos una alerta y notificamos sin bloquear
-                    order.write({
-                        'sync_log': "<div class='alert alert-warning' style='padding: 15px; border-radius: 8px; border-left: 5px solid #ffc107; background: #fff3cd; color: #856404;'><strong>Sincronización Omitida:</strong> Ninguno de los productos de este pedido existe en la base remota. Se asume que son productos de otros proveedores.</div>"
-                    })
+                    if not result['id']:
+                        # Si no hay líneas válidas, simplemente registramos una alerta y notificamos sin bloquear
+                        return {
+                            'type': 'ir.actions.client',
+                            'tag': 'display_notification',
+                            'params': {
+                                'title': _('Sincronización omitida'),
+                                'message': _('No se encontraron productos coincidentes en el remoto. El pedido no fue sincronizado.'),
+                                'type': 'warning',
+                                'sticky': False,
+                            }
+                        }
+
                     return {
                         'type': 'ir.actions.client',
                         'tag': 'display_notification',
                         'params': {
-                            'title': _('Sincronización omitida'),
-                            'message': _('No se encontraron productos coincidentes en el remoto. El pedido no fue sincronizado.'),
-                            'type': 'warning',
-                            'sticky': False,
+                            'title': _('Sincronización exitosa'),
+                            'message': _('Pedido creado en remoto: %s (%s llamadas RPC en %.2f seg)') % (
+                                order.remote_order_ref, client.stats.totals['call_count'], client.stats.totals['time']),
+                            'type': 'success',
                         }
                     }
 
-                # Campaña
-                remote_campaign_id = False
-                if order.campaign_id:
-                    campaign_ids = models_rpc.execute_kw(
-                        db, uid, password, 'utm.campaign', 'search',
-                        [[('name', '=', order.campaign_id.name)]], {'limit': 1}
-                    )
-                    if campaign_ids:
-                        remote_campaign_id = campaign_ids[0]
-                    else:
-                        remote_campaign_id = models_rpc.execute_kw(
-                            db, uid, password, 'utm.campaign', 'create', [{'name': order.campaign_id.name}]
-                        )
-
-                # Validar campos existentes en el remoto antes de enviarlos
-                remote_fields = models_rpc.execute_kw(db, uid, password, 'sale.order', 'fields_get', [[]], {'attributes': ['string']})
-                
-                # Crear pedido remoto
-                order_data = {
-                    'partner_id': remote_partner_id,
-                    'origin': order.origin or order.name,
-                    'date_order': str(order.date_order),
-                    'order_line': remote_lines,
-                }
-                
-                if 'is_remote_order' in remote_fields:
-                    order_data['is_remote_order'] = True  # Marcamos en el destino que es un pedido remoto
-                
-                if 'meli_tracking_pdf' in remote_fields and order.meli_tracking_pdf:
-                    order_data['meli_tracking_pdf'] = order.meli_tracking_pdf
-                    if 'meli_tracking_filename' in remote_fields:
-                        order_data['meli_tracking_filename'] = order.meli_tracking_filename
-                
-                if remote_campaign_id and 'campaign_id' in remote_fields:
-                    order_data['campaign_id'] = remote_campaign_id
-
-                remote_order_id = models_rpc.execute_kw(db, uid, password, 'sale.order', 'create', [order_data])
-                
-                # Obtener el nombre del pedido remoto si es posible
-                remote_order_name = models_rpc.execute_kw(db, uid, password, 'sale.order', 'read', [[remote_order_id]], {'fields': ['name']})
-                remote_ref = remote_order_name[0].get('name') if remote_order_name else str(remote_order_id)
-
-                # Generar Log de Resumen
-                log_html = f"""
-                    <div style="width: 100%; margin-top: 10px; font-family: sans-serif;">
-                        <table style="width: 100%; border-collapse: separate; border-spacing: 10px; table-layout: fixed;">
-                            <tr>
-                                <td style="width: 25%; background: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 5px solid #007bff; box-shadow: 0 2px 4px rgba(0,0,0,0.05);">
-                                    <div style="font-size: 11px; color: #666; text-uppercase; font-weight: bold; margin-bottom: 5px;">Referencia Remota</div>
-                                    <div style="font-size: 16px; color: #007bff; font-weight: bold;">{remote_ref}</div>
-                                </td>
-                                <td style="width: 25%; background: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 5px solid #28a745; box-shadow: 0 2px 4px rgba(0,0,0,0.05);">
-                                    <div style="font-size: 11px; color: #666; text-uppercase; font-weight: bold; margin-bottom: 5px;">ID Remoto</div>
-                                    <div style="font-size: 16px; color: #28a745; font-weight: bold;">{remote_order_id}</div>
-                                </td>
-                                <td style="width: 25%; background: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 5px solid #ffc107; box-shadow: 0 2px 4px rgba(0,0,0,0.05);">
-                                    <div style="font-size: 11px; color: #666; text-uppercase; font-weight: bold; margin-bottom: 5px;">Base de Datos</div>
-                                    <div style="font-size: 14px; color: #333; font-weight: bold; word-break: break-all;">{db}</div>
-                                </td>
-                                <td style="width: 25%; background: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 5px solid #17a2b8; box-shadow: 0 2px 4px rgba(0,0,0,0.05);">
-                                    <div style="font-size: 11px; color: #666; text-uppercase; font-weight: bold; margin-bottom: 5px;">Líneas Sinc.</div>
-                                    <div style="font-size: 16px; color: #17a2b8; font-weight: bold;">{len(remote_lines)}</div>
-                                </td>
-                            </tr>
-                        </table>
-                        <div style="text-align: right; padding: 10px; font-size: 11px; color: #999; font-style: italic;">
-                            Sincronizado el: {fields.Datetime.now()}
-                        </div>
-                    </div>
-                """
-                
-                order.write({
-                    'is_synced': True,
-                    'remote_order_ref': remote_ref,
-                    'sync_log': log_html
-                })
-
+            except Exception as e:
+                order._record_remote_order_failure(
+                    config_rec, e, payload,
+                    duration=time.time() - start_time,
+                    **self.env['sync.event']._rpc_stats_values(client.stats),
+                )
+                # Sin excepción: así el estado, el evento y las estadísticas del fallo se conservan
                 return {
                     'type': 'ir.actions.client',
                     'tag': 'display_notification',
                     'params': {
-                        'title': _('Sincronización exitosa'),
-                        'message': f'Pedido creado en remoto: {remote_ref}',
-                        'type': 'success',
+                        'title': _('Error de sincronización'),
+                        'message': _('Error al sincronizar: %s') % str(e),
+                        'type': 'danger',
+                        'sticky': True,
                     }
                 }
 
-            except Exception as e:
-                raise UserError(_('Error al sincronizar: %s') % str(e))
+    def _apply_remote_order_result(self, config_rec, result, **event_values):
+        """Refleja en el pedido el resultado de ``omni_receive_orders`` (o del envío
+        llamada por llamada) y registra el evento; un resultado fallido se lanza."""
+        self.ensure_one()
+        order = self
+        if not result.get('ok'):
+            raise UserError(result.get('error') or _('El servidor remoto rechazó el pedido.'))
+
+        line_status = {line['default_code']: line['status'] for line in result['lines']}
+        coded_lines = order.order_line.filtered(lambda l: l.product_id.default_code)
+        synced_lines = coded_lines.filtered(lambda l: line_status.get(l.product_id.default_code) == 'synced')
+        synced_lines.write({'is_synced': True, 'sync_status': 'synced'})
+        (coded_lines - synced_lines).write({'is_synced': False, 'sync_status': 'failed'})
+        self.env['sync.dead.letter']._resolve('sale_order', order, config_rec)
+
+        if not result['id']:
+            self.env['sync.event']._log_event(order, config_rec, 'skipped', **event_values)
+            return
+
+        remote_order_id = result['id']
+        remote_ref = result['name'] or str(remote_order_id)
+        order.write({
+            'is_synced': True,
+            'remote_order_ref': remote_ref,
+            'remote_order_id': remote_order_id,
+            'sync_config_id': config_rec.id,
+            'sync_date': fields.Datetime.now(),
+            'sync_status': 'synced',
+        })
+        self.env['sync.event']._log_event(
+            order, config_rec, 'synced',
+            remote_id=remote_order_id,
+            remote_ref=remote_ref,
+            line_count=len(synced_lines),
+            **event_values,
+        )
+
+    def _record_remote_order_failure(self, config_rec, error, payload=None, **event_values):
+        """Registra un envío fallido: estado del pedido, evento y cola de errores."""
+        self.ensure_one()
+        # Si el error se captura aguas arriba (confirmación) el intento queda registrado para el tablero
+        self.write({
+            'sync_config_id': config_rec.id,
+            'sync_date': fields.Datetime.now(),
+            'sync_status': 'failed',
+        })
+        self.env['sync.event']._log_event(self, config_rec, 'failed', error_message=str(error), **event_values)
+        self.env['sync.dead.letter']._capture('sale_order', self, config_rec, error, payload=payload)
+
+    def _push_remote_order_legacy(self, client, payload):
+        """Envía el pedido llamada por llamada, para remotos con una versión del
+        módulo sin ``omni_receive_orders``. Devuelve lo mismo que ese endpoint."""
+        self.ensure_one()
+        # Validar si el modelo sale.order existe en el remoto
+        try:
+            client.execute_kw('sale.order', 'search', [[]], {'limit': 1})
+        except Exception:
+            raise UserError(_('El módulo de Ventas (sale.order) no parece estar instalado en el servidor remoto.'))
+
+        # Buscamos en el remoto un partner que coincida con los datos de nuestra compañía
+        partner = payload['partner']
+        partner_domain = [('name', '=', partner['name'])]
+        if partner['vat']:
+            partner_domain = ['|', ('vat', '=', partner['vat'])] + partner_domain
+
+        partner_ids = client.execute_kw('res.partner', 'search', [partner_domain], {'limit': 1})
+
+        if partner_ids:
+            remote_partner_id = partner_ids[0]
+        else:
+            # Si no existe, lo creamos con los datos de nuestra compañía
+            remote_partner_id = client.execute_kw('res.partner', 'create', [dict(partner, is_company=True)])
+
+        # Líneas del pedido: una sola búsqueda para todas las referencias
+        remote_products = {}
+        codes = list({line['default_code'] for line in payload['lines']})
+        if codes:
+            for product in client.execute_kw('product.product', 'search_read',
+                                             [[('default_code', 'in', codes)]], {'fields': ['default_code']}):
+                remote_products.setdefault(product['default_code'], product['id'])
+
+        remote_lines, line_results = [], []
+        for line in payload['lines']:
+            product_id = remote_products.get(line['default_code'])
+            line_results.append({'default_code': line['default_code'], 'status': 'synced' if product_id else 'not_found'})
+            if product_id:
+                remote_lines.append((0, 0, {
+                    'product_id': product_id,
+                    'product_uom_qty': line['product_uom_qty'],
+                    'name': line['name'],
+                }))
+        if not remote_lines:
+            return {'ok': True, 'id': False, 'name': False, 'lines': line_results}
+
+        # Campaña
+        remote_campaign_id = False
+        if payload['campaign']:
+            campaign_ids = client.execute_kw('utm.campaign', 'search',
+                [[('name', '=', payload['campaign'])]], {'limit': 1}
+            )
+            if campaign_ids:
+                remote_campaign_id = campaign_ids[0]
+            else:
+                remote_campaign_id = client.execute_kw('utm.campaign', 'create', [{'name': payload['campaign']}])
+
+        # Validar campos existentes en el remoto antes de enviarlos
+        remote_fields = client.execute_kw('sale.order', 'fields_get', [[]], {'attributes': ['string']})
+
+        # Crear pedido remoto
+        order_data = {
+            'partner_id': remote_partner_id,
+            'origin': payload['origin'],
+            'date_order': payload['date_order'],
+            'order_line': remote_lines,
+        }
+
+        if 'is_remote_order' in remote_fields:
+            order_data['is_remote_order'] = True  # Marcamos en el destino que es un pedido remoto
+
+        for attachment in payload['attachments']:
+            if 'datas' in attachment and attachment.get('field') in remote_fields:
+                order_data[attachment['field']] = attachment['datas']
+                if attachment.get('filename_field') in remote_fields:
+                    order_data[attachment['filename_field']] = attachment['name']
+
+        if remote_campaign_id and 'campaign_id' in remote_fields:
+            order_data['campaign_id'] = remote_campaign_id
+
+        remote_order_id = client.execute_kw('sale.order', 'create', [order_data])
+
+        # Obtener el nombre del pedido remoto si es posible
+        remote_order_name = client.execute_kw('sale.order', 'read', [[remote_order_id]], {'fields': ['name']})
+        remote_ref = remote_order_name[0].get('name') if remote_order_name else str(remote_order_id)
+        return {'ok': True, 'id': remote_order_id, 'name': remote_ref, 'lines': line_results}
@@ -0,0 +1,161 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+import base64
+import datetime
+import hashlib
+import logging
+
+_logger = logging.getLogger(__name__)
+
+CHUNK_MODEL = 'omni.sync.attachment.chunk'
+# Bytes de archivo por llamada (en base64 viajan ~4/3 de esto)
+ATTACHMENT_CHUNK_SIZE = 256 * 1024
+# Partes de subidas abandonadas que se conservan antes de borrarlas (horas)
+CHUNK_RETENTION_HOURS = 24
+# Tamaño máximo de un adjunto recibido por partes
+MAX_ATTACHMENT_SIZE = 64 * 1024 * 1024
+MAX_CHUNK_COUNT = -(-MAX_ATTACHMENT_SIZE // ATTACHMENT_CHUNK_SIZE)
+
+
+class SyncAttachmentChunk(models.Model):
+    """Partes de un adjunto que otra instancia está subiendo.
+
+    Un adjunto se identifica por el SHA-1 de su contenido (el mismo
+    ``checksum`` de ``ir.attachment``): si ya se recibió, no se vuelve a subir,
+    y una subida interrumpida continúa desde las partes que faltan.
+    """
+    _name = 'omni.sync.attachment.chunk'
+    _description = 'Parte de Adjunto Recibido'
+    _order = 'checksum, sequence'
+
+    checksum = fields.Char(string='Checksum (SHA-1)', required=True, index=True)
+    sequence = fields.Integer(string='Parte', required=True)
+    data = fields.Binary(string='Contenido', attachment=False)
+
+    _sql_constraints = [
+        ('checksum_sequence_uniq', 'unique(checksum, sequence)', 'La parte del adjunto ya fue recibida.'),
+    ]
+
+    @api.model
+    def _get_pending_upload_domain(self):
+        """Adjuntos creados por ``omni_upload_finish`` que todavía no tienen documento."""
+        return [('res_model', '=', self._name), ('res_id', '=', False)]
+
+    @api.model
+    def _find_uploaded_attachment(self, checksum):
+        return self.env['ir.attachment'].sudo().search(
+            [('checksum', '=', checksum)] + self._get_pending_upload_domain(), limit=1)
+
+    @api.model
+    def _get_uploaded_attachment(self, attachment_id, checksum):
+        """Adjunto subido con ``attachment_id`` para un documento recibido.
+
+        Solo se aceptan subidas pendientes de estos endpoints cuyo contenido
+        coincide con ``checksum``: el documento no puede apuntar a otro adjunto
+        de esta base.
+        """
+        attachment = self.env['ir.attachment'].sudo().search(
+            [('id', '=', attachment_id), ('checksum', '=', checksum or False)] + self._get_pending_upload_domain())
+        if not attachment:
+            raise UserError(_('El adjunto %s no es una subida pendiente de esta base.') % attachment_id)
+        return attachment
+
+    @api.model
+    def _check_upload_access(self, chunk_count=None):
+        """Las subidas son parte de la recepción de pedidos: solo para quien
+        puede crearlos. Se verifica antes de pasar a ``sudo``."""
+        self.env['sale.order'].check_access_rights('create')
+        if chunk_count is not None and not 0 < chunk_count <= MAX_CHUNK_COUNT:
+            raise UserError(_('El adjunto supera el tamaño máximo permitido (%s MB).') % (MAX_ATTACHMENT_SIZE // 2 ** 20))
+
+    @api.model
+    def omni_upload_begin(self, checksum, size):
+        """Inicio de una subida: ``{'attachment_id'}`` si el contenido ya está en
+        esta base, o las partes ya recibidas de una subida anterior."""
+        self._check_upload_access()
+        if size > MAX_ATTACHMENT_SIZE:
+            raise UserError(_('El adjunto supera el tamaño máximo permitido (%s MB).') % (MAX_ATTACHMENT_SIZE // 2 ** 20))
+        attachment = self._find_uploaded_attachment(checksum)
+        if attachment:
+            return {'attachment_id': attachment.id}
+        return {'attachment_id': False, 'received': self.sudo().search([('checksum', '=', checksum)]).mapped('sequence')}
+
+    @api.model
+    def omni_upload_chunk(self, checksum, sequence, data):
+        """Guarda una parte (en base64); reenviar la misma parte no tiene efecto."""
+        self._check_upload_access(sequence + 1)
+        if len(data or '') > -(-ATTACHMENT_CHUNK_SIZE // 3) * 4:
+            raise UserError(_('La parte %s del adjunto supera el tamaño de una parte.') % sequence)
+        chunks = self.sudo()
+        if not chunks.search_count([('checksum', '=', checksum), ('sequence', '=', sequence)]):
+            chunks.create({'checksum': checksum, 'sequence': sequence, 'data': data})
+        return True
+
+    @api.model
+    def omni_upload_finish(self, checksum, name, mimetype, chunk_count):
+        """Une las partes, verifica el checksum y crea el adjunto (pendiente, sin
+        documento) que luego se vincula al recibir el pedido. Devuelve su id."""
+        self._check_upload_access(chunk_count)
+        attachment = self._find_uploaded_attachment(checksum)
+        if attachment:
+            return attachment.id
+        chunks = self.sudo().search([('checksum', '=', checksum)])
+        if chunks.mapped('sequence') != list(range(chunk_count)):
+            raise UserError(_('Faltan partes del adjunto %s.') % name)
+        raw = b''.join(base64.b64decode(chunk.data or b'') for chunk in chunks)
+        if hashlib.sha1(raw).hexdigest() != checksum:
+            chunks.unlink()
+            raise UserError(_('El adjunto %s llegó dañado; debe volver a enviarse.') % name)
+        attachment = self.env['ir.attachment'].sudo().create({
+            'name': name,
+            'raw': raw,
+            'mimetype': mimetype,
+            'res_model': self._name,
+        })
+        chunks.unlink()
+        return attachment.id
+
+    @api.autovacuum
+    def _gc_abandoned_chunks(self):
+        limit = fields.Datetime.now() - datetime.timedelta(hours=CHUNK_RETENTION_HOURS)
+        self.sudo().search([('create_date', '<', limit)]).unlink()
+        # Subidas nunca vinculadas o ya copiadas al campo de sus documentos
+        self.env['ir.attachment'].sudo().search(
+            [('create_date', '<', limit)] + self._get_pending_upload_domain()).unlink()
+
+
+class SyncConfig(models.Model):
+    _inherit = 'omni.sync.config'
+
+    def _upload_payload_attachments(self, client, payload):
+        """Sube por partes los adjuntos del documento y los reemplaza por su id remoto.
+
+        Así la llamada que crea el documento no depende del tamaño de los
+        archivos, y un reintento no reenvía lo que el remoto ya tiene. Con un
+        remoto sin estos endpoints los adjuntos siguen viajando dentro del
+        documento.
+        """
+        self.ensure_one()
+        for attachment in payload.get('attachments', ()):
+            if 'datas' not in attachment:
+                continue
+            raw = base64.b64decode(attachment['datas'])
+            checksum = hashlib.sha1(raw).hexdigest()
+            upload = self._call_optional_endpoint(client, CHUNK_MODEL, 'omni_upload_begin', [checksum, len(raw)])
+            if upload is None:
+                return
+            attachment_id = upload['attachment_id']
+            if not attachment_id:
+                received = set(upload['received'])
+                chunk_count = max(1, -(-len(raw) // ATTACHMENT_CHUNK_SIZE))
+                for sequence in range(chunk_count):
+                    if sequence in received:
+                        continue
+                    chunk = raw[sequence * ATTACHMENT_CHUNK_SIZE:(sequence + 1) * ATTACHMENT_CHUNK_SIZE]
+                    client.execute_kw(CHUNK_MODEL, 'omni_upload_chunk',
+                                      [checksum, sequence, base64.b64encode(chunk).decode()])
+                attachment_id = client.execute_kw(CHUNK_MODEL, 'omni_upload_finish',
+                                                  [checksum, attachment['name'], attachment.get('mimetype'), chunk_count])
+                _logger.info("Adjunto %s subido a %s en %s partes", attachment['name'], self.name, chunk_count)
+            del attachment['datas']
+            attachment.update(attachment_id=attachment_id, checksum=checksum)
@@ -0,0 +1,128 @@
+from odoo import models, fields, _
+import datetime
+import logging
+
+from ..tools.circuit_breaker import CLOSED, get_breaker
+
+_logger = logging.getLogger(__name__)
+
+CIRCUIT_STATES = [
+    ('closed', 'Operativa'),
+    ('half_open', 'En Prueba'),
+    ('open', 'Suspendida'),
+]
+
+
+def _persist_breaker(registry, config_id, breaker):
+    """Guarda el estado del breaker con un cursor propio.
+
+    Se escribe en ``omni.sync.circuit`` y no en la conexión para no chocar con
+    la transacción de la sincronización, que actualiza ``omni.sync.config``:
+    el estado queda registrado aunque esa transacción termine en rollback.
+    """
+    opened_at = None
+    if breaker.opened_at:
+        opened_at = datetime.datetime.fromtimestamp(breaker.opened_at, datetime.timezone.utc).replace(tzinfo=None)
+    try:
+        with registry.cursor() as cr:
+            cr.execute("""
+                INSERT INTO omni_sync_circuit (config_id, state, failure_count, opened_at, create_date, write_date)
+                     VALUES (%(config_id)s, %(state)s, %(failures)s, %(opened_at)s,
+                             NOW() AT TIME ZONE 'UTC', NOW() AT TIME ZONE 'UTC')
+                ON CONFLICT (config_id) DO UPDATE
+                        SET state = EXCLUDED.state,
+                            failure_count = EXCLUDED.failure_count,
+                            opened_at = EXCLUDED.opened_at,
+                            write_date = EXCLUDED.write_date
+            """, {'config_id': config_id, 'state': breaker.state, 'failures': breaker.failures, 'opened_at': opened_at})
+    except Exception:
+        _logger.warning("No se pudo guardar el estado del circuito de la conexión %s", config_id, exc_info=True)
+
+
+class SyncCircuit(models.Model):
+    _name = 'omni.sync.circuit'
+    _description = 'Estado del Circuito de Conexión Remota'
+    _rec_name = 'config_id'
+
+    config_id = fields.Many2one('omni.sync.config', string='Configuración', required=True, ondelete='cascade')
+    state = fields.Selection(CIRCUIT_STATES, string='Estado', default='closed', required=True)
+    failure_count = fields.Integer(string='Fallos Consecutivos')
+    opened_at = fields.Datetime(string='Suspendida Desde')
+
+    _sql_constraints = [
+        ('config_uniq', 'unique(config_id)', 'Cada conexión tiene un único estado de circuito.'),
+    ]
+
+
+class SyncConfig(models.Model):
+    _inherit = 'omni.sync.config'
+
+    circuit_failure_threshold = fields.Integer(
+        string='Fallos para Suspender',
+        default=5,
+        help="Cantidad de errores de red o timeouts seguidos tras los cuales se suspenden las llamadas a esta conexión. Mientras está suspendida, cada llamada falla de inmediato en lugar de esperar el timeout."
+    )
+    circuit_reset_timeout = fields.Integer(
+        string='Espera antes de Reintentar (seg)',
+        default=60,
+        help="Tiempo que la conexión permanece suspendida antes de permitir una llamada de prueba. Si la prueba funciona se reanuda; si falla, se suspende otra vez."
+    )
+    rpc_max_retries = fields.Integer(
+        string='Reintentos de Lectura',
+        default=2,
+        help="Reintentos de las llamadas de solo lectura ante errores de red, con espera exponencial aleatoria. Las escrituras nunca se reintentan."
+    )
+    circuit_state = fields.Selection(CIRCUIT_STATES, string='Estado del Circuito', compute='_compute_circuit_state')
+    circuit_failure_count = fields.Integer(string='Fallos Consecutivos', compute='_compute_circuit_state')
+    circuit_opened_at = fields.Datetime(string='Suspendida Desde', compute='_compute_circuit_state')
+
+    def _compute_circuit_state(self):
+        circuits = self.env['omni.sync.circuit'].sudo().search([('config_id', 'in', self.ids)])
+        by_config = {circuit.config_id.id: circuit for circuit in circuits}
+        for config in self:
+            circuit = by_config.get(config.id)
+            config.circuit_state = circuit.state if circuit else 'closed'
+            config.circuit_failure_count = circuit.failure_count if circuit else 0
+            config.circuit_opened_at = circuit.opened_at if circuit else False
+
+    def _get_circuit_breaker(self):
+        """Breaker en memoria de la conexión, compartido por los hilos del proceso.
+
+        Al crearlo se parte del último estado guardado, de modo que un worker
+        nuevo no vuelve a esperar timeouts contra un remoto que otro ya dio por caído.
+        """
+        self.ensure_one()
+        registry, config_id = self.pool, self.id
+        breaker, created = get_breaker(
+            (self.env.cr.dbname, config_id),
+            max(1, self.circuit_failure_threshold),
+            max(0, self.circuit_reset_timeout),
+        )
+        if created:
+            breaker.on_change = lambda b: _persist_breaker(registry, config_id, b)
+            circuit = self.env['omni.sync.circuit'].sudo().search([('config_id', '=', config_id)])
+            if circuit and circuit.state != CLOSED and circuit.opened_at:
+                breaker.restore(circuit.state, circuit.failure_count,
+                                circuit.opened_at.replace(tzinfo=datetime.timezone.utc).timestamp())
+        return breaker
+
+    def _get_rpc_client(self):
+        client = super()._get_rpc_client()
+        client.breaker = self._get_circuit_breaker()
+        client.max_retries = max(0, self.rpc_max_retries)
+        return client
+
+    def action_reset_circuit(self):
+        """Reanuda manualmente las llamadas a la conexión (el estado se guarda por el breaker)."""
+        for config in self:
+            config._get_circuit_breaker().reset()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Conexión reanudada'),
+                'message': _('Las llamadas al servidor remoto se reanudaron.'),
+                'type': 'success',
+                'sticky': False,
+            },
+        }
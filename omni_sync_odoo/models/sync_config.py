@@ -1,9 +1,20 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+import contextlib
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+import zlib
+
+from ..tools.profiling import profiled
+from ..tools.rpc_client import RemoteClient
 
 _logger = logging.getLogger(__name__)
 
+# Espacio de nombres de los advisory locks de PostgreSQL (el segundo entero es el id de la conexión)
+SYNC_LOCK_NAMESPACE = zlib.crc32(b'omni.sync.config') & 0x7fffffff
+
 class ProductPricelist(models.Model):
     _inherit = 'product.pricelist'
 
@@ -89,6 +100,22 @@ class SyncConfig(models.Model):
         default=120,
         help="Tiempo máximo de espera para la respuesta del servidor remoto antes de cancelar la operación."
     )
+    rpc_slow_threshold = fields.Float(
+        string='Umbral Llamada Lenta (seg)',
+        default=5.0,
+        help="Las llamadas al remoto que tarden más que este valor se registran en el log del servidor. Use 0 para desactivarlo."
+    )
+    rpc_protocol = fields.Selection([
+        ('xmlrpc', 'XML-RPC'),
+        ('jsonrpc', 'JSON-RPC')
+    ], string='Protocolo', default='xmlrpc', required=True,
+        help="Protocolo usado para todas las llamadas al remoto. JSON-RPC es más compacto y rápido de procesar con imágenes y lecturas grandes."
+    )
+    rpc_gzip = fields.Boolean(
+        string='Comprimir Peticiones (gzip)',
+        default=False,
+        help="Comprime con gzip las peticiones grandes. Requiere que el servidor remoto o su proxy acepten peticiones comprimidas; las respuestas comprimidas se aceptan siempre."
+    )
     
     # Configuración específica de compras
     auto_confirm_po = fields.Boolean(
@@ -97,6 +124,23 @@ class SyncConfig(models.Model):
         help="Si se activa, las órdenes de compra creadas en el remoto se confirmarán automáticamente pasando a estado 'Orden de Compra'."
     )
     
+    cron_time_budget = fields.Integer(
+        string='Tiempo Máximo por Ejecución (seg)',
+        default=900,
+        help="Tiempo máximo que la sincronización automática dedica a esta conexión en cada ejecución. Si se agota, el proceso guarda el punto de continuación y se reprograma para seguir."
+    )
+    sync_resume_state = fields.Json(
+        string='Punto de Continuación',
+        readonly=True,
+        copy=False,
+        help="Posición en la que se detuvo la última sincronización automática por falta de tiempo."
+    )
+    profile_next_run = fields.Boolean(
+        string='Perfilar Próxima Ejecución',
+        default=False,
+        help="Captura un perfil de rendimiento (cProfile) de la próxima sincronización de productos o imágenes y lo adjunta a su log. Se desactiva solo después de usarse."
+    )
+    
     active = fields.Boolean(
         string='Activo', 
         default=True,
@@ -139,103 +183,83 @@ class SyncConfig(models.Model):
         help="Total de órdenes de compra generadas en el remoto a partir de facturas locales."
     )
 
-    def _get_xmlrpc_proxies(self):
+    def _get_rpc_client(self):
+        """Devuelve el cliente instrumentado con el que se hacen todas las llamadas al remoto."""
         self.ensure_one()
-        import xmlrpc.client
-
-        url = (self.remote_url or '').strip().rstrip('/')
-
-        if not url.startswith('http'):
-            url = 'https://' + url
-
-        common = xmlrpc.client.ServerProxy(
-            f"{url}/xmlrpc/2/common",
-            allow_none=True
-        )
-
-        models = xmlrpc.client.ServerProxy(
-            f"{url}/xmlrpc/2/object",
-            allow_none=True
-        )
-
-        return common, models
-
-    def _get_remote_connection(self):
-        self.ensure_one()
-
-        common, models = self._get_xmlrpc_proxies()
-
-        uid = common.authenticate(
+        return RemoteClient(
+            self.remote_url,
             self.remote_database,
             self.remote_username,
             self.remote_password,
-            {}
+            timeout=self.timeout,
+            slow_threshold=self.rpc_slow_threshold,
+            label=self.name,
+            protocol=self.rpc_protocol or 'xmlrpc',
+            gzip_requests=self.rpc_gzip,
         )
 
-        if not uid:
+    def _get_remote_connection(self):
+        self.ensure_one()
+
+        client = self._get_rpc_client()
+        if not client.authenticate():
             raise ValidationError('Autenticación fallida contra la base remota. Verifique URL, Base de Datos, Usuario y Contraseña.')
 
-        return uid, models
+        return client
 
     def update_stats(self):
         """Actualiza las estadísticas de forma manual o tras una sincronización para no ralentizar el tablero"""
-        for record in self:
-            # Imágenes y Precios desde logs
-            log_data = self.env['sync.pictures.log'].search([('config_id', '=', record.id)])
-            
-            # Ventas sincronizadas hacia este remoto (usando el log o referencia)
-            sales_count = self.env['sale.order'].search_count([
-                ('is_synced', '=', True),
-                '|',
-                ('sync_log', 'like', f'>{record.remote_database}<'),
-                ('sync_log', 'like', f'>{record.name}<')
-            ])
-            
-            # Compras creadas desde facturas para este remoto
-            purchases_count = self.env['account.move'].search_count([
-                ('move_type', '=', 'out_invoice'),
-                ('is_synced', '=', True),
-                ('sync_log', 'like', f'>{record.name}<')
-            ])
+        # Agregados en una consulta por modelo para todas las conexiones a la vez
+        log_stats = {}
+        for config, sync_type, synced, pricelists in self.env['sync.pictures.log']._read_group(
+            [('config_id', 'in', self.ids)],
+            ['config_id', 'sync_type'],
+            ['products_synced:sum', 'pricelists_synced:sum'],
+        ):
+            images, total_pricelists = log_stats.get(config.id, (0, 0))
+            if sync_type == 'images':
+                images += synced or 0
+            log_stats[config.id] = (images, total_pricelists + (pricelists or 0))
+        sales_stats = {
+            config.id: count
+            for config, count in self.env['sale.order']._read_group(
+                [('is_synced', '=', True), ('sync_config_id', 'in', self.ids)],
+                ['sync_config_id'],
+                ['__count'],
+            )
+        }
+        purchases_stats = {
+            config.id: count
+            for config, count in self.env['account.move']._read_group(
+                [('move_type', '=', 'out_invoice'), ('is_synced', '=', True), ('sync_config_id', 'in', self.ids)],
+                ['sync_config_id'],
+                ['__count'],
+            )
+        }
 
+        for record in self:
+            images, pricelists = log_stats.get(record.id, (0, 0))
             record.write({
                 'total_synced_products': record._get_remote_product_count(),
-                'total_synced_images': sum(log_data.mapped('products_synced')),
-                'total_synced_pricelists': sum(log_data.mapped('pricelists_synced')),
-                'total_synced_sales': sales_count,
-                'total_synced_purchases': purchases_count,
+                'total_synced_images': images or 0,
+                'total_synced_pricelists': pricelists or 0,
+                'total_synced_sales': sales_stats.get(record.id, 0),
+                'total_synced_purchases': purchases_stats.get(record.id, 0),
             })
     
     def _get_remote_product_count(self):
         self.ensure_one()
 
         try:
-            # Obtener proxies XML-RPC centralizados
-            common, models = self._get_xmlrpc_proxies()
-
-            # Autenticación
-            uid = common.authenticate(
-                self.remote_database,
-                self.remote_username,
-                self.remote_password,
-                {}
-            )
-
-            if not uid:
-                raise Exception('No fue posible autenticar con la base de datos remota')
+            client = self._get_remote_connection()
 
             # Contar productos (product.template)
-            product_count = models.execute_kw(
-                self.remote_database,
-                uid,
-                self.remote_password,
+            return client.execute_kw(
                 'product.template',
                 'search_count',
                 [[('active', '=', True)]]
             )
 
-            return product_count
-
         except Exception as e:
             _logger.error(
                 'Error obteniendo cantidad de productos remotos [%s]: %s',
@@ -245,49 +269,105 @@ class SyncConfig(models.Model):
             )
             return 0
 
-    def _sync_products_from_remote(self, batch_size=100):
+    def _consume_profile_flag(self):
+        """Indica si esta ejecución debe perfilarse y desactiva el indicador para las siguientes."""
         self.ensure_one()
+        if not self.profile_next_run:
+            return False
+        self.sudo().profile_next_run = False
+        return True
 
-        uid, models_proxy = self._get_remote_connection()
+    def _sync_products_from_remote(self, batch_size=100, execution_type='manual', offset=0, deadline=None, domain=None):
+        """Importa los productos del remoto registrando la ejecución en un log.
 
+        Con ``deadline`` (timestamp) la descarga se detiene al agotar el tiempo y
+        el resultado incluye ``next_offset`` para continuar en otra ejecución.
+        ``domain`` acota los productos remotos (por ejemplo a un rango de ids).
+        """
+        self.ensure_one()
+
+        start_time = time.time()
+        client = self._get_remote_connection()
+        log = self.env['sync.pictures.log'].create({
+            'config_id': self.id,
+            'sync_type': 'products',
+            'status': 'in_progress',
+            'execution_type': execution_type,
+        })
+
+        failure = None
+        with profiled(self._consume_profile_flag()) as profiler:
+            try:
+                with self.env.cr.savepoint():
+                    res = self._pull_remote_products(client, batch_size, offset=offset, deadline=deadline, domain=domain)
+            except Exception as e:
+                failure = e
+        if failure:
+            # El perfil va con el fallo: es la ejecución que más interesa revisar
+            log._record_failure(failure, profiler, duration=time.time() - start_time,
+                                **log._rpc_stats_values(client.stats))
+            self.env['sync.dead.letter']._capture('product_pull', self, self, failure, payload={
+                'batch_size': batch_size,
+                'offset': offset,
+                'domain': domain,
+            })
+            raise failure
+        if profiler:
+            log._attach_profile(profiler)
+
+        log.write({
+            'status': 'partial' if res['next_offset'] is not None else 'completed',
+            'total_products': res['created'] + res['updated'] + res['skipped'],
+            'products_synced': res['created'] + res['updated'],
+            'products_skipped': res['skipped'],
+            'duration': time.time() - start_time,
+            **log._rpc_stats_values(client.stats),
+        })
+        self.env['sync.dead.letter']._resolve('product_pull', self, self)
+
+        res.update(rpc=client.stats.totals, log_id=log.id)
+        return res
+
+    def _pull_remote_products(self, client, batch_size, offset=0, deadline=None, domain=None):
+        """Descarga los productos activos del remoto por lotes y los crea o actualiza localmente."""
         Product = self.env['product.product']
-        offset = 0
+        next_offset = None
         total_created = 0
         total_updated = 0
+        total_skipped = 0
 
         while True:
-            try:
-                remote_products = models_proxy.execute_kw(
-                    self.remote_database,
-                    uid,
-                    self.remote_password,
-                    'product.product',
-                    'search_read',
-                    [[('active', '=', True)]],
-                    {
-                        'fields': [
-                            'name',
-                            'default_code',
-                            'barcode',
-                            'list_price',
-                            'standard_price',
-                            'type'
-                        ],
-                        'limit': batch_size,
-                        'offset': offset
-                    }
-                )
-
-            except Exception as e:
-                raise UserError(_(
-                    "Error obteniendo productos remotos:\n%s"
-                ) % str(e))
-
-            if not remote_products:
-                break
+            # Lectura en streaming: se procesa cada producto a medida que llega
+            remote_products = client.iter_search_read(
+                'product.product',
+                [('active', '=', True)] + (domain or []),
+                [
+                    'name',
+                    'default_code',
+                    'barcode',
+                    'list_price',
+                    'standard_price',
+                    'type'
+                ],
+                offset=offset,
+                limit=batch_size,
+                order='id',
+            )
+            received = 0
+
+            while True:
+                try:
+                    rp = next(remote_products, None)
+                except Exception as e:
+                    raise UserError(_(
+                        "Error obteniendo productos remotos:\n%s"
+                    ) % str(e))
+                if rp is None:
+                    break
+                received += 1
 
-            for rp in remote_products:
                 if not rp.get('default_code'):
+                    total_skipped += 1
                     continue  # clave para evitar duplicados malos
 
                 local_product = Product.search(
@@ -311,11 +391,20 @@ class SyncConfig(models.Model):
                     Product.create(vals)
                     total_created += 1
 
+            if not received:
+                break
+
             offset += batch_size
 
+            if deadline and time.time() >= deadline:
+                next_offset = offset
+                break
+
         return {
             'created': total_created,
-            'updated': total_updated
+            'updated': total_updated,
+            'skipped': total_skipped,
+            'next_offset': next_offset,
         }
 
     @api.constrains('remote_url')
@@ -327,14 +416,8 @@ class SyncConfig(models.Model):
     def test_connection(self):
         """Prueba la conexión con el servidor remoto y devuelve una notificación al usuario."""
         try:
-            common, _models = self._get_xmlrpc_proxies()
-            uid = common.authenticate(
-                self.remote_database,
-                self.remote_username,
-                self.remote_password,
-                {}
-            )
-            if uid:
+            client = self._get_rpc_client()
+            if client.authenticate():
                 return {
                     'type': 'ir.actions.client',
                     'tag': 'display_notification',
@@ -372,15 +455,209 @@ class SyncConfig(models.Model):
         """Alias para el método llamado desde la vista si es necesario"""
         return self.action_sync_images_now()
 
+    @api.model
+    def cron_sync_all(self):
+        """Ejecución programada: sincroniza los tipos habilitados de cada conexión activa."""
+        self._run_cron(self.search([('active', '=', True)]))
+
+    @api.model
+    def cron_sync_continue(self):
+        """Continúa únicamente las conexiones que quedaron a medias por límite de tiempo."""
+        self._run_cron(self.search([('active', '=', True), ('sync_resume_state', '!=', False)]))
+
+    @api.model
+    def _run_cron(self, configs):
+        summary = configs._run_in_parallel('_run_sync', execution_type='auto')
+        if any(result.get('pending') for result in summary['results'].values()):
+            self.env.ref('omni_sync_odoo.ir_cron_omni_sync_continue')._trigger()
+        return summary
+
+    @api.model
+    def _get_max_parallel_syncs(self):
+        """Límite global de conexiones sincronizadas a la vez (parámetro del sistema)."""
+        value = self.env['ir.config_parameter'].sudo().get_param('omni_sync_odoo.max_parallel_syncs', '4')
+        try:
+            return max(1, int(value))
+        except ValueError:
+            return 4
+
+    def _get_batch_size(self, default):
+        """Tamaño de lote de la conexión; ``omni_sync_batch_size`` en el contexto
+        lo reemplaza para una ejecución sin modificar la configuración."""
+        self.ensure_one()
+        return self.env.context.get('omni_sync_batch_size') or self.batch_size or default
+
+    def _run_in_parallel(self, method_name, **kwargs):
+        """Ejecuta ``method_name`` para cada conexión, cada una en su hilo y con su propio cursor.
+
+        Las conexiones son independientes entre sí, así que el tiempo total se
+        acerca al de la conexión más lenta. Cada hilo confirma su propia
+        transacción; un error en una conexión no afecta a las demás. Devuelve un
+        resumen con el resultado y la duración de cada conexión.
+        """
+        start_time = time.time()
+        results = {}
+        durations = {}
+
+        def run(config, scope):
+            config_start = time.time()
+            try:
+                # El error debe salir del ``scope`` (savepoint) para que deshaga lo escrito
+                with scope:
+                    result = getattr(config, method_name)(**kwargs)
+            except Exception as e:
+                _logger.exception("Error sincronizando la conexión %s", config.name)
+                result = {'error': str(e)}
+            return result if isinstance(result, dict) else {'result': result}, time.time() - config_start
+
+        def worker(config_id):
+            thread = threading.current_thread()
+            thread.dbname = self.env.cr.dbname
+            thread.uid = self.env.uid
+            with self.pool.cursor() as cr:
+                env = api.Environment(cr, self.env.uid, self.env.context)
+                result, duration = run(env['omni.sync.config'].browse(config_id), contextlib.nullcontext())
+                if 'error' in result:
+                    cr.rollback()
+                return result, duration
+
+        max_workers = min(self._get_max_parallel_syncs(), len(self))
+        if max_workers <= 1 or getattr(threading.current_thread(), 'testing', False):
+            # En pruebas (o con un solo hilo) se ejecuta en la transacción actual
+            for config in self:
+                results[config.id], durations[config.id] = run(config, self.env.cr.savepoint())
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='omni_sync') as executor:
+                futures = {executor.submit(worker, config_id): config_id for config_id in self.ids}
+                for future in as_completed(futures):
+                    config_id = futures[future]
+                    try:
+                        results[config_id], durations[config_id] = future.result()
+                    except Exception as e:
+                        _logger.exception("Error en el hilo de sincronización de la conexión %s", config_id)
+                        results[config_id], durations[config_id] = {'error': str(e)}, 0.0
+
+        return {
+            'results': results,
+            'durations': durations,
+            'duration': time.time() - start_time,
+            'slowest': max(durations.values(), default=0.0),
+            'failed': [
+                config_id for config_id, result in results.items()
+                if 'error' in result or any(isinstance(step, dict) and 'error' in step for step in result.values())
+            ],
+        }
+
+    def _try_sync_lock(self):
+        """Toma el advisory lock de la conexión hasta el final de la transacción."""
+        self.ensure_one()
+        self.env.cr.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", (SYNC_LOCK_NAMESPACE, self.id))
+        return self.env.cr.fetchone()[0]
+
+    def _run_sync(self, execution_type='auto', use_budget=True):
+        """Ejecuta los tipos de sincronización habilitados de la conexión.
+
+        Si otra ejecución tiene tomada la conexión se omite. Con ``use_budget``
+        se respeta ``cron_time_budget``: al agotarse se guarda el punto de
+        continuación en ``sync_resume_state`` y se devuelve ``pending=True``.
+        Un paso que devuelve ``{'sync_run_id': ...}`` quedó delegado a una
+        ejecución repartida: la fecha de última sincronización la fija esa
+        ejecución al terminar.
+        """
+        self.ensure_one()
+        if not self._try_sync_lock():
+            _logger.info("Sincronización de %s omitida: ya hay otra ejecución en curso", self.name)
+            return {'locked': True}
+
+        deadline = time.time() + (self.cron_time_budget or 900) if use_budget else None
+        state = dict(self.sync_resume_state or {})
+        result = {}
+        delegated = False
+
+        steps = []
+        if self.sync_products:
+            steps.append(('products', self._scheduled_sync_products))
+        if self.sync_images:
+            steps.append(('images', self._scheduled_sync_images))
+        if self.sync_pricelists:
+            steps.append(('pricelists', self._scheduled_sync_pricelists))
+
+        for key, step in steps:
+            if deadline and time.time() >= deadline:
+                state.setdefault(key, {})
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    resume = step(state.get(key), deadline, execution_type)
+            except Exception as e:
+                _logger.exception("Error en la sincronización automática de %s (%s)", self.name, key)
+                # No se reintenta de inmediato: la próxima ejecución programada empieza de nuevo
+                state.pop(key, None)
+                result[key] = {'error': str(e)}
+                continue
+            if resume is None:
+                state.pop(key, None)
+                result[key] = {'status': 'completed'}
+            elif resume.get('sync_run_id'):
+                delegated = True
+                state.pop(key, None)
+                result[key] = {'status': 'planned', 'sync_run_id': resume['sync_run_id']}
+            else:
+                state[key] = resume
+                result[key] = {'status': 'partial'}
+
+        pending = bool(state)
+        values = {'sync_resume_state': state or False}
+        if not pending and not delegated:
+            values['last_sync_date'] = fields.Datetime.now()
+        self.write(values)
+        self.update_stats()
+        result['pending'] = pending
+        return result
+
+    def _scheduled_sync_products(self, resume, deadline, execution_type):
+        res = self._sync_products_from_remote(
+            batch_size=self._get_batch_size(100),
+            execution_type=execution_type,
+            offset=(resume or {}).get('offset', 0),
+            deadline=deadline,
+        )
+        return {'offset': res['next_offset']} if res['next_offset'] is not None else None
+
+    def _scheduled_sync_images(self, resume, deadline, execution_type):
+        wizard = self.env['sync.pictures.wizard'].create({
+            'config_id': self.id,
+            'execution_type': execution_type,
+        })
+        client = self._get_remote_connection()
+        return wizard._run_image_sync(client, deadline=deadline, resume=resume)
+
+    def _scheduled_sync_pricelists(self, resume, deadline, execution_type):
+        # Solo se envían las diferencias, así que una ejecución completa es corta
+        self._sync_pricelists_to_remote(execution_type=execution_type)
+        return None
+
     def action_manual_sync(self):
-        """Sincroniza todo lo habilitado"""
-        for record in self:
-            if record.sync_products:
-                record._sync_products_from_remote()
-            if record.sync_images:
-                record.action_sync_images_now()
-            record.update_stats()
-        return True
+        """Sincroniza todo lo habilitado, con las conexiones en paralelo"""
+        summary = self._run_in_parallel('_run_sync', execution_type='manual', use_budget=False)
+        failed = self.browse(summary['failed'])
+        locked = self.browse([config_id for config_id, result in summary['results'].items() if result.get('locked')])
+        message = _('%s conexiones sincronizadas en %.2f seg (la más lenta: %.2f seg).') % (
+            len(self) - len(failed) - len(locked), summary['duration'], summary['slowest'])
+        if locked:
+            message += ' ' + _('En curso por otra ejecución: %s.') % ', '.join(locked.mapped('name'))
+        if failed:
+            message += ' ' + _('Con errores: %s.') % ', '.join(failed.mapped('name'))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Sincronización Completa'),
+                'message': message,
+                'type': 'warning' if failed or locked else 'success',
+                'sticky': bool(failed),
+            }
+        }
 
     def action_sync_products_to_remote(self):
         """Sincroniza productos desde el remoto"""
@@ -392,13 +669,24 @@ class SyncConfig(models.Model):
             'tag': 'display_notification',
             'params': {
                 'title': _('Sincronización de Productos'),
-                'message': _('Creados: %s, Actualizados: %s') % (res['created'], res['updated']),
+                'message': _('Creados: %s, Actualizados: %s (%s llamadas RPC en %.2f seg)') % (
+                    res['created'], res['updated'], res['rpc']['call_count'], res['rpc']['time']),
                 'type': 'success',
             }
         }
 
     def action_sync_pricelists_to_remote(self):
-        """Sincroniza listas de precios (Placeholder o implementación básica)"""
+        """Envía al remoto las listas de precios marcadas y los cambios en sus reglas"""
         self.ensure_one()
-        # Aquí iría la lógica de listas de precios si se requiere
-        return True
+        res = self._sync_pricelists_to_remote()
+        self.update_stats()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Sincronización de Listas de Precios'),
+                'message': _('Listas sincronizadas: %s, Fallidas: %s (%s llamadas RPC en %.2f seg)') % (
+                    res['synced'], res['failed'], res['rpc']['call_count'], res['rpc']['time']),
+                'type': 'warning' if res['failed'] else 'success',
+            }
+        }
@@ -0,0 +1,328 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+import datetime
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Errores resueltos o descartados que se conservan antes de borrarlos (días)
+DEAD_LETTER_RETENTION_DAYS = 30
+
+OPERATIONS = [
+    ('sale_order', 'Pedido de Venta'),
+    ('purchase', 'Orden de Compra'),
+    ('purchase_batch', 'Compra Consolidada'),
+    ('product_pull', 'Descarga de Productos'),
+    ('pricelist', 'Lista de Precios'),
+]
+
+
+def _error_class(error):
+    """Nombre completo de la clase del error, para agrupar la cola por tipo."""
+    cls = type(error)
+    return cls.__qualname__ if cls.__module__ == 'builtins' else f'{cls.__module__}.{cls.__qualname__}'
+
+
+def _strip_payload(payload):
+    """Copia del documento enviado sin el contenido de los adjuntos (se regenera al reintentar)."""
+    if not isinstance(payload, dict) or not payload.get('attachments'):
+        return payload
+    return dict(payload, attachments=[
+        {key: value for key, value in attachment.items() if key != 'datas'}
+        for attachment in payload['attachments']
+    ])
+
+
+class SyncDeadLetter(models.Model):
+    """Operación de sincronización fallida pendiente de reintento.
+
+    Hay a lo sumo un registro pendiente por operación, documento y conexión:
+    cada fallo nuevo actualiza el error y suma un intento, y un envío exitoso
+    (normal o desde la cola) lo marca como resuelto.
+    """
+    _name = 'sync.dead.letter'
+    _description = 'Cola de Errores de Sincronización'
+    _order = 'last_attempt_date desc, id desc'
+
+    config_id = fields.Many2one('omni.sync.config', string='Conexión', required=True, ondelete='cascade', index=True)
+    operation = fields.Selection(OPERATIONS, string='Operación', required=True, index=True)
+    res_model = fields.Char(string='Modelo Origen', required=True)
+    res_id = fields.Many2oneReference(string='ID Origen', model_field='res_model', required=True, index=True)
+    payload = fields.Json(string='Datos Enviados')
+    error_class = fields.Char(string='Tipo de Error', index=True)
+    error_message = fields.Text(string='Mensaje de Error')
+    attempt_count = fields.Integer(string='Intentos', default=1)
+    last_attempt_date = fields.Datetime(string='Último Intento', default=fields.Datetime.now)
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('resolved', 'Resuelto'),
+        ('discarded', 'Descartado'),
+    ], string='Estado', default='pending', required=True, index=True)
+    resolved_date = fields.Datetime(string='Fecha de Resolución', readonly=True)
+
+    @api.depends('res_model', 'res_id')
+    def _compute_display_name(self):
+        for letter in self:
+            record = letter._get_record()
+            letter.display_name = record.display_name if record else f'{letter.res_model},{letter.res_id}'
+
+    def _get_record(self):
+        self.ensure_one()
+        if self.res_model not in self.env:
+            return None
+        return self.env[self.res_model].browse(self.res_id).exists()
+
+    def _key_domain(self, operation, record, config):
+        return [
+            ('operation', '=', operation),
+            ('res_model', '=', record._name),
+            ('res_id', '=', record.id),
+            ('config_id', '=', config.id),
+            ('state', '=', 'pending'),
+        ]
+
+    @api.model
+    def _capture(self, operation, record, config, error, payload=None):
+        """Registra el fallo de ``operation`` sobre ``record`` con un cursor propio.
+
+        Quien llama suele relanzar el error y deshacer su transacción; el
+        registro debe sobrevivir a ese rollback, igual que el estado del breaker.
+        """
+        record.ensure_one()
+        values = {
+            'error_class': _error_class(error),
+            'error_message': str(error),
+            'last_attempt_date': fields.Datetime.now(),
+        }
+        if payload is not None:
+            values['payload'] = _strip_payload(payload)
+        try:
+            with self.env.registry.cursor() as cr:
+                DeadLetter = self.env(cr=cr)['sync.dead.letter'].sudo()
+                letter = DeadLetter.search(self._key_domain(operation, record, config), limit=1)
+                if letter:
+                    letter.write(dict(values, attempt_count=letter.attempt_count + 1))
+                else:
+                    DeadLetter.create(dict(
+                        values,
+                        operation=operation,
+                        res_model=record._name,
+                        res_id=record.id,
+                        config_id=config.id,
+                    ))
+        except Exception:
+            _logger.warning("No se pudo registrar en la cola de errores el fallo de %s", record, exc_info=True)
+
+    @api.model
+    def _resolve(self, operation, records, config):
+        """Marca como resueltos los fallos pendientes de ``records`` tras un envío exitoso."""
+        if not records:
+            return
+        letters = self.sudo().search([
+            ('operation', '=', operation),
+            ('res_model', '=', records._name),
+            ('res_id', 'in', records.ids),
+            ('config_id', '=', config.id),
+            ('state', '=', 'pending'),
+        ])
+        letters.write({'state': 'resolved', 'resolved_date': fields.Datetime.now()})
+
+    def action_replay(self):
+        """Reintenta los fallos seleccionados: las conexiones en paralelo (hasta
+        ``omni_sync_odoo.max_parallel_syncs`` a la vez) y, dentro de cada una,
+        los documentos agrupados en las mismas llamadas de envío en bloque."""
+        letters = self.filtered(lambda l: l.state == 'pending')
+        if not letters:
+            raise UserError(_('No hay errores pendientes seleccionados.'))
+        summary = letters.config_id._run_in_parallel('_replay_dead_letters', letter_ids=letters.ids)
+        results = summary['results'].values()
+        resolved = sum(result.get('resolved', 0) for result in results)
+        failed = len(letters) - resolved
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Reintento completado'),
+                'message': _('%(resolved)s operaciones resueltas, %(failed)s siguen fallando (%(seconds).2f seg).') % {
+                    'resolved': resolved,
+                    'failed': failed,
+                    'seconds': summary['duration'],
+                },
+                'type': 'warning' if failed else 'success',
+                'sticky': False,
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
+
+    def action_discard(self):
+        self.filtered(lambda l: l.state == 'pending').write({
+            'state': 'discarded',
+            'resolved_date': fields.Datetime.now(),
+        })
+
+    def action_open_document(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self.res_model,
+            'res_id': self.res_id,
+            'view_mode': 'form',
+        }
+
+    @api.autovacuum
+    def _gc_closed_letters(self):
+        limit = fields.Datetime.now() - datetime.timedelta(days=DEAD_LETTER_RETENTION_DAYS)
+        self.sudo().search([('state', '!=', 'pending'), ('resolved_date', '<', limit)]).unlink()
+
+
+class SyncConfig(models.Model):
+    _inherit = 'omni.sync.config'
+
+    dead_letter_count = fields.Integer(string='Errores Pendientes', compute='_compute_dead_letter_count')
+
+    def _compute_dead_letter_count(self):
+        counts = dict(self.env['sync.dead.letter']._read_group(
+            [('config_id', 'in', self.ids), ('state', '=', 'pending')], ['config_id'], ['__count'],
+        ))
+        for config in self:
+            config.dead_letter_count = counts.get(config, 0)
+
+    def _replay_dead_letters(self, letter_ids):
+        """Reintenta los fallos pendientes de la conexión con un único cliente
+        autenticado. Un documento que vuelve a fallar suma un intento en su
+        registro; los que ya no existen se descartan."""
+        self.ensure_one()
+        letters = self.env['sync.dead.letter'].browse(letter_ids).filtered(
+            lambda l: l.config_id == self and l.state == 'pending')
+        missing = letters.filtered(lambda l: not l._get_record())
+        missing.action_discard()
+        letters -= missing
+        if not letters:
+            return {'resolved': 0, 'failed': 0}
+
+        client = self._get_remote_connection()
+        resolved = 0
+        for operation, _label in OPERATIONS:
+            group = letters.filtered(lambda l: l.operation == operation)
+            if group:
+                # Un reintento que resuelve en otra transacción devuelve cuántos resolvió
+                group_resolved = getattr(self, f'_replay_{operation}')(client, group)
+                if group_resolved is None:
+                    group_resolved = len(group.filtered(lambda l: l.state == 'resolved'))
+                resolved += group_resolved
+        return {'resolved': resolved, 'failed': len(letters) - resolved, 'rpc': client.stats.totals}
+
+    def _replay_documents(self, client, records, model, method, prepare, push_legacy, apply, record_failure):
+        """Reenvía ``records`` en llamadas de ``batch_size`` documentos a ``method``.
+
+        Cada resultado se aplica en su propio savepoint: un documento rechazado
+        no deshace los demás del mismo bloque.
+        """
+        for chunk in split_every(self._get_batch_size(50), records.ids, records.browse):
+            prepared = []
+            for record in chunk:
+                try:
+                    payload = prepare(record)
+                    self._upload_payload_attachments(client, payload)
+                except Exception as e:
+                    record_failure(record, e, None)
+                    continue
+                prepared.append((record, payload))
+            if not prepared:
+                continue
+            try:
+                results = self._call_receive_endpoint(client, model, method, [payload for _record, payload in prepared])
+            except Exception as e:
+                results = [e] * len(prepared)
+            for index, (record, payload) in enumerate(prepared):
+                try:
+                    with self.env.cr.savepoint():
+                        result = results[index] if results is not None else push_legacy(record, payload)
+                        if isinstance(result, Exception):
+                            raise result
+                        apply(record, result)
+                except Exception as e:
+                    record_failure(record, e, payload)
+
+    def _replay_sale_order(self, client, letters):
+        orders = self.env['sale.order'].browse(letters.mapped('res_id'))
+        done = orders.filtered('is_synced')
+        self.env['sync.dead.letter']._resolve('sale_order', done, self)
+        self._push_sale_orders(client, orders - done)
+
+    def _push_sale_orders(self, client, orders):
+        """Envía los pedidos en bloque; cada fallo queda en su pedido y en la cola."""
+        self._replay_documents(
+            client, orders, 'sale.order', 'omni_receive_orders',
+            prepare=lambda order: order._prepare_remote_order_payload(self),
+            push_legacy=lambda order, payload: order._push_remote_order_legacy(client, payload),
+            apply=lambda order, result: order._apply_remote_order_result(self, result),
+            record_failure=lambda order, error, payload: order._record_remote_order_failure(self, error, payload),
+        )
+
+    def _replay_purchase(self, client, letters):
+        DeadLetter = self.env['sync.dead.letter']
+        moves = self.env['account.move'].browse(letters.mapped('res_id'))
+        done = moves.filtered(lambda m: m.is_synced or not m.partner_id)
+        DeadLetter._resolve('purchase', done, self)
+        moves -= done
+        if self.purchase_consolidation:
+            # La compra consolidada toma el relevo; sus fallos se registran como lote
+            moves._stage_remote_purchase(self)
+            DeadLetter._resolve('purchase', moves, self)
+            return
+
+        def record_failure(move, error, payload):
+            self.env['sync.event']._log_event(move, self, 'failed', error_message=str(error))
+            DeadLetter._capture('purchase', move, self, error, payload=payload)
+
+        self._replay_documents(
+            client, moves, 'purchase.order', 'omni_receive_purchases',
+            prepare=lambda move: move._prepare_remote_purchase_payload(self),
+            push_legacy=lambda move, payload: move._push_remote_purchase_legacy(client, payload),
+            apply=lambda move, result: move._apply_remote_purchase_result(self, result),
+            record_failure=record_failure,
+        )
+
+    def _replay_purchase_batch(self, client, letters):
+        batches = self.env['omni.sync.purchase.batch'].browse(letters.mapped('res_id'))
+        done = batches.filtered(lambda b: b.state in ('sent', 'skipped'))
+        self.env['sync.dead.letter']._resolve('purchase_batch', done, self)
+        if not batches - done:
+            return len(done)
+        # El envío registra sus resultados en su propia transacción
+        result = self._flush_purchase_batches(batches=batches - done)
+        return len(done) + result['sent'] + result['skipped']
+
+    def _replay_product_pull(self, client, letters):
+        # Un único registro por conexión: la descarga continúa desde donde falló
+        payload = letters[:1].payload or {}
+        try:
+            with self.env.cr.savepoint():
+                self._sync_products_from_remote(
+                    batch_size=payload.get('batch_size', 100),
+                    offset=payload.get('offset', 0),
+                    domain=payload.get('domain'),
+                )
+        except Exception:
+            _logger.exception("Falló el reintento de la descarga de productos de %s", self.name)
+
+    def _replay_pricelist(self, client, letters):
+        DeadLetter = self.env['sync.dead.letter']
+        pricelists = self._order_pricelists_by_base(self.env['product.pricelist'].browse(letters.mapped('res_id')))
+        resolver = self._build_pricelist_resolver(client, pricelists)
+        for pricelist in pricelists:
+            try:
+                self._push_pricelist(client, pricelist, resolver)
+            except Exception as e:
+                _logger.exception("Error sincronizando la lista de precios %s", pricelist.display_name)
+                DeadLetter._capture('pricelist', pricelist, self, e)
+                continue
+            DeadLetter._resolve('pricelist', pricelist, self)
+
+    def action_view_dead_letters(self):
+        self.ensure_one()
+        action = self.env['ir.actions.act_window']._for_xml_id('omni_sync_odoo.action_sync_dead_letter')
+        action['domain'] = [('config_id', '=', self.id)]
+        return action
@@ -0,0 +1,88 @@
+from odoo import models, fields, api
+
+
+class SyncEvent(models.Model):
+    _name = 'sync.event'
+    _inherit = ['omni.sync.rpc.mixin']
+    _description = 'Evento de Sincronización'
+    _order = 'id desc'
+
+    config_id = fields.Many2one('omni.sync.config', string='Conexión', ondelete='cascade', index=True)
+    res_model = fields.Char(string='Modelo Origen', required=True, index=True)
+    res_id = fields.Many2oneReference(string='ID Origen', model_field='res_model', required=True, index=True)
+    remote_id = fields.Integer(string='ID Remoto')
+    remote_ref = fields.Char(string='Referencia Remota')
+    line_count = fields.Integer(string='Líneas Sinc.')
+    duration = fields.Float(string='Duración (seg)')
+    status = fields.Selection([
+        ('synced', 'Sincronizado'),
+        ('skipped', 'Omitido'),
+        ('failed', 'Fallido')
+    ], string='Estado', required=True, index=True)
+    error_message = fields.Text(string='Mensaje de Error')
+
+    @api.depends('res_model', 'res_id')
+    def _compute_display_name(self):
+        for event in self:
+            record = self.env[event.res_model].browse(event.res_id).exists() if event.res_model in self.env else False
+            event.display_name = record.display_name if record else f'{event.res_model},{event.res_id}'
+
+    @api.model
+    def _log_event(self, record, config, status, **values):
+        """Registra un intento de envío del documento ``record`` contra ``config``."""
+        record.ensure_one()
+        return self.sudo().create(dict(
+            values,
+            res_model=record._name,
+            res_id=record.id,
+            config_id=config.id if config else False,
+            status=status,
+        ))
+
+    def _render_summary(self):
+        """Genera el resumen HTML del evento bajo demanda (no se almacena)."""
+        if not self:
+            return False
+        self.ensure_one()
+        return self.env['ir.qweb']._render('omni_sync_odoo.sync_event_summary', {'event': self})
+
+    def action_open_document(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self.res_model,
+            'res_id': self.res_id,
+            'view_mode': 'form',
+        }
+
+
+class SyncEventMixin(models.AbstractModel):
+    _name = 'omni.sync.event.mixin'
+    _description = 'Documento con Eventos de Sincronización'
+
+    sync_event_ids = fields.One2many(
+        'sync.event', 'res_id',
+        string='Eventos de Sincronización',
+        domain=lambda self: [('res_model', '=', self._name)],
+        readonly=True,
+        copy=False,
+    )
+    sync_log = fields.Html(
+        string="Resumen de Sincronización",
+        compute='_compute_sync_log',
+        sanitize=False,
+        help="Resumen visual del último intento de sincronización, generado a partir de los eventos registrados."
+    )
+
+    @api.depends('sync_event_ids')
+    def _compute_sync_log(self):
+        for record in self:
+            record.sync_log = record.sync_event_ids[:1]._render_summary()
+
+    def _get_sync_idempotency_key(self, config):
+        """Clave estable del envío de este documento a ``config``: base de
+        origen, modelo, id y conexión. El remoto la guarda y no crea un segundo
+        documento si el envío se repite."""
+        self.ensure_one()
+        db_uuid = self.env['ir.config_parameter'].sudo().get_param('database.uuid')
+        return f"{db_uuid}:{self._name}:{self.id}:{config.id}"
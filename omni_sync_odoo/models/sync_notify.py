@@ -0,0 +1,327 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import consteq
+from urllib.parse import urlsplit
+import datetime
+import logging
+import requests
+import secrets
+
+_logger = logging.getLogger(__name__)
+
+NOTIFY_ROUTE = '/omni_sync/notify'
+# Espera antes de enviar o procesar avisos, para juntar los cambios de una ráfaga (seg)
+NOTIFY_COALESCE_SECONDS = 30
+# Ids por aviso enviado
+NOTIFY_MAX_IDS = 1000
+NOTIFY_TIMEOUT = 10
+# Cambios sin poder avisar que se conservan; pasado esto la consulta periódica los cubre (horas)
+OUTBOX_RETENTION_HOURS = 24
+# Campos cuyo cambio interesa a los suscriptores
+NOTIFY_FIELDS = {'name', 'default_code', 'barcode', 'list_price', 'standard_price', 'image_1920', 'active'}
+
+
+
+def _trigger_coalesced(env, xmlid):
+    """Programa la acción ``xmlid`` tras el margen de espera, salvo que ya tenga
+    una ejecución pendiente: una ráfaga de cambios deja un solo disparo."""
+    cron = env.ref(xmlid)
+    env.cr.execute("SELECT 1 FROM ir_cron_trigger WHERE cron_id = %s LIMIT 1", [cron.id])
+    if not env.cr.fetchone():
+        cron._trigger(fields.Datetime.now() + datetime.timedelta(seconds=NOTIFY_COALESCE_SECONDS))
+
+
+class SyncSubscription(models.Model):
+    """Instancia suscrita a los cambios de productos de esta base.
+
+    Lo crea la instancia que descarga productos (``omni_subscribe``); los
+    cambios se acumulan en ``omni.sync.outbox`` y se le avisan en bloque a su
+    ``callback_url``.
+    """
+    _name = 'omni.sync.subscription'
+    _description = 'Suscripción a Cambios de Productos'
+
+    callback_url = fields.Char(string='URL de Aviso', required=True)
+    token = fields.Char(string='Token', required=True, groups='base.group_system')
+    model_names = fields.Char(string='Modelos', default='product.product')
+    active = fields.Boolean(default=True)
+    last_notify_date = fields.Datetime(string='Último Aviso', readonly=True)
+    failure_count = fields.Integer(string='Fallos Seguidos', readonly=True)
+    last_error = fields.Text(string='Último Error', readonly=True)
+
+    _sql_constraints = [
+        ('callback_url_uniq', 'unique(callback_url)', 'Ya existe una suscripción para esa URL.'),
+    ]
+
+    @api.model
+    def omni_subscribe(self, callback_url, token, model_names):
+        """Registra (o renueva) al suscriptor y devuelve el id de la suscripción.
+
+        Solo para administradores de sincronización: esta base hará peticiones
+        a ``callback_url``, que debe ser una URL http(s).
+        """
+        self.check_access_rights('write')
+        url = urlsplit(callback_url or '')
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise UserError(_('La URL de aviso %s no es una URL http(s) válida.') % callback_url)
+        values = {'token': token, 'model_names': ','.join(model_names), 'active': True, 'failure_count': 0}
+        subscription = self.sudo().with_context(active_test=False).search([('callback_url', '=', callback_url)])
+        if subscription:
+            subscription.write(values)
+        else:
+            subscription = self.sudo().create(dict(values, callback_url=callback_url))
+        return subscription.id
+
+    @api.model
+    def omni_unsubscribe(self, subscription_id):
+        self.check_access_rights('write')
+        self.sudo().browse(subscription_id).exists().write({'active': False})
+        self.env['omni.sync.outbox'].sudo().search([('subscription_id', '=', subscription_id)]).unlink()
+        return True
+
+    @api.model
+    def _enqueue(self, model, ids):
+        """Anota ``ids`` de ``model`` para cada suscriptor; un mismo registro
+        cambiado varias veces antes del envío queda una sola vez."""
+        if not ids:
+            return
+        subscriptions = self.sudo().search([]).filtered(
+            lambda s: model in (s.model_names or '').split(','))
+        if not subscriptions:
+            return
+        self.env.cr.execute("""
+            INSERT INTO omni_sync_outbox (subscription_id, model, res_id, write_date)
+                 SELECT s, %s, r, NOW() AT TIME ZONE 'UTC'
+                   FROM unnest(%s::int[]) s, unnest(%s::int[]) r
+            ON CONFLICT (subscription_id, model, res_id) DO UPDATE SET write_date = EXCLUDED.write_date
+        """, (model, subscriptions.ids, list(ids)))
+        _trigger_coalesced(self.env, 'omni_sync_odoo.ir_cron_omni_sync_send_notifications')
+
+    @api.model
+    def cron_send_notifications(self):
+        """Ejecución programada: avisa a cada suscriptor los registros cambiados."""
+        for subscription in self.sudo().search([]):
+            subscription._send_notifications()
+
+    def _send_notifications(self):
+        """Envía los cambios pendientes del suscriptor en avisos de hasta
+        ``NOTIFY_MAX_IDS`` ids. Si el aviso falla los cambios se conservan para
+        el próximo envío."""
+        self.ensure_one()
+        Outbox = self.env['omni.sync.outbox'].sudo()
+        rows = Outbox.search([('subscription_id', '=', self.id)], order='model, res_id')
+        if not rows:
+            return 0
+        notifications = []
+        for model in set(rows.mapped('model')):
+            model_rows = rows.filtered(lambda r: r.model == model)
+            for start in range(0, len(model_rows), NOTIFY_MAX_IDS):
+                chunk = model_rows[start:start + NOTIFY_MAX_IDS]
+                notifications.append({
+                    'model': model,
+                    'ids': chunk.mapped('res_id'),
+                    'write_date': fields.Datetime.to_string(max(chunk.mapped('write_date'))),
+                })
+        try:
+            response = requests.post(self.callback_url, json={
+                'subscription_id': self.id,
+                'notifications': notifications,
+            }, headers={'X-Omni-Sync-Token': self.token}, timeout=NOTIFY_TIMEOUT)
+            response.raise_for_status()
+        except Exception as e:
+            _logger.warning("No se pudo avisar a %s: %s", self.callback_url, e)
+            self.write({'failure_count': self.failure_count + 1, 'last_error': str(e)})
+            return 0
+        rows.unlink()
+        self.write({'last_notify_date': fields.Datetime.now(), 'failure_count': 0, 'last_error': False})
+        return len(rows)
+
+
+class SyncOutbox(models.Model):
+    _name = 'omni.sync.outbox'
+    _description = 'Cambios Pendientes de Avisar'
+
+    subscription_id = fields.Many2one('omni.sync.subscription', string='Suscripción', required=True,
+                                      ondelete='cascade', index=True)
+    model = fields.Char(string='Modelo', required=True)
+    res_id = fields.Integer(string='ID', required=True)
+    write_date = fields.Datetime(string='Fecha de Cambio')
+
+    _sql_constraints = [
+        ('subscription_record_uniq', 'unique(subscription_id, model, res_id)', 'El cambio ya está pendiente.'),
+    ]
+
+    @api.autovacuum
+    def _gc_stale_changes(self):
+        limit = fields.Datetime.now() - datetime.timedelta(hours=OUTBOX_RETENTION_HOURS)
+        self.sudo().search([('write_date', '<', limit)]).unlink()
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        products = super().create(vals_list)
+        self.env['omni.sync.subscription']._enqueue('product.product', products.ids)
+        return products
+
+    def write(self, vals):
+        res = super().write(vals)
+        if NOTIFY_FIELDS.intersection(vals):
+            self.env['omni.sync.subscription']._enqueue('product.product', self.ids)
+        return res
+
+
+class ProductTemplate(models.Model):
+    _inherit = 'product.template'
+
+    def write(self, vals):
+        res = super().write(vals)
+        # El precio de venta y la imagen se guardan en la plantilla
+        if NOTIFY_FIELDS.intersection(vals):
+            variants = self.with_context(active_test=False).product_variant_ids
+            self.env['omni.sync.subscription']._enqueue('product.product', variants.ids)
+        return res
+
+
+class SyncNotification(models.Model):
+    """Aviso recibido del remoto, pendiente de procesar.
+
+    Hay una fila por registro remoto: los avisos repetidos de un mismo
+    producto se juntan hasta que se descarga.
+    """
+    _name = 'omni.sync.notification'
+    _description = 'Aviso de Cambio Recibido'
+
+    config_id = fields.Many2one('omni.sync.config', string='Conexión', required=True, ondelete='cascade', index=True)
+    model = fields.Char(string='Modelo', required=True)
+    res_id = fields.Integer(string='ID Remoto', required=True)
+    write_date = fields.Datetime(string='Fecha de Cambio')
+
+    _sql_constraints = [
+        ('config_record_uniq', 'unique(config_id, model, res_id)', 'El aviso ya está pendiente.'),
+    ]
+
+    @api.model
+    def _parse(self, notifications):
+        """Avisos recibidos normalizados; un aviso mal formado lanza ``ValueError``
+        o ``TypeError`` antes de guardar nada."""
+        if not isinstance(notifications, list):
+            raise TypeError('notifications')
+        parsed = []
+        for notification in notifications:
+            if not isinstance(notification, dict):
+                raise TypeError('notification')
+            write_date = fields.Datetime.to_datetime(notification.get('write_date') or None)
+            parsed.append({
+                'model': str(notification.get('model') or ''),
+                'ids': [int(res_id) for res_id in notification.get('ids') or []],
+                'write_date': fields.Datetime.to_string(write_date),
+            })
+        return parsed
+
+    @api.model
+    def _buffer(self, config, notifications):
+        """Guarda los avisos de ``config`` y programa su proceso tras un margen de espera."""
+        count = 0
+        for notification in notifications:
+            ids = [int(res_id) for res_id in notification.get('ids') or []]
+            if notification.get('model') != 'product.product' or not ids:
+                continue
+            self.env.cr.execute("""
+                INSERT INTO omni_sync_notification (config_id, model, res_id, write_date)
+                     SELECT %s, %s, r, %s FROM unnest(%s::int[]) r
+                ON CONFLICT (config_id, model, res_id) DO UPDATE
+                        SET write_date = GREATEST(omni_sync_notification.write_date, EXCLUDED.write_date)
+            """, (config.id, notification['model'], notification.get('write_date'), ids))
+            count += len(ids)
+        if count:
+            _trigger_coalesced(self.env, 'omni_sync_odoo.ir_cron_omni_sync_process_notifications')
+        return count
+
+
+class SyncConfig(models.Model):
+    _inherit = 'omni.sync.config'
+
+    push_notifications = fields.Boolean(
+        string='Recibir Avisos de Cambios',
+        readonly=True,
+        copy=False,
+        help="El remoto avisa los productos que cambian y solo esos se descargan, en segundos. La sincronización periódica sigue funcionando como respaldo."
+    )
+    notify_token = fields.Char(string='Token de Avisos', copy=False, readonly=True, groups='base.group_system')
+    remote_subscription_id = fields.Integer(string='ID de Suscripción Remota', copy=False, readonly=True)
+
+    @api.model
+    def _find_by_notify_token(self, token):
+        """Conexión a la que corresponde el token de un aviso recibido."""
+        for config in self.sudo().search([('push_notifications', '=', True)]):
+            if config.notify_token and token and consteq(config.notify_token, token):
+                return config
+        return self.browse()
+
+    def action_subscribe_remote(self):
+        """Se suscribe a los cambios de productos del remoto (requiere el módulo en el remoto)."""
+        self.ensure_one()
+        client = self._get_remote_connection()
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        token = self.sudo().notify_token or secrets.token_urlsafe(32)
+        subscription_id = self._call_optional_endpoint(
+            client, 'omni.sync.subscription', 'omni_subscribe',
+            [f"{base_url}{NOTIFY_ROUTE}?db={self.env.cr.dbname}", token, ['product.product']])
+        if subscription_id is None:
+            raise UserError(_('El servidor remoto no admite avisos de cambios; actualice el módulo en el remoto.'))
+        self.sudo().write({
+            'push_notifications': True,
+            'notify_token': token,
+            'remote_subscription_id': subscription_id,
+        })
+
+    def action_unsubscribe_remote(self):
+        self.ensure_one()
+        if self.remote_subscription_id:
+            client = self._get_remote_connection()
+            self._call_optional_endpoint(client, 'omni.sync.subscription', 'omni_unsubscribe',
+                                         [self.remote_subscription_id])
+        self.sudo().write({'push_notifications': False, 'notify_token': False, 'remote_subscription_id': 0})
+
+    @api.model
+    def cron_process_notifications(self):
+        """Ejecución programada (disparada al recibir avisos): descarga los productos avisados."""
+        configs = self.env['omni.sync.notification'].search([]).config_id.filtered('active')
+        return configs._run_in_parallel('_process_notifications')
+
+    def _process_notifications(self):
+        """Descarga solo los productos avisados (y sus imágenes, si aplica).
+
+        Los avisos se toman con ``SKIP LOCKED`` y se borran al terminar; si la
+        descarga falla la transacción se deshace y quedan para el próximo intento.
+        """
+        self.ensure_one()
+        self.env.cr.execute("""
+            SELECT id, res_id FROM omni_sync_notification
+             WHERE config_id = %s AND model = 'product.product'
+               FOR UPDATE SKIP LOCKED
+        """, (self.id,))
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return {'products': 0}
+        remote_ids = sorted({res_id for _id, res_id in rows})
+        domain = [('id', 'in', remote_ids)]
+
+        res = {'products': len(remote_ids)}
+        if self.sync_products:
+            pulled = self._sync_products_from_remote(batch_size=self._get_batch_size(100), execution_type='auto',
+                                                     domain=domain)
+            res.update(created=pulled['created'], updated=pulled['updated'], rpc=pulled['rpc'])
+        if self.sync_images:
+            wizard = self.env['sync.pictures.wizard'].create({'config_id': self.id, 'execution_type': 'auto'})
+            client = self._get_remote_connection()
+            with client.track() as rpc_stats:
+                log, _next_offset = wizard._procesar_marca('TOTAL', client, rpc_stats, domain=domain)
+            if log.status == 'failed':
+                raise UserError(log.error_message)
+            res['images'] = log.products_synced
+        self.env['omni.sync.notification'].browse([row_id for row_id, _res_id in rows]).unlink()
+        return res
@@ -1,11 +1,23 @@
 from odoo import models, fields
+import base64
+import logging
+
+from ..tools.profiling import dump_profile
+
+_logger = logging.getLogger(__name__)
 
 class SyncPicturesLog(models.Model):
     _name = 'sync.pictures.log'
+    _inherit = ['omni.sync.rpc.mixin']
     _description = 'Log de Sincronización de Imágenes'
     _order = 'create_date desc'
 
     config_id = fields.Many2one('omni.sync.config', string='Conexión', ondelete='cascade')
+    sync_type = fields.Selection([
+        ('images', 'Imágenes'),
+        ('products', 'Productos'),
+        ('pricelists', 'Listas de Precios')
+    ], string='Tipo de Sincronización', default='images', required=True)
     brand = fields.Char(string='Marca')
     total_products = fields.Integer(string='Total Productos')
     products_synced = fields.Integer(string='Sincronizados')
@@ -19,15 +31,60 @@ class SyncPicturesLog(models.Model):
     ], string='Tipo de Ejecución', default='manual')
     status = fields.Selection([
         ('in_progress', 'En Progreso'),
+        ('partial', 'Parcial'),
         ('completed', 'Completado'),
         ('failed', 'Fallido')
     ], string='Estado')
     error_message = fields.Text(string='Mensaje de Error')
     duration = fields.Float(string='Duración (seg)')
+    profile_file = fields.Binary(string='Perfil (pstats)', attachment=True, readonly=True)
+    profile_filename = fields.Char(string='Nombre del Perfil')
+    profile_summary = fields.Text(string='Resumen del Perfil', readonly=True)
     
     line_ids = fields.One2many('sync.pictures.log.line', 'log_id', string='Detalles de Productos')
     pricelist_line_ids = fields.One2many('sync.pricelist.log.line', 'log_id', string='Detalles de Listas de Precios')
 
+    def _attach_profile(self, profiler):
+        """Guarda en el log el perfil capturado durante la ejecución."""
+        self.ensure_one()
+        data, summary = dump_profile(profiler)
+        self.write({
+            'profile_file': base64.b64encode(data),
+            'profile_filename': f'sync_{self.sync_type}_{self.id}.pstats',
+            'profile_summary': summary,
+        })
+
+    def _record_failure(self, error, profiler=None, **values):
+        """Registra el fallo de la ejecución en un log escrito con un cursor propio.
+
+        Quien llama relanza el error y deshace su transacción (o su savepoint),
+        y con ella este log: el fallo se guarda aparte, igual que en la cola de
+        errores, y el log de la transacción se descarta.
+        """
+        self.ensure_one()
+        values = dict(
+            values,
+            config_id=self.config_id.id,
+            sync_type=self.sync_type,
+            brand=self.brand,
+            execution_type=self.execution_type,
+            status='failed',
+            error_message=str(error),
+        )
+        try:
+            with self.env.registry.cursor() as cr:
+                log = self.env(cr=cr)['sync.pictures.log'].sudo().create(values)
+                if profiler:
+                    log._attach_profile(profiler)
+        except Exception:
+            _logger.warning("No se pudo registrar el fallo de la sincronización %s", self.sync_type, exc_info=True)
+        try:
+            with self.env.cr.savepoint():
+                self.unlink()
+        except Exception:
+            # Transacción abortada: el rollback de quien llama lo descarta igual
+            pass
+
 class SyncPricelistLogLine(models.Model):
     _name = 'sync.pricelist.log.line'
     _description = 'Línea de Log de Sincronización de Listas de Precios'
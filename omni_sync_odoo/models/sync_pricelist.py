@@ -0,0 +1,302 @@
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+import hashlib
+import json
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Campos numéricos/técnicos de la regla que se copian tal cual al remoto
+PRICELIST_ITEM_PLAIN_FIELDS = (
+    'applied_on', 'min_quantity', 'compute_price', 'fixed_price', 'percent_price', 'base',
+    'price_discount', 'price_surcharge', 'price_round', 'price_min_margin', 'price_max_margin',
+)
+# Reglas que solo existen si custom_pricing_rule está instalado en ambos lados
+CUSTOM_APPLIED_ON = {
+    '4_product_brand': 'apply_brand',
+    '5_product_origin_country': 'apply_origin_country',
+    '6_product_tag': 'apply_tag',
+}
+
+
+def _values_hash(values):
+    return hashlib.sha1(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class SyncPricelistMap(models.Model):
+    _name = 'sync.pricelist.map'
+    _description = 'Mapeo de Listas de Precios Sincronizadas'
+    _rec_name = 'pricelist_id'
+
+    config_id = fields.Many2one('omni.sync.config', string='Configuración', required=True, ondelete='cascade')
+    pricelist_id = fields.Many2one('product.pricelist', string='Lista Local', required=True, ondelete='cascade')
+    remote_pricelist_id = fields.Integer(string='ID Lista Remota')
+    values_hash = fields.Char(string='Huella de Valores')
+    last_sync_date = fields.Datetime(string='Última Sincronización')
+
+    _sql_constraints = [
+        ('config_pricelist_uniq', 'unique(config_id, pricelist_id)', 'La lista de precios ya está mapeada para esta conexión.'),
+    ]
+
+
+class SyncPricelistItemMap(models.Model):
+    _name = 'sync.pricelist.item.map'
+    _description = 'Mapeo de Reglas de Precio Sincronizadas'
+
+    config_id = fields.Many2one('omni.sync.config', string='Configuración', required=True, ondelete='cascade')
+    pricelist_map_id = fields.Many2one('sync.pricelist.map', string='Lista', required=True, ondelete='cascade', index=True)
+    # Al borrar la regla local el mapeo queda huérfano y la siguiente ejecución la elimina en el remoto
+    item_id = fields.Many2one('product.pricelist.item', string='Regla Local', ondelete='set null', index=True)
+    remote_item_id = fields.Integer(string='ID Regla Remota')
+    values_hash = fields.Char(string='Huella de Valores')
+    last_sync_date = fields.Datetime(string='Última Sincronización')
+
+
+class SyncConfig(models.Model):
+    _inherit = 'omni.sync.config'
+
+    def _sync_pricelists_to_remote(self, execution_type='manual'):
+        """Envía al remoto las listas marcadas con ``sync_to_remote`` y sus reglas.
+
+        Solo se envían las reglas nuevas o cuyos valores cambiaron desde el
+        último envío (según la huella guardada en ``sync.pricelist.item.map``),
+        con una llamada de creación, una de escritura y una de borrado por lista.
+        """
+        self.ensure_one()
+        start_time = time.time()
+        client = self._get_remote_connection()
+        log = self.env['sync.pictures.log'].create({
+            'config_id': self.id,
+            'sync_type': 'pricelists',
+            'status': 'in_progress',
+            'execution_type': execution_type,
+        })
+
+        pricelists = self._order_pricelists_by_base(self.env['product.pricelist'].search([('sync_to_remote', '=', True)]))
+        line_vals = []
+        synced = failed = 0
+        try:
+            resolver = self._build_pricelist_resolver(client, pricelists)
+            for pricelist in pricelists:
+                # Sin savepoint alrededor: lo que ya se creó en el remoto debe quedar mapeado
+                # aunque falle un paso posterior (ver ``_push_pricelist``)
+                try:
+                    counts = self._push_pricelist(client, pricelist, resolver)
+                except Exception as e:
+                    _logger.exception("Error sincronizando la lista de precios %s", pricelist.display_name)
+                    failed += 1
+                    line_vals.append((0, 0, {
+                        'pricelist_name': pricelist.display_name,
+                        'status': 'failed',
+                        'comment': str(e)[:255],
+                    }))
+                    self.env['sync.dead.letter']._capture('pricelist', pricelist, self, e)
+                    continue
+                synced += 1
+                self.env['sync.dead.letter']._resolve('pricelist', pricelist, self)
+                line_vals.append((0, 0, {
+                    'pricelist_name': pricelist.display_name,
+                    'status': 'synced',
+                    'comment': _('%(created)s creadas, %(updated)s actualizadas, %(deleted)s eliminadas, '
+                                 '%(unchanged)s sin cambios, %(unresolved)s sin correspondencia remota') % counts,
+                }))
+        except Exception as e:
+            log._record_failure(
+                e,
+                pricelists_synced=synced,
+                pricelists_failed=failed,
+                pricelist_line_ids=line_vals,
+                duration=time.time() - start_time,
+                **log._rpc_stats_values(client.stats),
+            )
+            raise
+
+        log.write({
+            'status': 'completed',
+            'pricelists_synced': synced,
+            'pricelists_failed': failed,
+            'pricelist_line_ids': line_vals,
+            'duration': time.time() - start_time,
+            **log._rpc_stats_values(client.stats),
+        })
+        return {'synced': synced, 'failed': failed, 'rpc': client.stats.totals, 'log_id': log.id}
+
+    def _order_pricelists_by_base(self, pricelists):
+        """``pricelists`` con cada lista después de las listas en las que se basan
+        sus reglas, para que estas ya estén mapeadas al enviarla."""
+        ordered, visited = [], set()
+
+        def visit(pricelist):
+            if pricelist.id in visited:
+                return
+            visited.add(pricelist.id)
+            bases = pricelist.item_ids.filtered(
+                lambda i: i.compute_price == 'formula' and i.base == 'pricelist').base_pricelist_id
+            for base in bases & pricelists:
+                visit(base)
+            ordered.append(pricelist.id)
+
+        for pricelist in pricelists:
+            visit(pricelist)
+        return pricelists.browse(ordered)
+
+    def _build_pricelist_resolver(self, client, pricelists):
+        """Resuelve en lote los IDs remotos de todo lo que referencian las reglas.
+
+        Una llamada por tipo de registro (productos, plantillas, categorías,
+        marcas, países, etiquetas y monedas) para todas las listas de la ejecución.
+        """
+        items = pricelists.item_ids
+        remote_item_fields = client.execute_kw('product.pricelist.item', 'fields_get', [[]], {'attributes': ['type']})
+
+        def lookup(model, field, values):
+            values = list({value for value in values if value})
+            if not values:
+                return {}
+            result = {}
+            for record in client.execute_kw(model, 'search_read', [[(field, 'in', values)]], {'fields': [field]}):
+                result.setdefault(record[field], record['id'])
+            return result
+
+        resolver = {
+            'fields': remote_item_fields,
+            'currency': lookup('res.currency', 'name', pricelists.currency_id.mapped('name')),
+            'product': lookup('product.product', 'default_code', items.product_id.mapped('default_code')),
+            'template': lookup('product.template', 'default_code', items.product_tmpl_id.mapped('default_code')),
+            'category': lookup('product.category', 'complete_name', items.categ_id.mapped('complete_name')),
+        }
+        if 'apply_brand' in items._fields and 'apply_brand' in remote_item_fields:
+            resolver['brand'] = lookup('product.brand', 'name', items.apply_brand.mapped('name'))
+            resolver['country'] = lookup('res.country', 'code', items.apply_origin_country.mapped('code'))
+            resolver['tag'] = lookup('product.tag', 'name', items.apply_tag.mapped('name'))
+        return resolver
+
+    def _prepare_remote_pricelist_item(self, item, resolver):
+        """Valores de la regla para el remoto, o ``None`` si alguna referencia no existe allí."""
+        vals = {name: item[name] for name in PRICELIST_ITEM_PLAIN_FIELDS if name in resolver['fields']}
+        vals['date_start'] = fields.Datetime.to_string(item.date_start) if item.date_start else False
+        vals['date_end'] = fields.Datetime.to_string(item.date_end) if item.date_end else False
+
+        references = [
+            ('product_id', item.product_id, 'product', 'default_code'),
+            ('product_tmpl_id', item.product_tmpl_id, 'template', 'default_code'),
+            ('categ_id', item.categ_id, 'category', 'complete_name'),
+        ]
+        if item.applied_on in CUSTOM_APPLIED_ON:
+            if 'brand' not in resolver:
+                return None
+            references += [
+                ('apply_brand', item.apply_brand, 'brand', 'name'),
+                ('apply_origin_country', item.apply_origin_country, 'country', 'code'),
+                ('apply_tag', item.apply_tag, 'tag', 'name'),
+            ]
+        for field_name, record, kind, key in references:
+            if not record:
+                vals[field_name] = False
+                continue
+            remote_id = resolver[kind].get(record[key])
+            if not remote_id:
+                return None
+            vals[field_name] = remote_id
+
+        if item.compute_price == 'formula' and item.base == 'pricelist':
+            base_map = self.env['sync.pricelist.map'].search([
+                ('config_id', '=', self.id), ('pricelist_id', '=', item.base_pricelist_id.id),
+            ], limit=1)
+            if not base_map:
+                return None
+            vals['base_pricelist_id'] = base_map.remote_pricelist_id
+        return vals
+
+    def _push_pricelist(self, client, pricelist, resolver):
+        """Sincroniza una lista y devuelve los contadores de la operación.
+
+        Cada llamada al remoto va seguida de su registro local en un savepoint
+        propio: si un paso posterior falla, lo ya creado en el remoto queda
+        mapeado y el reintento no lo duplica. Quien llama no debe envolver la
+        lista en un savepoint que deshaga esos mapeos.
+        """
+        now = fields.Datetime.now()
+        PricelistMap = self.env['sync.pricelist.map']
+        ItemMap = self.env['sync.pricelist.item.map']
+
+        remote_currency_id = resolver['currency'].get(pricelist.currency_id.name)
+        if not remote_currency_id:
+            raise UserError(_('La moneda %s no existe en el remoto.') % pricelist.currency_id.name)
+        header = {'name': pricelist.name, 'currency_id': remote_currency_id}
+        header_hash = _values_hash(header)
+
+        pricelist_map = PricelistMap.search([('config_id', '=', self.id), ('pricelist_id', '=', pricelist.id)], limit=1)
+        if not pricelist_map:
+            remote_pricelist_id = client.execute_kw('product.pricelist', 'create', [header])
+            with self.env.cr.savepoint():
+                pricelist_map = PricelistMap.create({
+                    'config_id': self.id,
+                    'pricelist_id': pricelist.id,
+                    'remote_pricelist_id': remote_pricelist_id,
+                    'values_hash': header_hash,
+                })
+        remote_pricelist_id = pricelist_map.remote_pricelist_id
+        # Nombre y moneda van en la misma escritura que las reglas modificadas
+        header_changed = pricelist_map.values_hash != header_hash
+
+        item_maps = ItemMap.search([('pricelist_map_id', '=', pricelist_map.id)])
+        map_by_item = {item_map.item_id.id: item_map for item_map in item_maps if item_map.item_id}
+
+        counts = dict(created=0, updated=0, deleted=0, unchanged=0, unresolved=0)
+        to_create, to_write = [], []
+        unresolved = ItemMap
+        for item in pricelist.item_ids:
+            vals = self._prepare_remote_pricelist_item(item, resolver)
+            if vals is None:
+                counts['unresolved'] += 1
+                # Lo enviado antes ya no corresponde a la regla: no debe quedar con el precio viejo
+                unresolved |= map_by_item.get(item.id, ItemMap)
+                continue
+            vals_hash = _values_hash(vals)
+            item_map = map_by_item.get(item.id)
+            if not item_map:
+                to_create.append((item, vals, vals_hash))
+            elif item_map.values_hash != vals_hash:
+                to_write.append((item_map, vals, vals_hash))
+            else:
+                counts['unchanged'] += 1
+
+        # Reglas borradas localmente o movidas a otra lista
+        obsolete = item_maps.filtered(lambda m: not m.item_id or m.item_id.pricelist_id != pricelist) | unresolved
+
+        if to_create:
+            remote_ids = client.execute_kw('product.pricelist.item', 'create', [[
+                dict(vals, pricelist_id=remote_pricelist_id) for _item, vals, _hash in to_create
+            ]])
+            with self.env.cr.savepoint():
+                ItemMap.create([{
+                    'config_id': self.id,
+                    'pricelist_map_id': pricelist_map.id,
+                    'item_id': item.id,
+                    'remote_item_id': remote_id,
+                    'values_hash': vals_hash,
+                    'last_sync_date': now,
+                } for (item, _vals, vals_hash), remote_id in zip(to_create, remote_ids)])
+            counts['created'] = len(to_create)
+
+        if to_write or header_changed:
+            values = dict(header) if header_changed else {}
+            if to_write:
+                values['item_ids'] = [(1, item_map.remote_item_id, vals) for item_map, vals, _hash in to_write]
+            client.execute_kw('product.pricelist', 'write', [[remote_pricelist_id], values])
+            with self.env.cr.savepoint():
+                for item_map, _vals, vals_hash in to_write:
+                    item_map.write({'values_hash': vals_hash, 'last_sync_date': now})
+                pricelist_map.values_hash = header_hash
+            counts['updated'] = len(to_write)
+
+        if obsolete:
+            client.execute_kw('product.pricelist.item', 'unlink', [obsolete.mapped('remote_item_id')])
+            counts['deleted'] = len(obsolete)
+            with self.env.cr.savepoint():
+                obsolete.unlink()
+
+        pricelist_map.last_sync_date = now
+        return counts
@@ -0,0 +1,343 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+from psycopg2.errors import SerializationFailure
+import datetime
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Un lote que sigue en envío pasado este tiempo se da por interrumpido y se reintenta (min)
+SENDING_TIMEOUT = 30
+
+
+class SyncPurchaseBatch(models.Model):
+    """Orden de compra consolidada: acumula las líneas de las facturas de un
+    mismo cliente hasta enviarlas al remoto como una sola OC."""
+    _name = 'omni.sync.purchase.batch'
+    _inherit = ['omni.sync.event.mixin']
+    _description = 'Compra Consolidada'
+    _order = 'id desc'
+
+    config_id = fields.Many2one('omni.sync.config', string='Conexión', required=True, ondelete='cascade', index=True)
+    partner_id = fields.Many2one('res.partner', string='Proveedor en Remoto', required=True, index=True)
+    state = fields.Selection([
+        ('open', 'Acumulando'),
+        ('sending', 'Enviando'),
+        ('sent', 'Enviada'),
+        ('skipped', 'Omitida'),
+        ('failed', 'Fallida'),
+    ], string='Estado', default='open', required=True, index=True)
+    line_ids = fields.One2many('omni.sync.purchase.batch.line', 'batch_id', string='Líneas')
+    move_ids = fields.Many2many('account.move', string='Facturas', compute='_compute_move_ids')
+    line_count = fields.Integer(string='Líneas', compute='_compute_move_ids')
+    remote_order_id = fields.Integer(string='ID Remoto', readonly=True, copy=False)
+    remote_order_ref = fields.Char(string='OC Remota', readonly=True, copy=False)
+    sent_date = fields.Datetime(string='Fecha de Envío', readonly=True, copy=False)
+    error_message = fields.Text(string='Mensaje de Error', readonly=True, copy=False)
+
+    @api.depends('line_ids.move_id')
+    def _compute_move_ids(self):
+        for batch in self:
+            batch.move_ids = batch.line_ids.move_id
+            batch.line_count = len(batch.line_ids)
+
+    @api.depends('partner_id', 'create_date')
+    def _compute_display_name(self):
+        for batch in self:
+            batch.display_name = _('OC consolidada %(partner)s (%(date)s)') % {
+                'partner': batch.partner_id.display_name,
+                'date': fields.Datetime.to_string(batch.create_date) if batch.create_date else '',
+            }
+
+    @api.model
+    def _get_open_batch(self, config, partner):
+        """Compra consolidada abierta de ``partner`` a la que se agregan líneas.
+
+        La fila se escribe, y queda bloqueada hasta el fin de la transacción:
+        un envío no puede tomar el lote mientras se le agregan líneas (ver
+        ``_claim_for_flush``), y uno ya tomado deja de estar abierto.
+        """
+        batch = self.search([
+            ('config_id', '=', config.id), ('partner_id', '=', partner.id), ('state', '=', 'open'),
+        ], limit=1)
+        if batch:
+            self.env.cr.execute("""
+                UPDATE omni_sync_purchase_batch
+                   SET write_date = (now() at time zone 'UTC')
+                 WHERE id = %s AND state = 'open'
+             RETURNING id
+            """, [batch.id])
+            if self.env.cr.fetchone():
+                batch.invalidate_recordset(['write_date'])
+                return batch
+        return self.create({'config_id': config.id, 'partner_id': partner.id})
+
+    def _claim_for_flush(self):
+        """Toma los lotes de ``self`` para enviarlos, en una transacción propia y corta.
+
+        Los pasa a ``sending`` y confirma: el bloqueo no dura lo que las
+        llamadas al remoto, y las facturas que se validan mientras tanto
+        abren un lote nuevo. Se omiten los que otra transacción está
+        ampliando y los que otro envío tiene en curso (salvo que lleven más
+        de ``SENDING_TIMEOUT`` minutos).
+        """
+        stale = fields.Datetime.now() - datetime.timedelta(minutes=SENDING_TIMEOUT)
+        claimed = []
+        with self.pool.cursor() as cr:
+            for batch_id in self.ids:
+                try:
+                    with cr.savepoint():
+                        cr.execute("""
+                            UPDATE omni_sync_purchase_batch
+                               SET state = 'sending', write_date = (now() at time zone 'UTC')
+                             WHERE id IN (SELECT id FROM omni_sync_purchase_batch
+                                           WHERE id = %s
+                                             AND (state IN ('open', 'failed')
+                                                  OR (state = 'sending' AND write_date < %s))
+                                             FOR UPDATE SKIP LOCKED)
+                         RETURNING id
+                        """, [batch_id, stale])
+                        claimed += [row[0] for row in cr.fetchall()]
+                except SerializationFailure:
+                    continue
+        self.invalidate_recordset(['state', 'write_date'])
+        return self.browse(claimed)
+
+    def _prepare_remote_purchase_payload(self):
+        """Documento que recibe ``omni_receive_purchases``: una OC con las líneas
+        de todas las facturas del lote, cada una con el número de su factura."""
+        self.ensure_one()
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        return {
+            'idempotency_key': self._get_sync_idempotency_key(self.config_id),
+            'partner': {name: self.partner_id[name] or False for name in ('name', 'vat', 'email', 'phone')},
+            'partner_ref': ', '.join(self.line_ids.move_id.mapped('name')),
+            'sync_connection_name': f"{base_url} ({self.env.cr.dbname})",
+            'confirm': self.config_id.auto_confirm_po,
+            'lines': [{
+                'default_code': line.default_code,
+                'name': f"{line.move_id.name}: {line.name}",
+                'product_qty': line.product_qty,
+                'price_unit': line.price_unit,
+            } for line in self.line_ids],
+        }
+
+    def _apply_remote_result(self, result):
+        """Refleja en el lote y en sus facturas el resultado de la OC remota."""
+        self.ensure_one()
+        config = self.config_id
+        moves = self.line_ids.move_id
+        Event = self.env['sync.event']
+        if not result.get('ok'):
+            error = result.get('error') or _('El servidor remoto rechazó la orden de compra.')
+            self.write({'state': 'failed', 'error_message': error})
+            Event._log_event(self, config, 'failed', error_message=error)
+            self.env['sync.dead.letter']._capture('purchase_batch', self, config, result.get('exception') or UserError(error))
+            return False
+        self.env['sync.dead.letter']._resolve('purchase_batch', self, config)
+        if not result['id']:
+            self.write({'state': 'skipped', 'sent_date': fields.Datetime.now(), 'error_message': False})
+            Event._log_event(self, config, 'skipped')
+            for move in moves:
+                Event._log_event(move, config, 'skipped')
+            return False
+
+        remote_ref = result['name'] or str(result['id'])
+        now = fields.Datetime.now()
+        synced_codes = {line['default_code'] for line in result['lines'] if line['status'] == 'synced'}
+        self.write({
+            'state': 'sent',
+            'remote_order_id': result['id'],
+            'remote_order_ref': remote_ref,
+            'sent_date': now,
+            'error_message': False,
+        })
+        moves.write({
+            'is_synced': True,
+            'remote_order_ref': remote_ref,
+            'remote_order_id': result['id'],
+            'sync_config_id': config.id,
+            'sync_date': now,
+        })
+        Event._log_event(self, config, 'synced', remote_id=result['id'], remote_ref=remote_ref,
+                         line_count=len(self.line_ids.filtered(lambda l: l.default_code in synced_codes)))
+        for move in moves:
+            move_lines = self.line_ids.filtered(lambda l: l.move_id == move and l.default_code in synced_codes)
+            Event._log_event(move, config, 'synced', remote_id=result['id'], remote_ref=remote_ref,
+                             line_count=len(move_lines))
+            move.message_post(
+                body=_("Incluida en la Orden de Compra consolidada [%s] (Referencia: %s)") % (config.name, remote_ref)
+            )
+        return True
+
+
+class SyncPurchaseBatchLine(models.Model):
+    _name = 'omni.sync.purchase.batch.line'
+    _description = 'Línea de Compra Consolidada'
+    _order = 'batch_id, id'
+
+    batch_id = fields.Many2one('omni.sync.purchase.batch', string='Compra Consolidada', required=True,
+                               ondelete='cascade', index=True)
+    move_id = fields.Many2one('account.move', string='Factura', required=True, ondelete='cascade', index=True)
+    default_code = fields.Char(string='Referencia Interna')
+    name = fields.Char(string='Descripción')
+    product_qty = fields.Float(string='Cantidad', digits='Product Unit of Measure')
+    price_unit = fields.Float(string='Precio Unitario', digits='Product Price')
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    sync_purchase_batch_id = fields.Many2one(
+        'omni.sync.purchase.batch',
+        string="Compra Consolidada",
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help="Orden de compra consolidada en la que se acumularon las líneas de esta factura."
+    )
+
+    def _sync_to_remote_purchase(self, config_rec):
+        if config_rec.purchase_consolidation:
+            self._stage_remote_purchase(config_rec)
+            return
+        return super()._sync_to_remote_purchase(config_rec)
+
+    def _stage_remote_purchase(self, config_rec):
+        """Acumula las líneas de las facturas en la compra consolidada abierta de
+        cada cliente, sin llamar al remoto; ``_flush_purchase_batches`` la envía."""
+        Batch = self.env['omni.sync.purchase.batch']
+        moves = self.filtered(lambda m: m.move_type == "out_invoice" and m.partner_id
+                              and not m.is_synced and not m.is_remote_order)
+        staged = self.env['omni.sync.purchase.batch.line'].search([
+            ('move_id', 'in', moves.ids), ('batch_id.config_id', '=', config_rec.id),
+        ]).move_id
+        batches = Batch
+        for move in moves - staged:
+            lines = move._prepare_remote_purchase_payload(config_rec)['lines']
+            if not lines:
+                self.env['sync.event']._log_event(move, config_rec, 'skipped')
+                continue
+            partner = move.partner_id.commercial_partner_id
+            batch = Batch._get_open_batch(config_rec, partner)
+            self.env['omni.sync.purchase.batch.line'].create([dict(line, batch_id=batch.id, move_id=move.id)
+                                                              for line in lines])
+            move.sync_purchase_batch_id = batch
+            batches |= batch
+
+        if any(batch.line_count >= config_rec.purchase_consolidation_max_lines for batch in batches):
+            self.env.ref('omni_sync_odoo.ir_cron_omni_sync_purchase_batches')._trigger()
+
+
+class SyncConfig(models.Model):
+    _inherit = 'omni.sync.config'
+
+    purchase_consolidation = fields.Boolean(
+        string='Consolidar Órdenes de Compra',
+        default=False,
+        help="Acumula las facturas de cada cliente y crea en el remoto una sola orden de compra por periodo, en lugar de una por factura."
+    )
+    purchase_consolidation_window = fields.Integer(
+        string='Periodo de Consolidación (min)',
+        default=60,
+        help="Tiempo máximo que una orden consolidada acumula facturas antes de enviarse."
+    )
+    purchase_consolidation_max_lines = fields.Integer(
+        string='Máximo de Líneas por OC',
+        default=500,
+        help="Una orden consolidada se envía antes de cumplir el periodo si alcanza esta cantidad de líneas."
+    )
+
+    @api.model
+    def cron_flush_purchase_batches(self):
+        """Ejecución programada: envía las compras consolidadas que cumplieron su periodo o tamaño."""
+        configs = self.search([('active', '=', True), ('purchase_consolidation', '=', True)])
+        return configs._run_in_parallel('_flush_purchase_batches')
+
+    def _get_due_purchase_batches(self, force=False):
+        self.ensure_one()
+        now = fields.Datetime.now()
+        batches = self.env['omni.sync.purchase.batch'].search([
+            ('config_id', '=', self.id), ('state', 'in', ('open', 'failed', 'sending')),
+        ])
+        # Un envío interrumpido se retoma; la clave de idempotencia evita duplicar la OC
+        stale = now - datetime.timedelta(minutes=SENDING_TIMEOUT)
+        batches = batches.filtered(lambda b: b.state != 'sending' or b.write_date < stale)
+        if force:
+            return batches
+        limit = now - datetime.timedelta(minutes=self.purchase_consolidation_window)
+        return batches.filtered(lambda b: b.state != 'open' or b.create_date <= limit
+                                or b.line_count >= self.purchase_consolidation_max_lines)
+
+    def _flush_purchase_batches(self, force=False, batches=None):
+        """Envía las compras consolidadas pendientes de la conexión.
+
+        Todas las OC van en la misma llamada a ``omni_receive_purchases`` (en
+        grupos de ``batch_size``), que también las confirma en bloque. Un lote
+        fallido se reintenta en la siguiente ejecución con la misma clave de
+        idempotencia, así que no se duplica aunque el remoto sí la haya creado.
+        ``batches`` limita el envío a esos lotes (reintento desde la cola de errores).
+
+        Los lotes se toman, leen y actualizan en transacciones propias (ver
+        ``_claim_for_flush``), no en la de quien llama.
+        """
+        self.ensure_one()
+        if batches is None:
+            batches = self._get_due_purchase_batches(force=force)
+        if not batches:
+            return {'sent': 0, 'skipped': 0, 'failed': 0}
+
+        client = self._get_rpc_client()
+        if not client.authenticate():
+            raise UserError(_('Autenticación fallida en el servidor remoto.'))
+
+        # Las facturas validadas en esta transacción deben verse desde los cursores del envío
+        self.env.flush_all()
+        batches = batches._claim_for_flush()
+        sent = skipped = failed = 0
+        for chunk_ids in split_every(self._get_batch_size(50), batches.ids):
+            # Cada bloque se lee y se registra en su propia transacción, sin bloqueos
+            # mientras se espera al remoto
+            with self.pool.cursor() as cr:
+                chunk = self.env(cr=cr)['omni.sync.purchase.batch'].browse(chunk_ids)
+                payloads = [batch._prepare_remote_purchase_payload() for batch in chunk]
+            try:
+                results = self._call_receive_endpoint(client, 'purchase.order', 'omni_receive_purchases', payloads)
+            except Exception as e:
+                _logger.exception("Error enviando compras consolidadas a %s", self.name)
+                results = [{'ok': False, 'error': str(e), 'exception': e}] * len(chunk_ids)
+            with self.pool.cursor() as cr:
+                chunk = self.env(cr=cr)['omni.sync.purchase.batch'].browse(chunk_ids)
+                if results is None:
+                    results = []
+                    for batch, payload in zip(chunk, payloads):
+                        try:
+                            results.append(batch.line_ids.move_id[:1]._push_remote_purchase_legacy(client, payload))
+                        except Exception as e:
+                            _logger.exception("Error enviando compras consolidadas a %s", self.name)
+                            results.append({'ok': False, 'error': str(e), 'exception': e})
+                for batch, result in zip(chunk, results):
+                    if batch._apply_remote_result(result):
+                        sent += 1
+                    elif result.get('ok'):
+                        skipped += 1
+                    else:
+                        failed += 1
+        self.env.invalidate_all()
+        return {'sent': sent, 'skipped': skipped, 'failed': failed, 'rpc': client.stats.totals}
+
+    def action_flush_purchase_batches(self):
+        """Envía ya todas las compras consolidadas abiertas, sin esperar su periodo."""
+        self.ensure_one()
+        result = self._flush_purchase_batches(force=True)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Compras consolidadas enviadas'),
+                'message': _('%(sent)s órdenes de compra creadas en el remoto, %(failed)s fallidas.') % result,
+                'type': 'warning' if result['failed'] else 'success',
+                'sticky': False,
+            },
+        }
@@ -0,0 +1,357 @@
+from odoo import models, fields, api, Command, _
+from psycopg2.errors import UniqueViolation
+import logging
+import time
+import xmlrpc.client
+
+from .sync_attachment import CHUNK_MODEL
+
+_logger = logging.getLogger(__name__)
+
+# Tiempo durante el que no se vuelve a probar el endpoint en un remoto que no lo tenía (seg)
+RECEIVE_ENDPOINT_RECHECK = 3600
+# (base, conexión, modelo, método) -> momento en que el remoto respondió que no lo tiene
+_UNSUPPORTED_ENDPOINTS = {}
+
+PARTNER_FIELDS = ('name', 'vat', 'street', 'city', 'phone', 'email')
+
+
+def _products_by_code(env, payloads):
+    """Productos locales de todas las líneas de ``payloads``, por referencia interna."""
+    codes = {line['default_code'] for payload in payloads for line in payload.get('lines', ()) if line.get('default_code')}
+    products = {}
+    if codes:
+        for product in env['product.product'].search([('default_code', 'in', list(codes))]):
+            products.setdefault(product.default_code, product)
+    return products
+
+
+def _find_or_create_partner(env, data, domain, extra_vals):
+    partner = env['res.partner'].search(domain, limit=1)
+    if not partner:
+        values = {name: data[name] for name in PARTNER_FIELDS if data.get(name)}
+        partner = env['res.partner'].create(dict(values, **extra_vals))
+    return partner
+
+
+def _existing_document_result(record, payload):
+    """Resultado de un documento ya recibido con la misma clave de idempotencia."""
+    codes = set(record.order_line.product_id.mapped('default_code'))
+    return {
+        'ok': True,
+        'id': record.id,
+        'name': record.name,
+        'duplicate': True,
+        'lines': [{'default_code': line['default_code'], 'status': 'synced' if line['default_code'] in codes else 'not_found'}
+                  for line in payload.get('lines', ())],
+    }
+
+
+def _received_document_result(records, key, payload):
+    """Resultado del documento ya recibido con ``key``, aunque lo haya creado
+    una entrega concurrente que se confirmó después de empezar esta transacción."""
+    domain = [('omni_idempotency_key', '=', key)]
+    record = records.search(domain, limit=1)
+    if record:
+        return _existing_document_result(record, payload)
+    # En REPEATABLE READ esta transacción no ve lo confirmado después de empezar
+    with records.env.registry.cursor() as cr:
+        record = records.with_env(records.env(cr=cr)).search(domain, limit=1)
+        return _existing_document_result(record, payload) if record else None
+
+
+def _receive_documents(records, payloads, receive_one):
+    """Recibe cada documento en su propio savepoint: uno inválido no impide recibir el resto.
+
+    Un documento cuya ``idempotency_key`` ya se recibió no se vuelve a crear:
+    se devuelve el registro existente, así el origen puede reintentar un envío
+    cuya respuesta se perdió. Lo mismo si otra entrega del mismo documento lo
+    crea mientras tanto (la restricción única sobre la clave lo detecta).
+    """
+    keys = [payload['idempotency_key'] for payload in payloads if payload.get('idempotency_key')]
+    existing = {}
+    if keys:
+        existing = {record.omni_idempotency_key: record
+                    for record in records.search([('omni_idempotency_key', 'in', keys)])}
+    products = _products_by_code(records.env, payloads)
+    results = []
+    for payload in payloads:
+        key = payload.get('idempotency_key')
+        if key in existing:
+            results.append(_existing_document_result(existing[key], payload))
+            continue
+        try:
+            with records.env.cr.savepoint():
+                result = receive_one(payload, products)
+        except UniqueViolation as e:
+            result = None
+            if key and e.diag.constraint_name == f'{records._table}_omni_idempotency_key_uniq':
+                result = _received_document_result(records, key, payload)
+            if not result:
+                _logger.warning("Documento recibido de otra instancia rechazado: %s", e, exc_info=True)
+                result = {'ok': False, 'error': str(e)}
+        except Exception as e:
+            _logger.warning("Documento recibido de otra instancia rechazado: %s", e, exc_info=True)
+            result = {'ok': False, 'error': str(e)}
+        if key and result.get('id'):
+            existing[key] = records.browse(result['id'])
+        results.append(result)
+    return results
+
+
+class SyncConfig(models.Model):
+    _inherit = 'omni.sync.config'
+
+    def _call_receive_endpoint(self, client, model, method, payloads):
+        """Envía los documentos al endpoint de recepción del remoto en una sola llamada.
+
+        Devuelve un resultado por documento, o ``None`` si el remoto tiene una
+        versión del módulo sin ese endpoint.
+        """
+        return self._call_optional_endpoint(client, model, method, [payloads])
+
+    def _call_optional_endpoint(self, client, model, method, args):
+        """Llama a un método que solo existe en remotos con una versión reciente del módulo.
+
+        Devuelve ``None`` si el remoto no lo tiene; en ese caso no se vuelve a
+        probar durante ``RECEIVE_ENDPOINT_RECHECK`` segundos.
+        """
+        self.ensure_one()
+        key = (self.env.cr.dbname, self.id, model, method)
+        if time.time() - _UNSUPPORTED_ENDPOINTS.get(key, 0) < RECEIVE_ENDPOINT_RECHECK:
+            return None
+        try:
+            return client.execute_kw(model, method, args)
+        except xmlrpc.client.Fault as e:
+            if f"'{method}' does not exist" not in str(e.faultString):
+                raise
+            _logger.info("El remoto %s no tiene %s.%s; se usa el envío llamada por llamada", self.name, model, method)
+            _UNSUPPORTED_ENDPOINTS[key] = time.time()
+            return None
+
+
+class SaleOrder(models.Model):
+    _inherit = 'sale.order'
+
+    omni_idempotency_key = fields.Char(
+        string="Clave de Idempotencia",
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help="Identifica el documento de otra instancia que originó este pedido; un reenvío con la misma clave no crea otro."
+    )
+
+    _sql_constraints = [
+        ('omni_idempotency_key_uniq', 'unique(omni_idempotency_key)',
+         'Ya existe un pedido recibido con esta clave de idempotencia.'),
+    ]
+
+    @api.model
+    def omni_receive_orders(self, payloads):
+        """Endpoint de recepción: crea en una sola llamada los pedidos enviados por otra instancia.
+
+        Cada documento trae los datos del partner de la compañía de origen, las
+        líneas por referencia interna, el nombre de la campaña, los adjuntos
+        (en línea o ya subidos, por ``attachment_id``) y la clave de
+        idempotencia (ver ``_prepare_remote_order_payload``). Devuelve por
+        documento ``{'ok', 'id', 'name', 'lines'}`` (o ``{'ok': False,
+        'error'}``), con el resultado de cada línea; ``id`` es ``False`` si
+        ninguna línea tiene producto en esta base y ``duplicate`` indica que el
+        documento ya se había recibido.
+        """
+        return _receive_documents(self, payloads, self._omni_receive_order)
+
+    def _omni_receive_order(self, payload, products):
+        line_results, order_lines = [], []
+        for line in payload.get('lines', ()):
+            product = products.get(line['default_code'])
+            line_results.append({'default_code': line['default_code'], 'status': 'synced' if product else 'not_found'})
+            if product:
+                order_lines.append(Command.create({
+                    'product_id': product.id,
+                    'product_uom_qty': line.get('product_uom_qty', 1.0),
+                    'name': line.get('name') or product.display_name,
+                }))
+        if not order_lines:
+            return {'ok': True, 'id': False, 'name': False, 'lines': line_results}
+
+        partner_data = payload['partner']
+        partner_domain = [('name', '=', partner_data['name'])]
+        if partner_data.get('vat'):
+            partner_domain = ['|', ('vat', '=', partner_data['vat'])] + partner_domain
+        values = {
+            'partner_id': _find_or_create_partner(self.env, partner_data, partner_domain, {'is_company': True}).id,
+            'origin': payload.get('origin'),
+            'order_line': order_lines,
+            'is_remote_order': True,
+            'omni_idempotency_key': payload.get('idempotency_key'),
+        }
+        if payload.get('date_order'):
+            values['date_order'] = payload['date_order']
+        if payload.get('campaign'):
+            Campaign = self.env['utm.campaign']
+            campaign = Campaign.search([('name', '=', payload['campaign'])], limit=1)
+            values['campaign_id'] = (campaign or Campaign.create({'name': payload['campaign']})).id
+
+        attachments, uploads = [], self.env['ir.attachment']
+        for attachment in payload.get('attachments', ()):
+            # Los adjuntos grandes llegan antes por partes (ver omni.sync.attachment.chunk)
+            upload = self.env['ir.attachment']
+            if attachment.get('attachment_id'):
+                upload = self.env[CHUNK_MODEL]._get_uploaded_attachment(attachment['attachment_id'], attachment.get('checksum'))
+            if attachment.get('field') in self._fields:
+                # La subida queda pendiente para los siguientes documentos con el mismo
+                # archivo; el autovacuum la borra después
+                values[attachment['field']] = upload.datas if upload else attachment['datas']
+                if attachment.get('filename_field') in self._fields:
+                    values[attachment['filename_field']] = attachment['name']
+            elif upload:
+                uploads |= upload
+            else:
+                attachments.append(attachment)
+
+        order = self.create(values)
+        if uploads:
+            uploads.write({'res_model': self._name, 'res_id': order.id})
+        if attachments:
+            self.env['ir.attachment'].create([{
+                'name': attachment['name'],
+                'datas': attachment['datas'],
+                'mimetype': attachment.get('mimetype'),
+                'res_model': self._name,
+                'res_id': order.id,
+            } for attachment in attachments])
+        return {'ok': True, 'id': order.id, 'name': order.name, 'lines': line_results}
+
+    def _prepare_remote_order_payload(self, config_rec):
+        """Documento que recibe ``omni_receive_orders`` en el remoto."""
+        self.ensure_one()
+        partner = self.company_id.partner_id
+        payload = {
+            'idempotency_key': self._get_sync_idempotency_key(config_rec),
+            'partner': {name: partner[name] or False for name in PARTNER_FIELDS},
+            'origin': self.origin or self.name,
+            'date_order': str(self.date_order),
+            'campaign': self.campaign_id.name or False,
+            'lines': [{
+                'default_code': line.product_id.default_code,
+                'name': line.name,
+                'product_uom_qty': line.product_uom_qty,
+            } for line in self.order_line if line.product_id.default_code],
+            'attachments': [],
+        }
+        if self.meli_tracking_pdf:
+            datas = self.meli_tracking_pdf
+            payload['attachments'].append({
+                'name': self.meli_tracking_filename or 'guia.pdf',
+                'datas': datas.decode() if isinstance(datas, bytes) else datas,
+                'mimetype': 'application/pdf',
+                'field': 'meli_tracking_pdf',
+                'filename_field': 'meli_tracking_filename',
+            })
+        return payload
+
+
+class PurchaseOrder(models.Model):
+    _inherit = 'purchase.order'
+
+    omni_idempotency_key = fields.Char(
+        string="Clave de Idempotencia",
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help="Identifica la factura de otra instancia que originó esta orden; un reenvío con la misma clave no crea otra."
+    )
+
+    _sql_constraints = [
+        ('omni_idempotency_key_uniq', 'unique(omni_idempotency_key)',
+         'Ya existe una orden de compra recibida con esta clave de idempotencia.'),
+    ]
+
+    @api.model
+    def omni_receive_purchases(self, payloads):
+        """Endpoint de recepción: crea en una sola llamada las órdenes de compra
+        generadas por las facturas de otra instancia (ver
+        ``account.move._prepare_remote_purchase_payload``). Devuelve lo mismo
+        que ``sale.order.omni_receive_orders``.
+
+        Las órdenes con ``confirm`` se confirman al final, todas juntas.
+        """
+        results = _receive_documents(self, payloads, self._omni_receive_purchase)
+        to_confirm = self.browse([
+            result['id'] for payload, result in zip(payloads, results)
+            if payload.get('confirm') and result.get('id') and not result.get('duplicate')
+        ])
+        to_confirm._omni_confirm_received()
+        return results
+
+    def _omni_confirm_received(self):
+        """Confirma en bloque; si algo falla, una por una para no perder las demás."""
+        if not self:
+            return
+        try:
+            with self.env.cr.savepoint():
+                self.button_confirm()
+        except Exception:
+            _logger.warning("Confirmación en bloque fallida; se confirman una por una", exc_info=True)
+            for order in self:
+                try:
+                    with self.env.cr.savepoint():
+                        order.button_confirm()
+                except Exception as e:
+                    _logger.warning("No se pudo confirmar la orden recibida %s: %s", order.name, e)
+
+    def _omni_receive_purchase(self, payload, products):
+        line_results, order_lines = [], []
+        for line in payload.get('lines', ()):
+            product = products.get(line['default_code'])
+            line_results.append({'default_code': line['default_code'], 'status': 'synced' if product else 'not_found'})
+            if product:
+                order_lines.append(Command.create({
+                    'product_id': product.id,
+                    'name': line.get('name') or product.display_name,
+                    'product_qty': line.get('product_qty', 1.0),
+                    'price_unit': line.get('price_unit', 0.0),
+                    'date_planned': fields.Datetime.now(),
+                }))
+        if not order_lines:
+            return {'ok': True, 'id': False, 'name': False, 'lines': line_results}
+
+        partner_data = payload['partner']
+        if partner_data.get('vat'):
+            partner_domain = [('vat', '=', partner_data['vat'])]
+        else:
+            partner_domain = [('name', '=', partner_data['name'])]
+        partner = _find_or_create_partner(self.env, partner_data, partner_domain,
+                                          {'supplier_rank': 1, 'company_type': 'company'})
+        order = self.create({
+            'partner_id': partner.id,
+            'partner_ref': payload.get('partner_ref'),
+            'order_line': order_lines,
+            'is_synced': True,
+            'sync_connection_name': payload.get('sync_connection_name'),
+            'omni_idempotency_key': payload.get('idempotency_key'),
+        })
+        return {'ok': True, 'id': order.id, 'name': order.name, 'lines': line_results}
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    def _prepare_remote_purchase_payload(self, config_rec):
+        """Documento que recibe ``omni_receive_purchases`` en el remoto."""
+        self.ensure_one()
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        return {
+            'idempotency_key': self._get_sync_idempotency_key(config_rec),
+            'partner': {name: self.partner_id[name] or False for name in ('name', 'vat', 'email', 'phone')},
+            'partner_ref': self.name,
+            'sync_connection_name': f"{base_url} ({self.env.cr.dbname})",
+            'confirm': config_rec.auto_confirm_po,
+            'lines': [{
+                'default_code': line.product_id.default_code,
+                'name': line.name,
+                'product_qty': line.quantity,
+                'price_unit': line.price_unit,
+            } for line in self.invoice_line_ids if line.product_id.default_code],
+        }
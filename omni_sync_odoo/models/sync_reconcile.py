@@ -0,0 +1,258 @@
+from odoo import models, fields, api, _
+from ..tools.catalog_digest import (BUCKET_SQL, CATALOG_FIELDS, catalog_row, bucket_of, bucket_digests, bucket_rows,
+                                     unique_rows)
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Productos por cubeta en promedio: una cubeta distinta cuesta traer esa cantidad de filas
+RECONCILE_BUCKET_SIZE = 32
+RECONCILE_MIN_BUCKETS = 64
+# Cubetas pedidas por llamada al bajar al detalle
+RECONCILE_BUCKETS_PER_CALL = 200
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    @api.model
+    def _omni_catalog_rows(self, bucket_count=None, buckets=None):
+        """Filas normalizadas de los productos activos con referencia interna.
+
+        Con ``buckets`` solo se leen los productos de esas cubetas: el filtro se
+        resuelve en SQL, así que el costo sigue a las diferencias y no al catálogo.
+        """
+        domain = [('active', '=', True), ('default_code', '!=', False)]
+        if buckets is not None:
+            buckets = tuple(int(bucket) for bucket in buckets)
+            if not buckets:
+                return []
+            self.flush_model(['active', 'default_code'])
+            self.env.cr.execute(
+                "SELECT id FROM product_product WHERE active AND default_code IS NOT NULL AND "
+                + BUCKET_SQL + " IN %s", [int(bucket_count), buckets])
+            domain.append(('id', 'in', [row[0] for row in self.env.cr.fetchall()]))
+        # Con referencias repetidas se conserva el producto más antiguo
+        products = self.search_read(domain, ['default_code', *CATALOG_FIELDS], order='id')
+        return unique_rows(catalog_row(values) for values in products)
+
+    @api.model
+    def omni_catalog_digest(self, bucket_count):
+        """Huella por cubeta del catálogo activo, para la instancia que concilia con esta."""
+        return bucket_digests(self._omni_catalog_rows(), bucket_count)
+
+    @api.model
+    def omni_catalog_bucket(self, bucket_count, buckets):
+        """Filas de los productos de ``buckets`` (solo las cubetas que no coincidieron)."""
+        return self._omni_catalog_rows(bucket_count, buckets)
+
+
+class SyncReconcileReport(models.Model):
+    _name = 'sync.reconcile.report'
+    _inherit = ['omni.sync.rpc.mixin']
+    _description = 'Conciliación de Catálogo'
+    _order = 'id desc'
+
+    config_id = fields.Many2one('omni.sync.config', string='Conexión', required=True, ondelete='cascade', index=True)
+    execution_type = fields.Selection([
+        ('manual', 'Manual'),
+        ('auto', 'Automático')
+    ], string='Tipo de Ejecución', default='manual')
+    bucket_count = fields.Integer(string='Cubetas', readonly=True)
+    bucket_diff_count = fields.Integer(string='Cubetas Distintas', readonly=True)
+    local_count = fields.Integer(string='Productos Locales', readonly=True)
+    duration = fields.Float(string='Duración (seg)', readonly=True)
+    line_ids = fields.One2many('sync.reconcile.line', 'report_id', string='Diferencias')
+    mismatch_count = fields.Integer(string='Valores Distintos', compute='_compute_counts')
+    missing_local_count = fields.Integer(string='Faltan en Local', compute='_compute_counts')
+    missing_remote_count = fields.Integer(string='Faltan en Remoto', compute='_compute_counts')
+    pending_count = fields.Integer(string='Sin Corregir', compute='_compute_counts')
+
+    @api.depends('line_ids.kind', 'line_ids.state')
+    def _compute_counts(self):
+        for report in self:
+            lines = report.line_ids
+            report.mismatch_count = len(lines.filtered(lambda l: l.kind == 'mismatch'))
+            report.missing_local_count = len(lines.filtered(lambda l: l.kind == 'missing_local'))
+            report.missing_remote_count = len(lines.filtered(lambda l: l.kind == 'missing_remote'))
+            report.pending_count = len(lines.filtered(lambda l: l.state == 'pending'))
+
+    @api.depends('config_id', 'create_date')
+    def _compute_display_name(self):
+        for report in self:
+            report.display_name = _('Conciliación %(config)s (%(date)s)') % {
+                'config': report.config_id.name or '',
+                'date': fields.Datetime.to_string(report.create_date) if report.create_date else '',
+            }
+
+    def action_fix_all(self):
+        self.line_ids.filtered(lambda l: l.state == 'pending').action_fix()
+
+
+class SyncReconcileLine(models.Model):
+    _name = 'sync.reconcile.line'
+    _description = 'Diferencia de Catálogo'
+    _order = 'report_id desc, kind, default_code'
+
+    report_id = fields.Many2one('sync.reconcile.report', string='Conciliación', required=True,
+                                ondelete='cascade', index=True)
+    default_code = fields.Char(string='Referencia Interna', required=True)
+    kind = fields.Selection([
+        ('mismatch', 'Valores Distintos'),
+        ('missing_local', 'Falta en Local'),
+        ('missing_remote', 'Falta en Remoto'),
+    ], string='Diferencia', required=True)
+    product_id = fields.Many2one('product.product', string='Producto Local', ondelete='set null')
+    differences = fields.Char(string='Campos')
+    local_values = fields.Char(string='Valor Local')
+    remote_values = fields.Char(string='Valor Remoto')
+    remote_row = fields.Json(string='Fila Remota')
+    state = fields.Selection([
+        ('pending', 'Sin Corregir'),
+        ('fixed', 'Corregida'),
+    ], string='Estado', default='pending', required=True)
+
+    def _remote_product_values(self):
+        row = dict(zip(('default_code',) + CATALOG_FIELDS, self.remote_row))
+        return {
+            'name': row['name'],
+            'barcode': row['barcode'] or False,
+            'list_price': float(row['list_price']),
+            'standard_price': float(row['standard_price']),
+        }
+
+    def action_fix(self):
+        """Aplica el catálogo remoto: actualiza los valores, crea lo que falta en
+        local y archiva lo que ya no está activo en el remoto."""
+        Product = self.env['product.product']
+        for line in self.filtered(lambda l: l.state == 'pending'):
+            try:
+                with self.env.cr.savepoint():
+                    if line.kind == 'mismatch' and line.product_id:
+                        line.product_id.write(line._remote_product_values())
+                    elif line.kind == 'missing_local' and line.product_id:
+                        # Archivado en local pero activo en el remoto: se reactiva, no se duplica
+                        line.product_id.write(dict(line._remote_product_values(), active=True))
+                    elif line.kind == 'missing_local':
+                        line.product_id = Product.create(dict(line._remote_product_values(),
+                                                              default_code=line.default_code))
+                    elif line.kind == 'missing_remote' and line.product_id:
+                        line.product_id.active = False
+                    line.state = 'fixed'
+            except Exception:
+                _logger.exception("No se pudo corregir la diferencia de %s", line.default_code)
+
+
+class SyncConfig(models.Model):
+    _inherit = 'omni.sync.config'
+
+    reconcile_auto_fix = fields.Boolean(
+        string='Corregir Conciliación Automáticamente',
+        default=False,
+        help="Al conciliar el catálogo, actualiza los productos con valores distintos y crea los que faltan en local. Los productos que ya no están activos en el remoto solo se informan (pueden ser productos propios)."
+    )
+
+    @api.model
+    def cron_reconcile_catalog(self):
+        """Ejecución programada: concilia el catálogo de las conexiones que descargan productos."""
+        configs = self.search([('active', '=', True), ('sync_products', '=', True)])
+        return configs._run_in_parallel('_reconcile_catalog', execution_type='auto')
+
+    def _reconcile_catalog(self, execution_type='manual'):
+        """Compara el catálogo local con el remoto y registra las diferencias.
+
+        Ambos lados resumen sus productos en cubetas por hash de la referencia;
+        solo se traen del remoto las filas de las cubetas cuya huella difiere,
+        así que el costo depende de la cantidad de diferencias y no del tamaño
+        del catálogo. Un remoto sin ``omni_catalog_digest`` se lee completo una
+        vez y se resume aquí.
+        """
+        self.ensure_one()
+        start_time = time.time()
+        client = self._get_remote_connection()
+        Product = self.env['product.product']
+
+        local_rows = {row[0]: row for row in Product._omni_catalog_rows()}
+        bucket_count = max(RECONCILE_MIN_BUCKETS, -(-len(local_rows) // RECONCILE_BUCKET_SIZE))
+        remote_catalog = None
+        remote_digests = self._call_optional_endpoint(client, 'product.product', 'omni_catalog_digest', [bucket_count])
+        if remote_digests is None:
+            remote_catalog = unique_rows(catalog_row(values) for values in client.iter_search_read(
+                'product.product', [('active', '=', True), ('default_code', '!=', False)],
+                ['default_code', *CATALOG_FIELDS], order='id'))
+            remote_digests = bucket_digests(remote_catalog, bucket_count)
+        local_digests = bucket_digests(local_rows.values(), bucket_count)
+        differing = sorted(int(bucket) for bucket in set(local_digests) | set(remote_digests)
+                           if local_digests.get(bucket) != remote_digests.get(bucket))
+
+        if remote_catalog is not None:
+            remote_rows = bucket_rows(remote_catalog, bucket_count, differing)
+        else:
+            remote_rows = []
+            for start in range(0, len(differing), RECONCILE_BUCKETS_PER_CALL):
+                remote_rows += client.execute_kw('product.product', 'omni_catalog_bucket',
+                                                 [bucket_count, differing[start:start + RECONCILE_BUCKETS_PER_CALL]])
+        remote_by_code = {row[0]: list(row) for row in remote_rows}
+        differing_set = set(differing)
+        local_by_code = {code: row for code, row in local_rows.items()
+                         if bucket_of(code, bucket_count) in differing_set}
+
+        codes = sorted(code for code in set(local_by_code) | set(remote_by_code)
+                       if local_by_code.get(code) != remote_by_code.get(code))
+        # También los archivados: un producto inactivo en local no es un producto faltante
+        products = {}
+        for product in Product.with_context(active_test=False).search([('default_code', 'in', codes)],
+                                                                      order='active desc, id'):
+            products.setdefault(product.default_code, product)
+        line_vals = []
+        for code in codes:
+            local, remote = local_by_code.get(code), remote_by_code.get(code)
+            if not local:
+                kind, names = 'missing_local', CATALOG_FIELDS
+            elif not remote:
+                kind, names = 'missing_remote', CATALOG_FIELDS
+            else:
+                kind = 'mismatch'
+                names = [name for name, local_value, remote_value in zip(CATALOG_FIELDS, local[1:], remote[1:])
+                         if local_value != remote_value]
+            indexes = [CATALOG_FIELDS.index(name) + 1 for name in names]
+            line_vals.append((0, 0, {
+                'default_code': code,
+                'kind': kind,
+                'product_id': products[code].id if code in products else False,
+                'differences': ', '.join(names) if kind == 'mismatch' else False,
+                'local_values': ' | '.join(local[i] for i in indexes) if local else False,
+                'remote_values': ' | '.join(remote[i] for i in indexes) if remote else False,
+                'remote_row': remote,
+            }))
+
+        report = self.env['sync.reconcile.report'].create({
+            'config_id': self.id,
+            'execution_type': execution_type,
+            'bucket_count': bucket_count,
+            'bucket_diff_count': len(differing),
+            'local_count': len(local_rows),
+            'line_ids': line_vals,
+            'duration': time.time() - start_time,
+            **self.env['sync.reconcile.report']._rpc_stats_values(client.stats),
+        })
+        if self.reconcile_auto_fix:
+            report.line_ids.filtered(lambda l: l.kind != 'missing_remote').action_fix()
+        return {
+            'report_id': report.id,
+            'differences': len(report.line_ids),
+            'fixed': len(report.line_ids.filtered(lambda l: l.state == 'fixed')),
+            'rpc': client.stats.totals,
+        }
+
+    def action_reconcile_catalog(self):
+        """Concilia ahora el catálogo y abre el informe de diferencias."""
+        self.ensure_one()
+        result = self._reconcile_catalog()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'sync.reconcile.report',
+            'res_id': result['report_id'],
+            'view_mode': 'form',
+        }
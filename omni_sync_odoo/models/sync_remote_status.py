@@ -0,0 +1,186 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.osv import expression
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Documentos remotos por llamada (acota el tamaño del dominio de cada search_read)
+REMOTE_STATUS_CHUNK = 1000
+
+REMOTE_STATES = [
+    ('draft', 'Borrador'),
+    ('sent', 'Enviado'),
+    ('to approve', 'Por Aprobar'),
+    ('sale', 'Pedido de Venta'),
+    ('purchase', 'Orden de Compra'),
+    ('done', 'Bloqueado'),
+    ('cancel', 'Cancelado'),
+]
+REMOTE_DELIVERY_STATUSES = [
+    ('pending', 'Pendiente'),
+    ('started', 'Iniciada'),
+    ('partial', 'Parcial'),
+    ('full', 'Completa'),
+]
+
+
+class SyncRemoteStatusMixin(models.AbstractModel):
+    _name = 'omni.sync.remote.status.mixin'
+    _description = 'Estado Remoto de Documentos Sincronizados'
+
+    # Cada modelo que hereda define qué documento crea en el remoto y su campo de entrega
+    _remote_status_model = None
+    _remote_status_delivery_field = None
+
+    remote_order_id = fields.Integer(
+        string="ID Remoto",
+        readonly=True,
+        copy=False,
+        help="Identificador del documento creado en el servidor remoto."
+    )
+    remote_state = fields.Selection(
+        REMOTE_STATES,
+        string="Estado Remoto",
+        readonly=True,
+        copy=False,
+        help="Estado del documento en el servidor remoto, según la última consulta periódica."
+    )
+    remote_delivery_status = fields.Selection(
+        REMOTE_DELIVERY_STATUSES,
+        string="Entrega Remota",
+        readonly=True,
+        copy=False,
+        help="Avance de la entrega o recepción en el servidor remoto (si el remoto maneja inventario)."
+    )
+    remote_state_date = fields.Datetime(
+        string="Cambio de Estado Remoto",
+        readonly=True,
+        copy=False,
+        help="Fecha en la que se detectó el último cambio de estado en el remoto."
+    )
+
+    def _get_remote_status_domain(self, config):
+        """Documentos enviados a ``config`` cuyo estado remoto todavía puede cambiar."""
+        return [
+            ('is_synced', '=', True),
+            ('sync_config_id', '=', config.id),
+            ('remote_state', '!=', 'cancel'),
+            ('remote_delivery_status', '!=', 'full'),
+            '|', ('remote_state', '!=', 'done'), ('remote_delivery_status', '!=', False),
+        ]
+
+    @api.model
+    def _sync_remote_status(self, config, client):
+        """Trae en bloque el estado remoto de los documentos abiertos de ``config``.
+
+        Una sola ``search_read`` en streaming (partida en trozos de
+        ``REMOTE_STATUS_CHUNK`` documentos) y una escritura por combinación de
+        valores, solo para los documentos cuyo estado cambió. Los enviados
+        antes de guardar el id remoto se buscan por su referencia. Devuelve la
+        cantidad de documentos actualizados.
+        """
+        records = self.search(self._get_remote_status_domain(config))
+        if not records:
+            return 0
+
+        model = self._remote_status_model
+        remote_fields = client.execute_kw(model, 'fields_get', [[]], {'attributes': ['type']})
+        delivery_field = self._remote_status_delivery_field
+        if delivery_field not in remote_fields:
+            delivery_field = None
+        read_fields = ['name', 'state'] + ([delivery_field] if delivery_field else [])
+
+        by_id = {record.remote_order_id: record for record in records if record.remote_order_id}
+        by_ref = {record.remote_order_ref: record for record in records
+                  if not record.remote_order_id and record.remote_order_ref}
+        keys = [('id', remote_id) for remote_id in by_id] + [('name', ref) for ref in by_ref]
+        states = dict(REMOTE_STATES)
+        delivery_statuses = dict(REMOTE_DELIVERY_STATUSES)
+
+        changes = {}
+        matched_by_ref = []
+        for start in range(0, len(keys), REMOTE_STATUS_CHUNK):
+            chunk = keys[start:start + REMOTE_STATUS_CHUNK]
+            domain = expression.OR([
+                [(name, 'in', [value for key, value in chunk if key == name])]
+                for name in ('id', 'name') if any(key == name for key, _value in chunk)
+            ])
+            for remote in client.iter_search_read(model, domain, read_fields):
+                record = by_id.get(remote['id']) or by_ref.get(remote['name'])
+                if not record:
+                    continue
+                if not record.remote_order_id:
+                    matched_by_ref.append((record, remote['id']))
+                delivery_status = remote.get(delivery_field) if delivery_field else False
+                values = {
+                    'remote_state': remote['state'] if remote['state'] in states else False,
+                    'remote_delivery_status': delivery_status if delivery_status in delivery_statuses else False,
+                }
+                if any(record[name] != value for name, value in values.items()):
+                    key = tuple(values.items())
+                    changes[key] = changes.get(key, self.browse()) | record
+
+        now = fields.Datetime.now()
+        for values, changed in changes.items():
+            changed.write(dict(values, remote_state_date=now))
+        # Solo los enviados antes de guardar el id remoto necesitan una escritura propia.
+        for record, remote_id in matched_by_ref:
+            record.remote_order_id = remote_id
+        updated = self.browse().union(*changes.values(), *(record for record, _remote_id in matched_by_ref))
+        return len(updated)
+
+
+class SaleOrder(models.Model):
+    _name = 'sale.order'
+    _inherit = ['sale.order', 'omni.sync.remote.status.mixin']
+
+    _remote_status_model = 'sale.order'
+    _remote_status_delivery_field = 'delivery_status'
+
+
+class AccountMove(models.Model):
+    _name = 'account.move'
+    _inherit = ['account.move', 'omni.sync.remote.status.mixin']
+
+    _remote_status_model = 'purchase.order'
+    _remote_status_delivery_field = 'receipt_status'
+
+
+class SyncConfig(models.Model):
+    _inherit = 'omni.sync.config'
+
+    @api.model
+    def cron_sync_remote_status(self):
+        """Ejecución programada: actualiza el estado remoto de los pedidos y compras enviados."""
+        return self.search([('active', '=', True)])._run_in_parallel('_sync_remote_status')
+
+    def _sync_remote_status(self):
+        self.ensure_one()
+        client = self._get_rpc_client()
+        if not client.authenticate():
+            raise UserError(_('Autenticación fallida en el servidor remoto.'))
+        return {
+            'sales': self.env['sale.order']._sync_remote_status(self, client),
+            'purchases': self.env['account.move']._sync_remote_status(self, client),
+            'rpc': client.stats.totals,
+        }
+
+    def action_sync_remote_status(self):
+        """Actualiza a demanda el estado remoto de los documentos enviados por la conexión."""
+        self.ensure_one()
+        result = self._sync_remote_status()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Estados remotos actualizados'),
+                'message': _('%(sales)s pedidos y %(purchases)s compras cambiaron de estado en el remoto (%(calls)s llamadas RPC).') % {
+                    'sales': result['sales'],
+                    'purchases': result['purchases'],
+                    'calls': result['rpc']['call_count'],
+                },
+                'type': 'success',
+                'sticky': False,
+            },
+        }
@@ -0,0 +1,39 @@
+from odoo import models, fields, api
+
+
+class SyncRpcStatsMixin(models.AbstractModel):
+    _name = 'omni.sync.rpc.mixin'
+    _description = 'Métricas de Llamadas RPC'
+
+    rpc_call_count = fields.Integer(string='Llamadas RPC', readonly=True)
+    rpc_error_count = fields.Integer(string='Errores RPC', readonly=True)
+    rpc_time = fields.Float(string='Tiempo RPC (seg)', readonly=True)
+    rpc_bytes_sent = fields.Integer(string='Bytes Enviados', readonly=True)
+    rpc_bytes_received = fields.Integer(string='Bytes Recibidos', readonly=True)
+    rpc_stats = fields.Json(string='Detalle RPC', readonly=True)
+    rpc_stats_summary = fields.Text(string='Detalle por Método', compute='_compute_rpc_stats_summary')
+
+    @api.depends('rpc_stats')
+    def _compute_rpc_stats_summary(self):
+        for record in self:
+            calls = (record.rpc_stats or {}).get('calls', {})
+            lines = [
+                f"{key}: {values['count']} llamadas, {values['time']:.2f}s "
+                f"(máx. {values['max_time']:.2f}s), {values['bytes_sent']} B enviados, "
+                f"{values['bytes_received']} B recibidos, {values['errors']} errores"
+                for key, values in sorted(calls.items(), key=lambda item: -item[1]['time'])
+            ]
+            record.rpc_stats_summary = '\n'.join(lines)
+
+    @api.model
+    def _rpc_stats_values(self, stats):
+        """Valores a escribir a partir de un ``RpcStats`` de la ejecución."""
+        totals = stats.totals
+        return {
+            'rpc_call_count': totals['call_count'],
+            'rpc_error_count': totals['error_count'],
+            'rpc_time': totals['time'],
+            'rpc_bytes_sent': totals['bytes_sent'],
+            'rpc_bytes_received': totals['bytes_received'],
+            'rpc_stats': stats.as_dict(),
+        }
@@ -0,0 +1,420 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from psycopg2.errors import SerializationFailure
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import socket
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Intentos de una unidad antes de darla por fallida
+MAX_UNIT_ATTEMPTS = 3
+# Tiempo que cada invocación del cron dedica a procesar unidades (seg)
+WORKER_TIME_BUDGET = 900
+
+RUN_KINDS = [
+    ('products', 'Productos'),
+    ('images', 'Imágenes'),
+    ('orders', 'Pedidos de Venta'),
+]
+
+
+def _worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}'
+
+
+class SyncRun(models.Model):
+    """Ejecución de sincronización repartida en unidades de trabajo.
+
+    Cualquier worker (hilos del cron, otros procesos u otros servidores con
+    la misma base) toma unidades pendientes con ``FOR UPDATE SKIP LOCKED``;
+    la ejecución se cierra cuando ya no quedan unidades por procesar.
+    """
+    _name = 'sync.run'
+    _description = 'Ejecución de Sincronización Repartida'
+    _order = 'id desc'
+
+    config_id = fields.Many2one('omni.sync.config', string='Conexión', required=True, ondelete='cascade', index=True)
+    kind = fields.Selection(RUN_KINDS, string='Tipo', required=True)
+    execution_type = fields.Selection([
+        ('manual', 'Manual'),
+        ('auto', 'Automático')
+    ], string='Tipo de Ejecución', default='auto')
+    state = fields.Selection([
+        ('running', 'En Curso'),
+        ('done', 'Completada'),
+        ('failed', 'Con Errores'),
+    ], string='Estado', default='running', required=True, index=True)
+    unit_ids = fields.One2many('sync.work.unit', 'run_id', string='Unidades de Trabajo')
+    unit_count = fields.Integer(string='Unidades', compute='_compute_progress')
+    done_count = fields.Integer(string='Terminadas', compute='_compute_progress')
+    failed_count = fields.Integer(string='Fallidas', compute='_compute_progress')
+    progress = fields.Float(string='Avance (%)', compute='_compute_progress')
+    finish_date = fields.Datetime(string='Fecha de Fin', readonly=True)
+    log_id = fields.Many2one('sync.pictures.log', string='Log', readonly=True, ondelete='set null')
+
+    def _compute_progress(self):
+        counts = {}
+        for run, state, count in self.env['sync.work.unit']._read_group(
+                [('run_id', 'in', self.ids)], ['run_id', 'state'], ['__count']):
+            counts.setdefault(run, {})[state] = count
+        for run in self:
+            run_counts = counts.get(run, {})
+            run.unit_count = sum(run_counts.values())
+            run.done_count = run_counts.get('done', 0)
+            run.failed_count = run_counts.get('failed', 0)
+            run.progress = 100.0 * (run.done_count + run.failed_count) / run.unit_count if run.unit_count else 0.0
+
+    @api.depends('config_id', 'kind', 'create_date')
+    def _compute_display_name(self):
+        kinds = dict(RUN_KINDS)
+        for run in self:
+            run.display_name = '%s - %s (%s)' % (
+                kinds.get(run.kind, ''), run.config_id.name or '',
+                fields.Datetime.to_string(run.create_date) if run.create_date else '')
+
+    def _execute_unit(self, unit, client):
+        """Procesa una unidad de la ejecución y devuelve su resultado."""
+        return getattr(self.config_id, f'_execute_{self.kind}_unit')(unit, client, self.execution_type)
+
+    @api.model
+    def _finalize_runs(self):
+        """Cierra las ejecuciones que ya no tienen unidades pendientes (coordinador)."""
+        self.env.cr.execute("""
+            SELECT r.id FROM sync_run r
+             WHERE r.state = 'running'
+               AND NOT EXISTS (SELECT 1 FROM sync_work_unit u WHERE u.run_id = r.id AND u.state = 'pending')
+               FOR UPDATE SKIP LOCKED
+        """)
+        runs = self.browse([row[0] for row in self.env.cr.fetchall()])
+        for run in runs:
+            run.write({
+                'state': 'failed' if run.failed_count else 'done',
+                'finish_date': fields.Datetime.now(),
+            })
+            if not run.failed_count:
+                run.config_id.last_sync_date = run.finish_date
+            if run.kind == 'products':
+                run._log_products_results()
+            run.config_id.update_stats()
+            _logger.info("Ejecución repartida %s terminada: %s unidades, %s fallidas",
+                         run.display_name, run.unit_count, run.failed_count)
+        return runs
+
+    def _log_products_results(self):
+        """Un solo log con los totales de las unidades, como una descarga sin repartir."""
+        self.ensure_one()
+        done = self.unit_ids.filtered(lambda u: u.state == 'done')
+        totals = {key: sum((unit.result or {}).get(key, 0) for unit in done)
+                  for key in ('created', 'updated', 'skipped')}
+        failed = self.unit_ids.filtered(lambda u: u.state == 'failed')
+        self.log_id = self.env['sync.pictures.log'].create({
+            'config_id': self.config_id.id,
+            'sync_type': 'products',
+            'execution_type': self.execution_type,
+            'status': 'failed' if failed else 'completed',
+            'total_products': sum(totals.values()),
+            'products_synced': totals['created'] + totals['updated'],
+            'products_skipped': totals['skipped'],
+            'error_message': '\n'.join('%s: %s' % (unit.description, unit.error_message) for unit in failed) or False,
+            'duration': sum(self.unit_ids.mapped('duration')),
+        })
+        if not failed:
+            self.env['sync.dead.letter']._resolve('product_pull', self.config_id, self.config_id)
+
+    def action_retry_failed_units(self):
+        """Devuelve a la cola las unidades fallidas y reabre la ejecución."""
+        units = self.unit_ids.filtered(lambda u: u.state == 'failed')
+        if not units:
+            raise UserError(_('No hay unidades fallidas.'))
+        units.write({'state': 'pending', 'attempt_count': 0, 'error_message': False})
+        self.write({'state': 'running', 'finish_date': False})
+        self.env.ref('omni_sync_odoo.ir_cron_omni_sync_work_units')._trigger()
+
+
+class SyncWorkUnit(models.Model):
+    _name = 'sync.work.unit'
+    _description = 'Unidad de Trabajo de Sincronización'
+    _order = 'run_id desc, sequence'
+
+    run_id = fields.Many2one('sync.run', string='Ejecución', required=True, ondelete='cascade', index=True)
+    config_id = fields.Many2one(related='run_id.config_id', store=True, string='Conexión')
+    sequence = fields.Integer(string='Secuencia', required=True)
+    params = fields.Json(string='Parámetros', required=True)
+    description = fields.Char(string='Descripción')
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('done', 'Terminada'),
+        ('failed', 'Fallida'),
+    ], string='Estado', default='pending', required=True, index=True)
+    attempt_count = fields.Integer(string='Intentos', default=0)
+    worker = fields.Char(string='Procesada por', readonly=True)
+    finish_date = fields.Datetime(string='Fecha de Fin', readonly=True)
+    duration = fields.Float(string='Duración (seg)', readonly=True)
+    result = fields.Json(string='Resultado', readonly=True)
+    error_message = fields.Text(string='Mensaje de Error', readonly=True)
+
+    @api.model
+    def _claim_next(self, exclude_ids=()):
+        """Toma la siguiente unidad pendiente y la bloquea hasta el fin de la transacción.
+
+        Las unidades que otro worker está procesando quedan bloqueadas y se
+        saltan; si ese worker muere, su transacción se deshace y la unidad
+        vuelve a estar disponible sin intervención.
+        """
+        self.env.cr.execute("""
+            SELECT u.id FROM sync_work_unit u
+              JOIN sync_run r ON r.id = u.run_id
+             WHERE u.state = 'pending' AND r.state = 'running' AND u.id != ALL(%s::int[])
+          ORDER BY u.attempt_count, u.run_id, u.sequence
+             LIMIT 1
+               FOR UPDATE OF u SKIP LOCKED
+        """, (list(exclude_ids),))
+        row = self.env.cr.fetchone()
+        return self.browse(row[0]) if row else self.browse()
+
+    def _execute(self, client):
+        """Procesa la unidad en un savepoint y registra su resultado; los errores
+        devuelven la unidad a la cola hasta agotar ``MAX_UNIT_ATTEMPTS``."""
+        self.ensure_one()
+        start_time = time.time()
+        try:
+            with self.env.cr.savepoint():
+                result = self.run_id._execute_unit(self, client)
+        except Exception as e:
+            _logger.exception("Error en la unidad %s de %s", self.sequence, self.run_id.display_name)
+            self._record_attempt_failure(e, time.time() - start_time)
+            return False
+        self.write({
+            'state': 'done',
+            'attempt_count': self.attempt_count + 1,
+            'result': result,
+            'error_message': False,
+            'worker': _worker_name(),
+            'finish_date': fields.Datetime.now(),
+            'duration': time.time() - start_time,
+        })
+        return True
+
+    def _record_attempt_failure(self, error, duration=0.0):
+        """Cuenta un intento fallido: la unidad vuelve a la cola hasta agotar ``MAX_UNIT_ATTEMPTS``."""
+        self.ensure_one()
+        attempts = self.attempt_count + 1
+        self.write({
+            'state': 'failed' if attempts >= MAX_UNIT_ATTEMPTS else 'pending',
+            'attempt_count': attempts,
+            'error_message': str(error),
+            'worker': _worker_name(),
+            'duration': duration,
+        })
+
+    @api.model
+    def _process_work_units(self, deadline):
+        """Bucle de un worker: cada unidad se toma, procesa y confirma en su propia transacción."""
+        attempted = set()
+        clients = {}
+        processed = 0
+        while time.time() < deadline:
+            unit_id = None
+            try:
+                with self.pool.cursor() as cr:
+                    unit = self.env(cr=cr)['sync.work.unit']._claim_next(attempted)
+                    if not unit:
+                        break
+                    unit_id = unit.id
+                    attempted.add(unit_id)
+                    config = unit.run_id.config_id
+                    if config.id not in clients:
+                        clients[config.id] = config._get_remote_connection()
+                    unit._execute(clients[config.id])
+            except SerializationFailure:
+                # Otro worker cambió la unidad entre la lectura y el bloqueo: se toma otra
+                continue
+            except Exception as e:
+                # Un error fuera de la unidad (conexión, autenticación) deshizo la transacción
+                # que la tomó: el intento se cuenta aparte y el worker sigue con las demás
+                _logger.exception("Error tomando la unidad de trabajo %s", unit_id)
+                if unit_id:
+                    try:
+                        with self.pool.cursor() as cr:
+                            self.env(cr=cr)['sync.work.unit'].browse(unit_id)._record_attempt_failure(e)
+                    except Exception:
+                        _logger.exception("No se pudo registrar el error de la unidad de trabajo %s", unit_id)
+                continue
+            processed += 1
+        try:
+            with self.pool.cursor() as cr:
+                self.env(cr=cr)['sync.run']._finalize_runs()
+        except SerializationFailure:
+            pass
+        except Exception:
+            _logger.exception("Error cerrando las ejecuciones de sincronización")
+        return processed
+
+    @api.model
+    def cron_process_work_units(self):
+        """Ejecución programada: procesa unidades pendientes con varios hilos a la vez.
+
+        Otros procesos con acceso a la misma base pueden ejecutar
+        ``_process_work_units`` al mismo tiempo: el reparto es por bloqueo de
+        filas, no por proceso.
+        """
+        workers = self.env['omni.sync.config']._get_max_parallel_syncs()
+        deadline = time.time() + WORKER_TIME_BUDGET
+        if workers <= 1 or getattr(threading.current_thread(), 'testing', False):
+            processed = self._process_work_units(deadline)
+        else:
+            def worker():
+                thread = threading.current_thread()
+                thread.dbname = self.env.cr.dbname
+                thread.uid = self.env.uid
+                return self._process_work_units(deadline)
+
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='omni_sync_unit') as executor:
+                processed = sum(future.result() for future in [executor.submit(worker) for _i in range(workers)])
+
+        with self.pool.cursor() as cr:
+            pending = self.env(cr=cr)['sync.work.unit'].search_count([
+                ('state', '=', 'pending'), ('run_id.state', '=', 'running'),
+            ])
+        if pending:
+            self.env.ref('omni_sync_odoo.ir_cron_omni_sync_work_units')._trigger()
+        return {'processed': processed, 'pending': pending}
+
+
+class SyncConfig(models.Model):
+    _inherit = 'omni.sync.config'
+
+    sync_sharding = fields.Boolean(
+        string='Repartir Sincronización',
+        default=False,
+        help="Divide las descargas de productos e imágenes en unidades de trabajo que procesan en paralelo varios workers del cron (o varios servidores con la misma base)."
+    )
+    shard_size = fields.Integer(
+        string='Productos por Unidad',
+        default=2000,
+        help="Cantidad de productos remotos que abarca cada unidad de trabajo de una sincronización repartida."
+    )
+
+    def _plan_sync_run(self, kind, execution_type='auto'):
+        """Crea la ejecución repartida de ``kind`` con sus unidades y despierta a los workers.
+
+        Si ya hay una en curso del mismo tipo se devuelve esa: las unidades de
+        una ejecución a medias no se duplican.
+        """
+        self.ensure_one()
+        Run = self.env['sync.run']
+        run = Run.search([('config_id', '=', self.id), ('kind', '=', kind), ('state', '=', 'running')], limit=1)
+        if run:
+            return run
+        units = getattr(self, f'_plan_{kind}_units')()
+        run = Run.create({
+            'config_id': self.id,
+            'kind': kind,
+            'execution_type': execution_type,
+            'unit_ids': [(0, 0, dict(unit, sequence=sequence)) for sequence, unit in enumerate(units)],
+        })
+        if units:
+            self.env.ref('omni_sync_odoo.ir_cron_omni_sync_work_units')._trigger()
+        else:
+            run.write({'state': 'done', 'finish_date': fields.Datetime.now()})
+        return run
+
+    def _id_range_units(self, client, domain, **params):
+        """Parte los productos remotos de ``domain`` en tramos de ``shard_size`` ids consecutivos."""
+        ids = client.execute_kw('product.product', 'search', [domain], {'order': 'id'})
+        size = self.shard_size or 2000
+        units = []
+        for start in range(0, len(ids), size):
+            chunk = ids[start:start + size]
+            units.append({
+                'params': dict(params, id_range=[chunk[0], chunk[-1]]),
+                'description': '%s ids %s-%s' % (params.get('brand', ''), chunk[0], chunk[-1]),
+            })
+        return units
+
+    def _plan_products_units(self):
+        client = self._get_remote_connection()
+        return self._id_range_units(client, [('active', '=', True)])
+
+    def _plan_images_units(self):
+        client = self._get_remote_connection()
+        wizard = self.env['sync.pictures.wizard'].new({'config_id': self.id})
+        units = []
+        for brand in wizard._get_brands():
+            domain = [] if brand == 'TOTAL' else [('product_brand_id.name', '=', brand)]
+            units += self._id_range_units(client, domain, brand=brand)
+        return units
+
+    def _pending_sale_orders(self):
+        """Pedidos confirmados cuyo envío a esta conexión falló y falta reintentar."""
+        return self.env['sale.order'].search([
+            ('state', '=', 'sale'),
+            ('is_synced', '=', False),
+            ('is_remote_order', '=', False),
+            ('sync_status', '=', 'failed'),
+            '|', ('sync_config_id', '=', self.id), ('sync_config_id', '=', False),
+        ], order='id')
+
+    def _plan_orders_units(self):
+        orders = self._pending_sale_orders()
+        size = self._get_batch_size(50)
+        return [{
+            'params': {'order_ids': orders.ids[start:start + size]},
+            'description': _('%s pedidos') % len(orders.ids[start:start + size]),
+        } for start in range(0, len(orders), size)]
+
+    def _execute_products_unit(self, unit, client, execution_type):
+        # Con el cliente ya autenticado del worker; el log lo escribe la ejecución al cerrarse
+        first, last = unit.params['id_range']
+        res = self._pull_remote_products(client, self._get_batch_size(100),
+                                         domain=[('id', '>=', first), ('id', '<=', last)])
+        return {'created': res['created'], 'updated': res['updated'], 'skipped': res['skipped']}
+
+    def _execute_images_unit(self, unit, client, execution_type):
+        wizard = self.env['sync.pictures.wizard'].create({
+            'config_id': self.id,
+            'execution_type': execution_type,
+            'sync_all_brands': False,
+            'brand_to_sync': unit.params['brand'],
+        })
+        first, last = unit.params['id_range']
+        with client.track() as rpc_stats:
+            log, _next_offset = wizard._procesar_marca(unit.params['brand'], client, rpc_stats,
+                                                       domain=[('id', '>=', first), ('id', '<=', last)])
+        if log.status == 'failed':
+            raise UserError(log.error_message)
+        return {'synced': log.products_synced, 'skipped': log.products_skipped}
+
+    def _execute_orders_unit(self, unit, client, execution_type):
+        orders = self.env['sale.order'].browse(unit.params['order_ids']).exists().filtered(lambda o: not o.is_synced)
+        self._push_sale_orders(client, orders)
+        return {'synced': len(orders.filtered('is_synced')), 'failed': len(orders.filtered(lambda o: not o.is_synced))}
+
+    def _scheduled_sync_products(self, resume, deadline, execution_type):
+        if self.sync_sharding:
+            return {'sync_run_id': self._plan_sync_run('products', execution_type).id}
+        return super()._scheduled_sync_products(resume, deadline, execution_type)
+
+    def _scheduled_sync_images(self, resume, deadline, execution_type):
+        if self.sync_sharding:
+            return {'sync_run_id': self._plan_sync_run('images', execution_type).id}
+        return super()._scheduled_sync_images(resume, deadline, execution_type)
+
+    def action_start_sharded_sync(self):
+        """Reparte en unidades de trabajo la descarga de productos, de imágenes y
+        el reenvío de pedidos fallidos, según lo habilitado en la conexión."""
+        self.ensure_one()
+        runs = self.env['sync.run']
+        if self.sync_products:
+            runs |= self._plan_sync_run('products', 'manual')
+        if self.sync_images:
+            runs |= self._plan_sync_run('images', 'manual')
+        if self.sync_sales:
+            runs |= self._plan_sync_run('orders', 'manual')
+        action = self.env['ir.actions.act_window']._for_xml_id('omni_sync_odoo.action_sync_run')
+        action['domain'] = [('id', 'in', runs.ids)]
+        return action
@@ -0,0 +1,87 @@
+from odoo import models, fields, api
+from datetime import timedelta
+
+
+class SyncStatsMixin(models.AbstractModel):
+    _name = 'omni.sync.stats.mixin'
+    _description = 'Estadísticas Agregadas de Sincronización'
+
+    # Cada modelo que hereda define de dónde salen la conexión, la fecha y el estado
+    _sync_stats_config_field = None
+    _sync_stats_date_field = 'create_date'
+    _sync_stats_status_field = None
+    _sync_stats_failed_values = ()
+
+    def _get_sync_stats_domain(self):
+        """Dominio de los documentos que participan en la serie (sincronizados y fallidos)."""
+        return [('is_synced', '=', True)]
+
+    @api.model
+    def get_sync_stats(self, interval='day', date_from=None, date_to=None):
+        """Devuelve estadísticas de sincronización para el dashboard.
+
+        Los totales y la serie temporal se calculan con ``_read_group`` en la
+        base de datos, sin cargar los documentos en memoria. La serie agrupa por
+        conexión y por día o semana (``interval``) en una sola consulta, dentro
+        de la ventana indicada (por defecto los últimos 30 días).
+        """
+        if interval not in ('day', 'week'):
+            interval = 'day'
+
+        [(total_count, total_amount)] = self._read_group(
+            [('is_synced', '=', True)], [], ['__count', 'amount_total:sum'],
+        )
+
+        date_to = fields.Datetime.to_datetime(date_to) or fields.Datetime.now()
+        date_from = fields.Datetime.to_datetime(date_from) or date_to - timedelta(days=30)
+        date_field = self._sync_stats_date_field
+        status_field = self._sync_stats_status_field
+
+        domain = self._get_sync_stats_domain() + [
+            (date_field, '>=', date_from),
+            (date_field, '<=', date_to),
+        ]
+        groupby = [self._sync_stats_config_field, f'{date_field}:{interval}', 'is_synced']
+        if status_field:
+            groupby.append(status_field)
+
+        buckets = {}
+        failed_count = 0
+        for group in self._read_group(domain, groupby, ['__count', 'amount_total:sum']):
+            config, period, is_synced = group[:3]
+            status = group[3] if status_field else False
+            count, amount = group[-2:]
+
+            bucket = buckets.setdefault((config, period), {'count': 0, 'amount': 0.0, 'failed': 0})
+            if status in self._sync_stats_failed_values:
+                bucket['failed'] += count
+                failed_count += count
+            elif is_synced:
+                bucket['count'] += count
+                bucket['amount'] += amount or 0.0
+
+        series = []
+        for (config, period), bucket in buckets.items():
+            if isinstance(config, models.BaseModel):
+                config_key, config_name = config.id, config.display_name
+            else:
+                config_key, config_name = config or False, config or ''
+            series.append({
+                'config_id': config_key,
+                'config_name': config_name,
+                'period': fields.Date.to_string(period) if period else False,
+                'count': bucket['count'],
+                'amount': bucket['amount'],
+                'avg': bucket['amount'] / bucket['count'] if bucket['count'] else 0.0,
+                'failed': bucket['failed'],
+            })
+        series.sort(key=lambda point: (point['config_name'], point['period'] or ''))
+
+        return {
+            'total_count': total_count,
+            'avg_value': (total_amount or 0.0) / total_count if total_count else 0.0,
+            'total_amount': total_amount or 0.0,
+            'failed_count': failed_count,
+            'interval': interval,
+            'series': series,
+        }
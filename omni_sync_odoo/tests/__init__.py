@@ -0,0 +1,2 @@
+from . import test_remote_sync
+from . import test_sync_benchmark
@@ -0,0 +1,67 @@
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.addons.base.tests.common import DISABLED_MAIL_CONTEXT
+
+from ..models.sync_receive import _UNSUPPORTED_ENDPOINTS
+from .fake_remote import FakeRemoteServer
+
+
+class SyncRemoteCase(AccountTestInvoicingCommon):
+    """Conexión de sincronización apuntando a una instancia remota simulada.
+
+    Cada prueba empieza con una base remota vacía en ``self.remote``.
+    """
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.env = cls.env(context=dict(cls.env.context, **DISABLED_MAIL_CONTEXT))
+        cls.server = FakeRemoteServer().start()
+        cls.addClassCleanup(cls.server.stop)
+        cls.config = cls.env['omni.sync.config'].create({
+            'name': 'Remoto de Pruebas',
+            'remote_url': cls.server.url,
+            'remote_database': 'remote',
+            'remote_username': 'admin',
+            'remote_password': 'admin',
+            'sync_products': True,
+            'sync_images': True,
+            'sync_sales': True,
+            'sync_purchases': True,
+            'timeout': 10,
+            'batch_size': 50,
+            # Los reintentos se prueban aparte; el resto espera el primer error tal cual
+            'rpc_max_retries': 0,
+        })
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.server.reset()
+        # El breaker y los endpoints no soportados viven en memoria del proceso:
+        # no deben arrastrarse de otra prueba
+        self.config._get_circuit_breaker().reset()
+        _UNSUPPORTED_ENDPOINTS.clear()
+
+    def _create_local_products(self, codes, **values):
+        return self.env['product.product'].create([dict(values, name=f'Producto {code}', default_code=code)
+                                                   for code in codes])
+
+    def _create_sale_orders(self, products, count=1, lines=3):
+        return self.env['sale.order'].create([{
+            'partner_id': self.partner_a.id,
+            'order_line': [(0, 0, {
+                'product_id': products[(i * lines + j) % len(products)].id,
+                'product_uom_qty': j + 1,
+            }) for j in range(lines)],
+        } for i in range(count)])
+
+    def _create_invoices(self, products, count=1, lines=3):
+        return self.env['account.move'].create([{
+            'move_type': 'out_invoice',
+            'partner_id': self.partner_a.id,
+            'invoice_date': '2024-01-01',
+            'invoice_line_ids': [(0, 0, {
+                'product_id': products[(i * lines + j) % len(products)].id,
+                'quantity': j + 1,
+                'price_unit': 100.0,
+            }) for j in range(lines)],
+        } for i in range(count)])
@@ -0,0 +1,571 @@
+"""Instancia Odoo remota simulada para las pruebas de sincronización.
+
+``FakeRemoteOdoo`` guarda los registros en memoria e implementa los
+servicios ``common`` y ``object`` que usa el módulo, por XML-RPC y JSON-RPC;
+``FakeRemoteServer`` la publica en un puerto local desde un hilo del mismo
+proceso, sin acceso a red. Se puede simular latencia, tamaño de las
+respuestas y fallos (``Fault`` o errores HTTP) por modelo y método.
+"""
+import base64
+import hashlib
+import io
+import itertools
+import json
+import random
+import threading
+import time
+import xmlrpc.client
+from collections import defaultdict
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+from ..tools.catalog_digest import CATALOG_FIELDS, bucket_digests, bucket_rows, catalog_row, unique_rows
+
+# Campos que devuelve ``fields_get`` por modelo (se pueden ampliar con ``add_fields``)
+DEFAULT_FIELDS = {
+    'res.partner': {'name': 'char', 'vat': 'char', 'street': 'char', 'city': 'char', 'phone': 'char',
+                    'email': 'char', 'is_company': 'boolean', 'supplier_rank': 'integer', 'company_type': 'selection'},
+    'product.brand': {'name': 'char'},
+    'product.template': {'name': 'char', 'default_code': 'char', 'active': 'boolean', 'list_price': 'float'},
+    'product.product': {'name': 'char', 'default_code': 'char', 'barcode': 'char', 'list_price': 'float',
+                        'standard_price': 'float', 'type': 'selection', 'active': 'boolean',
+                        'image_1920': 'binary', 'product_brand_id': 'many2one', 'product_tmpl_id': 'many2one'},
+    'utm.campaign': {'name': 'char'},
+    'sale.order': {'name': 'char', 'partner_id': 'many2one', 'origin': 'char', 'date_order': 'datetime',
+                   'state': 'selection', 'order_line': 'one2many', 'campaign_id': 'many2one',
+                   'omni_idempotency_key': 'char', 'delivery_status': 'selection',
+                   'meli_tracking_pdf': 'binary', 'meli_tracking_filename': 'char'},
+    'sale.order.line': {'order_id': 'many2one', 'product_id': 'many2one', 'product_uom_qty': 'float', 'name': 'text'},
+    'purchase.order': {'name': 'char', 'partner_id': 'many2one', 'partner_ref': 'char', 'state': 'selection',
+                       'order_line': 'one2many', 'omni_idempotency_key': 'char', 'receipt_status': 'selection'},
+    'purchase.order.line': {'order_id': 'many2one', 'product_id': 'many2one', 'product_qty': 'float',
+                            'price_unit': 'float', 'name': 'text', 'date_planned': 'datetime'},
+    'ir.attachment': {'name': 'char', 'datas': 'binary', 'mimetype': 'char', 'checksum': 'char',
+                      'res_model': 'char', 'res_id': 'integer'},
+    'omni.sync.attachment.chunk': {'checksum': 'char', 'sequence': 'integer', 'data': 'binary'},
+    'omni.sync.subscription': {'callback_url': 'char', 'token': 'char', 'model_names': 'char', 'active': 'boolean'},
+    'res.currency': {'name': 'char'},
+    'res.country': {'name': 'char', 'code': 'char'},
+    'product.category': {'name': 'char', 'complete_name': 'char'},
+    'product.tag': {'name': 'char'},
+    'product.pricelist': {'name': 'char', 'currency_id': 'many2one', 'item_ids': 'one2many'},
+    'product.pricelist.item': {'pricelist_id': 'many2one', 'applied_on': 'selection', 'min_quantity': 'float',
+                               'compute_price': 'selection', 'fixed_price': 'float', 'percent_price': 'float',
+                               'base': 'selection', 'price_discount': 'float', 'price_surcharge': 'float',
+                               'price_round': 'float', 'price_min_margin': 'float', 'price_max_margin': 'float',
+                               'date_start': 'datetime', 'date_end': 'datetime', 'product_tmpl_id': 'many2one',
+                               'product_id': 'many2one', 'categ_id': 'many2one', 'base_pricelist_id': 'many2one'},
+}
+RELATIONS = {
+    ('product.product', 'product_brand_id'): 'product.brand',
+    ('product.product', 'product_tmpl_id'): 'product.template',
+    ('sale.order', 'partner_id'): 'res.partner',
+    ('sale.order', 'campaign_id'): 'utm.campaign',
+    ('sale.order.line', 'order_id'): 'sale.order',
+    ('sale.order.line', 'product_id'): 'product.product',
+    ('purchase.order', 'partner_id'): 'res.partner',
+    ('purchase.order.line', 'order_id'): 'purchase.order',
+    ('purchase.order.line', 'product_id'): 'product.product',
+    ('product.pricelist', 'currency_id'): 'res.currency',
+    ('product.pricelist.item', 'pricelist_id'): 'product.pricelist',
+}
+# One2many: (modelo, campo) -> (modelo de las líneas, campo inverso)
+ONE2MANY = {
+    ('sale.order', 'order_line'): ('sale.order.line', 'order_id'),
+    ('purchase.order', 'order_line'): ('purchase.order.line', 'order_id'),
+    ('product.pricelist', 'item_ids'): ('product.pricelist.item', 'pricelist_id'),
+}
+SEQUENCES = {'sale.order': 'S%05d', 'purchase.order': 'P%05d'}
+
+
+class RemoteHttpError(Exception):
+    """Hace que el servidor responda con un error HTTP 500 en lugar de un ``Fault``."""
+
+
+class FakeRemoteOdoo:
+    """Base de datos remota en memoria con la API ``execute_kw`` de Odoo."""
+
+    def __init__(self, database='remote', login='admin', password='admin', uid=2):
+        self.database = database
+        self.login = login
+        self.password = password
+        self.uid = uid
+        self.fields = {model: dict(fields) for model, fields in DEFAULT_FIELDS.items()}
+        self.records = defaultdict(dict)
+        self._ids = defaultdict(lambda: itertools.count(1))
+        self.latency = 0.0
+        self.method_latency = {}
+        self.payload_padding = 0
+        self.failures = []
+        self.calls = []
+        # False simula un remoto con una versión del módulo sin endpoints de
+        # recepción ni de subida de adjuntos
+        self.receive_endpoints = True
+        self.lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Preparación de datos y escenarios
+    # ------------------------------------------------------------------
+    def add_fields(self, model, fields):
+        self.fields.setdefault(model, {}).update(fields)
+
+    def seed(self, model, values_list):
+        """Crea registros directamente (sin contar como llamadas) y devuelve sus IDs."""
+        with self.lock:
+            return [self._create(model, values) for values in values_list]
+
+    def seed_products(self, count, brands=('MARCA A', 'MARCA B'), image_size=0, code_prefix='REM', seed=1):
+        """Crea ``count`` productos repartidos entre ``brands``, con imágenes PNG
+        de unos ``image_size`` bytes si se indica."""
+        brand_ids = self.seed('product.brand', [{'name': name} for name in brands])
+        image = make_png(image_size, seed) if image_size else False
+        return self.seed('product.product', [{
+            'name': f'Producto remoto {i}',
+            'default_code': f'{code_prefix}-{i:06d}',
+            'list_price': 10.0 + i % 100,
+            'standard_price': 5.0 + i % 50,
+            'type': 'consu',
+            'active': True,
+            'image_1920': image,
+            'product_brand_id': brand_ids[i % len(brand_ids)],
+        } for i in range(count)])
+
+    def set_latency(self, seconds, model=None, method=None):
+        """Latencia fija por llamada, global o para ``model``/``method``."""
+        if model or method:
+            self.method_latency[(model, method)] = seconds
+        else:
+            self.latency = seconds
+
+    def fail(self, model=None, method=None, times=1, message='Fallo simulado', http=False, delay=0.0, after=False):
+        """Hace fallar las próximas ``times`` llamadas que coincidan (``None`` = todas).
+
+        Con ``http`` se responde con un error HTTP 500 en lugar de un ``Fault``;
+        con ``delay`` se espera antes de fallar (útil para probar timeouts);
+        con ``after`` la llamada se ejecuta y lo que se pierde es la respuesta.
+        """
+        self.failures.append({'model': model, 'method': method, 'times': times,
+                              'message': message, 'http': http, 'delay': delay, 'after': after})
+
+    def count_calls(self, model=None, method=None):
+        return sum(1 for call in self.calls
+                   if (model is None or call['model'] == model) and (method is None or call['method'] == method))
+
+    def reset_calls(self):
+        self.calls = []
+
+    # ------------------------------------------------------------------
+    # Despacho
+    # ------------------------------------------------------------------
+    def dispatch(self, service, method, params):
+        if service == 'common':
+            model, call = 'common', method
+        else:
+            model, call = params[3], params[4]
+        delay = self.method_latency.get((model, call), self.method_latency.get((model, None),
+                                        self.method_latency.get((None, call), self.latency)))
+        if delay:
+            time.sleep(delay)
+
+        failure = self._pop_failure(model, call)
+        if failure and not failure['after']:
+            self._raise_failure(failure)
+        result = self._dispatch(service, method, params)
+        if failure:
+            self._raise_failure(failure)
+        return result
+
+    def _dispatch(self, service, method, params):
+        if service == 'common':
+            return self._common(method, params)
+        if method != 'execute_kw':
+            raise xmlrpc.client.Fault(1, f'Método no soportado: {method}')
+        database, uid, password, model, call, args = params[:6]
+        kwargs = params[6] if len(params) > 6 else {}
+        if database != self.database or uid != self.uid or password != self.password:
+            raise xmlrpc.client.Fault(3, 'Access Denied')
+        with self.lock:
+            return self.execute(model, call, list(args), dict(kwargs))
+
+    def _raise_failure(self, failure):
+        if failure['delay']:
+            time.sleep(failure['delay'])
+        if failure['http']:
+            raise RemoteHttpError(failure['message'])
+        raise xmlrpc.client.Fault(1, failure['message'])
+
+    def _pop_failure(self, model, method):
+        with self.lock:
+            for failure in self.failures:
+                if failure['model'] not in (None, model) or failure['method'] not in (None, method):
+                    continue
+                failure['times'] -= 1
+                if failure['times'] <= 0:
+                    self.failures.remove(failure)
+                return failure
+        return None
+
+    def _common(self, method, params):
+        if method == 'version':
+            return {'server_version': '17.0', 'server_version_info': [17, 0, 0, 'final', 0, ''], 'protocol_version': 1}
+        if method in ('authenticate', 'login'):
+            database, login, password = params[:3]
+            ok = (database, login, password) == (self.database, self.login, self.password)
+            return self.uid if ok else False
+        raise xmlrpc.client.Fault(1, f'Método no soportado: {method}')
+
+    # ------------------------------------------------------------------
+    # ORM simulado
+    # ------------------------------------------------------------------
+    def execute(self, model, method, args, kwargs):
+        if model not in self.fields:
+            raise xmlrpc.client.Fault(2, f"Object {model} doesn't exist")
+        handler = getattr(self, f'_rpc_{method}', None)
+        if method.startswith('omni_') and not self.receive_endpoints:
+            handler = None
+        if handler is None:
+            raise xmlrpc.client.Fault(2, f"The method '{method}' does not exist on the model '{model}'")
+        return handler(model, *args, **kwargs)
+
+    def _rpc_fields_get(self, model, allfields=None, attributes=None, **kwargs):
+        return {name: {'type': ftype, 'string': name} for name, ftype in self.fields[model].items()}
+
+    def _rpc_search(self, model, domain, offset=0, limit=None, order=None, **kwargs):
+        records = [record for record in self.records[model].values() if self._match(model, record, domain)]
+        records.sort(key=lambda record: record['id'])
+        if order and order.strip().endswith('desc'):
+            records.reverse()
+        records = records[offset:offset + limit if limit else None]
+        return [record['id'] for record in records]
+
+    def _rpc_search_count(self, model, domain, **kwargs):
+        return len(self._rpc_search(model, domain))
+
+    def _rpc_read(self, model, ids, fields=None, **kwargs):
+        result = []
+        for record_id in ids:
+            record = self.records[model].get(record_id)
+            if record is None:
+                continue
+            names = fields or list(self.fields[model])
+            values = {'id': record_id}
+            for name in names:
+                if name == 'id':
+                    continue
+                value = record.get(name, False)
+                comodel = RELATIONS.get((model, name))
+                if comodel and value:
+                    value = [value, self.records[comodel].get(value, {}).get('name') or '']
+                values[name] = value
+            if self.payload_padding:
+                values['x_padding'] = 'x' * self.payload_padding
+            result.append(values)
+        return result
+
+    def _rpc_search_read(self, model, domain=None, fields=None, offset=0, limit=None, order=None, **kwargs):
+        ids = self._rpc_search(model, domain or [], offset=offset, limit=limit, order=order)
+        return self._rpc_read(model, ids, fields=fields)
+
+    def _rpc_create(self, model, values, **kwargs):
+        if isinstance(values, list):
+            return [self._create(model, vals) for vals in values]
+        return self._create(model, values)
+
+    def _rpc_write(self, model, ids, values, **kwargs):
+        for record_id in ids:
+            self._write(model, record_id, values)
+        return True
+
+    def _rpc_unlink(self, model, ids, **kwargs):
+        for record_id in ids:
+            self.records[model].pop(record_id, None)
+        return True
+
+    def _rpc_button_confirm(self, model, ids, **kwargs):
+        return self._rpc_write(model, ids, {'state': 'purchase'})
+
+    def _rpc_action_confirm(self, model, ids, **kwargs):
+        return self._rpc_write(model, ids, {'state': 'sale'})
+
+    def _catalog_rows(self):
+        ids = self._rpc_search('product.product', [('active', '=', True), ('default_code', '!=', False)])
+        return unique_rows(catalog_row(values) for values in
+                           self._rpc_read('product.product', sorted(ids), ['default_code', *CATALOG_FIELDS]))
+
+    def _rpc_omni_catalog_digest(self, model, bucket_count, **kwargs):
+        return bucket_digests(self._catalog_rows(), bucket_count)
+
+    def _rpc_omni_catalog_bucket(self, model, bucket_count, buckets, **kwargs):
+        return bucket_rows(self._catalog_rows(), bucket_count, buckets)
+
+    def _rpc_omni_subscribe(self, model, callback_url, token, model_names, **kwargs):
+        values = {'callback_url': callback_url, 'token': token, 'model_names': ','.join(model_names), 'active': True}
+        for record_id, record in self.records[model].items():
+            if record['callback_url'] == callback_url:
+                record.update(values)
+                return record_id
+        return self._create(model, values)
+
+    def _rpc_omni_unsubscribe(self, model, subscription_id, **kwargs):
+        self.records[model][subscription_id]['active'] = False
+        return True
+
+    def _rpc_omni_receive_orders(self, model, payloads, **kwargs):
+        return [self._receive_document(model, payload, 'product_uom_qty', {'is_company': True})
+                for payload in payloads]
+
+    def _rpc_omni_receive_purchases(self, model, payloads, **kwargs):
+        return [self._receive_document(model, payload, 'product_qty', {'supplier_rank': 1, 'company_type': 'company'})
+                for payload in payloads]
+
+    def _rpc_omni_upload_begin(self, model, checksum, size, **kwargs):
+        attachment_ids = self._rpc_search('ir.attachment', self._pending_upload_domain(model, checksum), limit=1)
+        if attachment_ids:
+            return {'attachment_id': attachment_ids[0]}
+        chunks = self._rpc_search_read(model, [('checksum', '=', checksum)], ['sequence'])
+        return {'attachment_id': False, 'received': [chunk['sequence'] for chunk in chunks]}
+
+    def _rpc_omni_upload_chunk(self, model, checksum, sequence, data, **kwargs):
+        if not self._rpc_search(model, [('checksum', '=', checksum), ('sequence', '=', sequence)]):
+            self._create(model, {'checksum': checksum, 'sequence': sequence, 'data': data})
+        return True
+
+    def _rpc_omni_upload_finish(self, model, checksum, name, mimetype, chunk_count, **kwargs):
+        attachment_ids = self._rpc_search('ir.attachment', self._pending_upload_domain(model, checksum), limit=1)
+        if attachment_ids:
+            return attachment_ids[0]
+        chunks = sorted(self._rpc_search_read(model, [('checksum', '=', checksum)], ['sequence', 'data']),
+                        key=lambda chunk: chunk['sequence'])
+        if [chunk['sequence'] for chunk in chunks] != list(range(chunk_count)):
+            raise xmlrpc.client.Fault(1, f'Faltan partes del adjunto {name}')
+        raw = b''.join(base64.b64decode(chunk['data'] or '') for chunk in chunks)
+        if hashlib.sha1(raw).hexdigest() != checksum:
+            raise xmlrpc.client.Fault(1, f'El adjunto {name} llegó dañado')
+        self._rpc_unlink(model, [chunk['id'] for chunk in chunks])
+        return self._create('ir.attachment', {'name': name, 'mimetype': mimetype, 'checksum': checksum,
+                                              'datas': base64.b64encode(raw).decode(), 'res_model': model})
+
+    def _pending_upload_domain(self, model, checksum):
+        return [('checksum', '=', checksum), ('res_model', '=', model), ('res_id', '=', False)]
+
+    def _receive_document(self, model, payload, qty_field, partner_values):
+        """Versión simplificada de los endpoints de recepción del módulo."""
+        key = payload.get('idempotency_key')
+        existing_ids = self._rpc_search(model, [('omni_idempotency_key', '=', key)], limit=1) if key else []
+        if existing_ids:
+            record = self.records[model][existing_ids[0]]
+            codes = {self.records['product.product'][line['product_id']].get('default_code')
+                     for line in self.records[f'{model}.line'].values() if line['order_id'] == record['id']}
+            return {'ok': True, 'id': record['id'], 'name': record['name'], 'duplicate': True,
+                    'lines': [{'default_code': line['default_code'],
+                               'status': 'synced' if line['default_code'] in codes else 'not_found'}
+                              for line in payload.get('lines', ())]}
+        products = {}
+        for record in self.records['product.product'].values():
+            if record.get('default_code'):
+                products.setdefault(record['default_code'], record['id'])
+        lines, line_results = [], []
+        for line in payload.get('lines', ()):
+            product_id = products.get(line['default_code'])
+            line_results.append({'default_code': line['default_code'], 'status': 'synced' if product_id else 'not_found'})
+            if product_id:
+                values = {'product_id': product_id, qty_field: line.get(qty_field, 1.0), 'name': line.get('name')}
+                if 'price_unit' in line:
+                    values['price_unit'] = line['price_unit']
+                lines.append((0, 0, values))
+        if not lines:
+            return {'ok': True, 'id': False, 'name': False, 'lines': line_results}
+
+        partner = payload['partner']
+        domain = [('vat', '=', partner['vat'])] if partner.get('vat') else [('name', '=', partner['name'])]
+        partner_ids = self._rpc_search('res.partner', domain, limit=1)
+        values = {
+            'partner_id': partner_ids[0] if partner_ids else self._create('res.partner', dict(partner, **partner_values)),
+            'order_line': lines,
+            'omni_idempotency_key': key,
+        }
+        values.update({name: payload[name] for name in ('origin', 'date_order', 'partner_ref') if payload.get(name)})
+        for attachment in payload.get('attachments', ()):
+            if attachment.get('field') in self.fields[model]:
+                datas = attachment.get('datas')
+                if attachment.get('attachment_id'):
+                    domain = [('id', '=', attachment['attachment_id'])] + self._pending_upload_domain(
+                        'omni.sync.attachment.chunk', attachment.get('checksum'))
+                    if not self._rpc_search('ir.attachment', domain):
+                        raise xmlrpc.client.Fault(1, f"El adjunto {attachment['attachment_id']} no es una subida pendiente")
+                    datas = self.records['ir.attachment'][attachment['attachment_id']]['datas']
+                values[attachment['field']] = datas
+                values[attachment['filename_field']] = attachment['name']
+        if payload.get('campaign'):
+            campaign_ids = self._rpc_search('utm.campaign', [('name', '=', payload['campaign'])], limit=1)
+            values['campaign_id'] = campaign_ids[0] if campaign_ids else self._create('utm.campaign', {'name': payload['campaign']})
+        record_id = self._create(model, values)
+        if payload.get('confirm'):
+            self._rpc_button_confirm(model, [record_id])
+        return {'ok': True, 'id': record_id, 'name': self.records[model][record_id]['name'], 'lines': line_results}
+
+    def _create(self, model, values):
+        record_id = next(self._ids[model])
+        record = {'id': record_id}
+        if model in SEQUENCES:
+            record.update(name=SEQUENCES[model] % record_id, state='draft')
+        if 'active' in self.fields.get(model, {}):
+            record['active'] = True
+        self.records[model][record_id] = record
+        self._write(model, record_id, values)
+        return record_id
+
+    def _write(self, model, record_id, values):
+        record = self.records[model].get(record_id)
+        if record is None:
+            raise xmlrpc.client.Fault(2, f'Record {model}({record_id}) does not exist')
+        for name, value in values.items():
+            if (model, name) in ONE2MANY:
+                self._write_one2many(model, record_id, name, value)
+            else:
+                record[name] = value
+
+    def _write_one2many(self, model, record_id, name, commands):
+        line_model, inverse = ONE2MANY[(model, name)]
+        for command in commands:
+            if command[0] == 0:
+                self._create(line_model, dict(command[2], **{inverse: record_id}))
+            elif command[0] == 1:
+                self._write(line_model, command[1], command[2])
+            elif command[0] == 2:
+                self.records[line_model].pop(command[1], None)
+
+    def _match(self, model, record, domain):
+        """Evalúa un dominio en notación polaca con los operadores habituales."""
+        stack = []
+        for element in reversed(domain):
+            if element == '!':
+                stack.append(not stack.pop())
+            elif element in ('&', '|'):
+                first, second = stack.pop(), stack.pop()
+                stack.append(first and second if element == '&' else first or second)
+            else:
+                stack.append(self._match_leaf(model, record, *element))
+        return all(stack)
+
+    def _match_leaf(self, model, record, field, operator, value):
+        current_model, current = model, record
+        path = field.split('.')
+        for name in path[:-1]:
+            comodel = RELATIONS.get((current_model, name))
+            current = self.records[comodel].get(current.get(name)) if comodel else None
+            if current is None:
+                return operator in ('!=', 'not in') or (operator == '=' and not value)
+            current_model = comodel
+        actual = current.get(path[-1], False)
+        if operator == '=':
+            return actual == value
+        if operator == '!=':
+            return actual != value
+        if operator == 'in':
+            return actual in value
+        if operator == 'not in':
+            return actual not in value
+        if operator in ('ilike', 'like'):
+            return str(value).lower() in str(actual or '').lower()
+        if operator == '=ilike':
+            return str(value).lower() == str(actual or '').lower()
+        if operator in ('>', '>=', '<', '<='):
+            if actual is False or actual is None:
+                return False
+            return {'>': actual > value, '>=': actual >= value, '<': actual < value, '<=': actual <= value}[operator]
+        raise xmlrpc.client.Fault(1, f'Operador no soportado: {operator}')
+
+
+class _RequestHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/xmlrpc/2/common', '/xmlrpc/2/object', '/jsonrpc')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+    def __init__(self, remote):
+        super().__init__(('127.0.0.1', 0), requestHandler=_RequestHandler, logRequests=False, allow_none=True)
+        self.remote = remote
+
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        if path == '/jsonrpc':
+            request = json.loads(data)
+            service, method = request['params']['service'], request['params']['method']
+            params = request['params']['args']
+        else:
+            service = path.rsplit('/', 1)[-1]
+            params, method = xmlrpc.client.loads(data, use_builtin_types=True)
+        model = params[3] if service == 'object' and len(params) > 4 else service
+        call = params[4] if service == 'object' and len(params) > 4 else method
+        start = time.perf_counter()
+        try:
+            result = self.remote.dispatch(service, method, params)
+            if path == '/jsonrpc':
+                response = json.dumps({'jsonrpc': '2.0', 'id': request.get('id'), 'result': result})
+            else:
+                response = xmlrpc.client.dumps((result,), methodresponse=True, allow_none=True)
+        except xmlrpc.client.Fault as fault:
+            if path == '/jsonrpc':
+                response = json.dumps({'jsonrpc': '2.0', 'id': request.get('id'), 'error': {
+                    'code': 200, 'message': 'Odoo Server Error',
+                    'data': {'name': 'odoo.exceptions.UserError', 'message': fault.faultString},
+                }})
+            else:
+                response = xmlrpc.client.dumps(fault, allow_none=True)
+        finally:
+            self.remote.calls.append({'service': service, 'model': model, 'method': call,
+                                      'bytes_received': len(data), 'time': time.perf_counter() - start})
+        return response.encode('utf-8', 'xmlcharrefreplace')
+
+
+class FakeRemoteServer:
+    """Publica una ``FakeRemoteOdoo`` en ``http://127.0.0.1:<puerto>`` desde un hilo."""
+
+    def __init__(self, remote=None):
+        self.remote = remote or FakeRemoteOdoo()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._server = _Server(self.remote)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-remote-odoo', daemon=True)
+        self._thread.start()
+        return self
+
+    def reset(self, remote=None):
+        """Sustituye la base remota (por ejemplo al empezar cada prueba)."""
+        self.remote = self._server.remote = remote or FakeRemoteOdoo()
+        return self.remote
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def make_png(size, seed=1):
+    """PNG de ruido de aproximadamente ``size`` bytes (no comprimible), en base64."""
+    from PIL import Image
+
+    side = max(1, int((size / 3) ** 0.5))
+    pixels = random.Random(seed).randbytes(side * side * 3)
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (side, side), pixels).save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
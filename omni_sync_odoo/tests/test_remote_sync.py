@@ -0,0 +1,629 @@
+import base64
+import hashlib
+import xmlrpc.client
+from unittest.mock import patch
+
+from odoo import Command
+from odoo.exceptions import AccessError, UserError
+from odoo.tests import tagged
+from odoo.tools import mute_logger
+
+from ..models import sync_receive
+from ..models.sync_attachment import CHUNK_MODEL
+from ..tools.catalog_digest import bucket_rows
+from ..tools.circuit_breaker import CircuitOpenError
+from .common import SyncRemoteCase
+
+
+@tagged('post_install', '-at_install')
+class TestRemoteSync(SyncRemoteCase):
+
+    def test_client_records_calls(self):
+        client = self.config._get_remote_connection()
+        self.remote.seed_products(3)
+        self.assertEqual(client.execute_kw('product.product', 'search_count', [[]]), 3)
+        totals = client.stats.totals
+        self.assertEqual(totals['call_count'], self.remote.count_calls())
+        self.assertEqual(totals['error_count'], 0)
+        self.assertGreater(totals['bytes_sent'], 0)
+        self.assertGreater(totals['bytes_received'], 0)
+
+    def test_client_records_failures(self):
+        client = self.config._get_remote_connection()
+        self.remote.fail('product.product', 'search')
+        with self.assertRaises(xmlrpc.client.Fault):
+            client.execute_kw('product.product', 'search', [[]])
+        self.remote.fail(http=True)
+        with self.assertRaises(xmlrpc.client.ProtocolError):
+            client.execute_kw('product.product', 'search', [[]])
+        self.assertEqual(client.stats.totals['error_count'], 2)
+
+    def test_client_timeout(self):
+        self.config.timeout = 1
+        client = self.config._get_remote_connection()
+        self.remote.fail('product.product', 'search', delay=2)
+        with self.assertRaises(TimeoutError):
+            client.execute_kw('product.product', 'search', [[]])
+
+    def test_read_retry(self):
+        self.config.rpc_max_retries = 2
+        client = self.config._get_remote_connection()
+        self.remote.fail('product.product', 'search', http=True, times=2)
+        self.assertEqual(client.execute_kw('product.product', 'search', [[]]), [])
+        self.assertEqual(client.stats.calls['product.product.search']['errors'], 2)
+        # Las escrituras no se reintentan
+        self.remote.fail('product.product', 'create', http=True)
+        with self.assertRaises(xmlrpc.client.ProtocolError):
+            client.execute_kw('product.product', 'create', [{'name': 'Sin reintento'}])
+        self.assertEqual(self.remote.count_calls('product.product', 'create'), 1)
+
+    def test_circuit_breaker(self):
+        self.config.write({'circuit_failure_threshold': 2, 'circuit_reset_timeout': 60})
+        client = self.config._get_remote_connection()
+        # Un Fault no cuenta: el remoto está respondiendo
+        self.remote.fail('product.product', 'search')
+        with self.assertRaises(xmlrpc.client.Fault):
+            client.execute_kw('product.product', 'search', [[]])
+        self.remote.fail('product.product', 'search', http=True, times=2)
+        for _attempt in range(2):
+            with self.assertRaises(xmlrpc.client.ProtocolError):
+                client.execute_kw('product.product', 'search', [[]])
+        self.config.invalidate_recordset(['circuit_state', 'circuit_failure_count'])
+        self.assertEqual(self.config.circuit_state, 'open')
+        self.assertEqual(self.config.circuit_failure_count, 2)
+
+        calls = self.remote.count_calls()
+        with self.assertRaises(CircuitOpenError):
+            self.config._get_rpc_client().execute_kw('product.product', 'search', [[]])
+        self.assertEqual(self.remote.count_calls(), calls)
+
+        # Pasada la espera, una llamada de prueba exitosa cierra el circuito
+        self.config._get_circuit_breaker().opened_at -= 61
+        self.assertEqual(client.execute_kw('product.product', 'search_count', [[]]), 0)
+        self.config.invalidate_recordset(['circuit_state'])
+        self.assertEqual(self.config.circuit_state, 'closed')
+
+    def test_jsonrpc_protocol(self):
+        self.config.write({'rpc_protocol': 'jsonrpc', 'rpc_gzip': True})
+        self.remote.seed_products(25, code_prefix='JSON')
+        res = self.config._sync_products_from_remote(batch_size=10)
+        self.assertEqual(res['created'], 25)
+        self.assertEqual(res['rpc']['call_count'], self.remote.count_calls())
+
+        client = self.config._get_remote_connection()
+        self.assertEqual(client.protocol, 'jsonrpc')
+        self.remote.fail('product.product', 'search')
+        with self.assertRaises(xmlrpc.client.Fault):
+            client.execute_kw('product.product', 'search', [[]])
+        self.assertEqual(client.stats.totals['error_count'], 1)
+
+    def test_streaming_reads(self):
+        self.remote.seed_products(12, code_prefix='STREAM', image_size=500)
+        fields = ['default_code', 'name', 'image_1920']
+        for protocol in ('xmlrpc', 'jsonrpc'):
+            self.config.rpc_protocol = protocol
+            client = self.config._get_remote_connection()
+            expected = client.execute_kw('product.product', 'search_read', [[]], {'fields': fields, 'order': 'id'})
+            streamed = list(client.iter_search_read('product.product', [], fields, order='id'))
+            self.assertEqual(streamed, expected)
+
+            # Cortar la iteración descarta la conexión sin afectar las llamadas siguientes
+            records = client.iter_search_read('product.product', [], fields)
+            next(records)
+            records.close()
+            self.assertEqual(client.execute_kw('product.product', 'search_count', [[]]), 12)
+            self.assertEqual(client.stats.calls['product.product.search_read']['count'], 3)
+
+            self.remote.fail('product.product', 'read')
+            with self.assertRaises(xmlrpc.client.Fault):
+                list(client.iter_read('product.product', [streamed[0]['id']], fields))
+            self.assertEqual(client.stats.calls['product.product.read']['errors'], 1)
+
+    def test_push_sale_order(self):
+        self.remote.seed_products(2, code_prefix='SO')
+        products = self._create_local_products(['SO-000000', 'SO-000001', 'LOCAL-ONLY'])
+        order = self._create_sale_orders(products, lines=3)
+        order.with_context(omni_sync_config_id=self.config.id).action_sync_order()
+
+        self.assertTrue(order.is_synced)
+        self.assertEqual(order.sync_status, 'synced')
+        remote_order = self.remote.records['sale.order'][order.sync_event_ids.remote_id]
+        self.assertEqual(order.remote_order_ref, remote_order['name'])
+        self.assertEqual(len(self.remote.records['sale.order.line']), 2)
+        self.assertEqual(order.sync_event_ids.line_count, 2)
+        self.assertEqual(order.sync_event_ids.rpc_call_count, self.remote.count_calls())
+        # Autenticación y el pedido completo en una sola llamada
+        self.assertEqual(self.remote.count_calls(), 2)
+
+    def test_push_sale_order_legacy_remote(self):
+        self.remote.receive_endpoints = False
+        self.remote.seed_products(2, code_prefix='SO')
+        products = self._create_local_products(['SO-000000', 'SO-000001'])
+        orders = self._create_sale_orders(products, count=2, lines=2)
+        for order in orders:
+            order.with_context(omni_sync_config_id=self.config.id).action_sync_order()
+            self.assertEqual(order.sync_status, 'synced')
+        self.assertEqual(len(self.remote.records['sale.order']), 2)
+        # El remoto sin endpoint se recuerda: no se vuelve a probar en el segundo envío
+        self.assertEqual(self.remote.count_calls('sale.order', 'omni_receive_orders'), 1)
+
+    def test_push_sale_order_idempotent(self):
+        self.remote.seed_products(1, code_prefix='SO')
+        orders = self._create_sale_orders(self._create_local_products(['SO-000000']), count=2, lines=1)
+        # El remoto crea el pedido pero la respuesta se pierde: el reintento devuelve el mismo pedido
+        self.config.rpc_max_retries = 1
+        self.remote.fail('sale.order', 'omni_receive_orders', http=True, after=True)
+        orders[0].with_context(omni_sync_config_id=self.config.id).action_sync_order()
+        self.assertEqual(orders[0].sync_status, 'synced')
+        self.assertEqual(self.remote.count_calls('sale.order', 'omni_receive_orders'), 2)
+        self.assertEqual(len(self.remote.records['sale.order']), 1)
+
+        # Sin reintentos el envío falla, y repetirlo más tarde tampoco duplica
+        self.config.rpc_max_retries = 0
+        self.remote.fail('sale.order', 'omni_receive_orders', http=True, after=True)
+        orders[1].with_context(omni_sync_config_id=self.config.id).action_sync_order()
+        self.assertEqual(orders[1].sync_status, 'failed')
+        orders[1].with_context(omni_sync_config_id=self.config.id).action_sync_order()
+        self.assertEqual(orders[1].sync_status, 'synced')
+        self.assertEqual(len(self.remote.records['sale.order']), 2)
+        self.assertEqual(orders.mapped('remote_order_ref'), [order['name'] for order in self.remote.records['sale.order'].values()])
+
+    def test_receive_concurrent_duplicate(self):
+        product = self._create_local_products(['DUP-000000'])
+        payload = {
+            'idempotency_key': 'dup-1',
+            'partner': {'name': 'Compañía Origen'},
+            'lines': [{'default_code': 'DUP-000000', 'product_uom_qty': 1.0}],
+        }
+        other = self.env['sale.order']
+
+        def concurrent_delivery(env, payloads):
+            # Otra entrega del mismo documento lo crea entre la búsqueda y la creación
+            nonlocal other
+            other = self.env['sale.order'].create({
+                'partner_id': self.partner_a.id,
+                'omni_idempotency_key': 'dup-1',
+                'order_line': [Command.create({'product_id': product.id})],
+            })
+            return products_by_code(env, payloads)
+
+        products_by_code = sync_receive._products_by_code
+        with patch.object(sync_receive, '_products_by_code', concurrent_delivery), mute_logger('odoo.sql_db'):
+            result = self.env['sale.order'].omni_receive_orders([payload])[0]
+        self.assertEqual((result['ok'], result['id'], result.get('duplicate')), (True, other.id, True))
+        self.assertEqual(result['lines'], [{'default_code': 'DUP-000000', 'status': 'synced'}])
+        self.assertEqual(self.env['sale.order'].search_count([('omni_idempotency_key', '=', 'dup-1')]), 1)
+
+    def test_push_sale_order_attachment(self):
+        self.remote.seed_products(1, code_prefix='SO')
+        orders = self._create_sale_orders(self._create_local_products(['SO-000000']), count=2, lines=1)
+        pdf = b'%PDF-1.4 ' + bytes(range(256)) * 2400  # tres partes
+        orders.write({'meli_tracking_pdf': base64.b64encode(pdf), 'meli_tracking_filename': 'guia.pdf'})
+
+        # Una subida interrumpida continúa con las partes que el remoto ya tiene
+        self.remote.fail(CHUNK_MODEL, 'omni_upload_finish')
+        orders[0].with_context(omni_sync_config_id=self.config.id).action_sync_order()
+        self.assertEqual(orders[0].sync_status, 'failed')
+        for order in orders:
+            order.with_context(omni_sync_config_id=self.config.id).action_sync_order()
+            self.assertEqual(order.sync_status, 'synced')
+
+        # El segundo pedido lleva la misma guía: no se vuelve a subir
+        self.assertEqual(self.remote.count_calls(CHUNK_MODEL, 'omni_upload_chunk'), 3)
+        self.assertEqual(len(self.remote.records['ir.attachment']), 1)
+        for remote_order in self.remote.records['sale.order'].values():
+            self.assertEqual(base64.b64decode(remote_order['meli_tracking_pdf']), pdf)
+        # La llamada que crea el pedido no depende del tamaño del PDF
+        receive_calls = [call for call in self.remote.calls if call['method'] == 'omni_receive_orders']
+        self.assertTrue(all(call['bytes_received'] < 10000 for call in receive_calls))
+
+    def test_receive_uploaded_attachment(self):
+        self._create_local_products(['RX-000000'])
+        Chunk = self.env[CHUNK_MODEL]
+        pdf = b'%PDF-1.4 guia'
+        checksum = hashlib.sha1(pdf).hexdigest()
+        Chunk.omni_upload_chunk(checksum, 0, base64.b64encode(pdf))
+        upload_id = Chunk.omni_upload_finish(checksum, 'guia.pdf', 'application/pdf', 1)
+        other = self.env['ir.attachment'].create({'name': 'otro.pdf', 'raw': b'privado'})
+
+        def payload(key, attachment):
+            return {
+                'idempotency_key': key,
+                'partner': {'name': 'Compañía Origen'},
+                'lines': [{'default_code': 'RX-000000', 'product_uom_qty': 1.0}],
+                'attachments': [dict(attachment, name='guia.pdf', mimetype='application/pdf')],
+            }
+
+        results = self.env['sale.order'].omni_receive_orders([
+            payload('rx-1', {'attachment_id': upload_id, 'checksum': checksum, 'field': 'meli_tracking_pdf'}),
+            payload('rx-2', {'attachment_id': upload_id, 'checksum': checksum}),
+            # Solo se aceptan subidas pendientes con el mismo contenido
+            payload('rx-3', {'attachment_id': other.id, 'checksum': other.checksum}),
+        ])
+        self.assertEqual([result['ok'] for result in results], [True, True, False])
+        orders = self.env['sale.order'].browse([result['id'] for result in results[:2]])
+        self.assertEqual(base64.b64decode(orders[0].meli_tracking_pdf), pdf)
+        # La subida queda vinculada al pedido, no como un adjunto huérfano
+        upload = self.env['ir.attachment'].browse(upload_id)
+        self.assertEqual((upload.res_model, upload.res_id), ('sale.order', orders[1].id))
+
+        # Subir requiere poder crear pedidos, y el tamaño tiene un límite
+        portal = self.env['res.users'].create({
+            'name': 'Portal',
+            'login': 'omni_sync_portal',
+            'groups_id': [Command.set(self.env.ref('base.group_portal').ids)],
+        })
+        with self.assertRaises(AccessError):
+            Chunk.with_user(portal).omni_upload_chunk(checksum, 0, base64.b64encode(pdf))
+        with self.assertRaises(UserError):
+            Chunk.omni_upload_begin(checksum, 2 ** 40)
+        with self.assertRaises(UserError):
+            Chunk.omni_upload_chunk(checksum, 10 ** 6, base64.b64encode(pdf))
+
+    def test_push_sale_order_failure(self):
+        self.remote.seed_products(1, code_prefix='SO')
+        order = self._create_sale_orders(self._create_local_products(['SO-000000']), lines=1)
+        self.remote.fail('sale.order')
+        action = order.with_context(omni_sync_config_id=self.config.id).action_sync_order()
+        # El fallo se informa sin excepción para no deshacer su registro
+        self.assertEqual(action['params']['type'], 'danger')
+        self.assertFalse(order.is_synced)
+        self.assertEqual(order.sync_status, 'failed')
+        self.assertEqual(order.sync_event_ids.status, 'failed')
+        self.assertFalse(self.remote.records['sale.order'])
+
+    def test_invoice_creates_remote_purchase(self):
+        self.remote.seed_products(2, code_prefix='PO')
+        invoice = self._create_invoices(self._create_local_products(['PO-000000', 'PO-000001']), lines=2)
+        invoice.action_post()
+
+        self.assertTrue(invoice.is_synced)
+        self.assertEqual(len(self.remote.records['purchase.order']), 1)
+        self.assertEqual(len(self.remote.records['purchase.order.line']), 2)
+        self.assertEqual(invoice.sync_event_ids.status, 'synced')
+
+    def test_invoice_purchase_failure(self):
+        self.remote.seed_products(1, code_prefix='PF')
+        invoices = self._create_invoices(self._create_local_products(['PF-000000']), count=3, lines=1)
+        self.remote.fail('purchase.order', 'omni_receive_purchases')
+        invoices.action_post()
+        # Solo la factura que falló tiene un evento fallido
+        events = self.env['sync.event'].search([('res_model', '=', 'account.move'), ('res_id', 'in', invoices.ids),
+                                                ('status', '=', 'failed')])
+        self.assertEqual(events.mapped('res_id'), invoices[:1].ids)
+        # Las demás se envían igual y solo la fallida queda en la cola de errores
+        self.assertEqual(invoices.mapped('is_synced'), [False, True, True])
+        letters = self.env['sync.dead.letter'].search([('operation', '=', 'purchase'), ('res_id', 'in', invoices.ids)])
+        self.assertEqual(letters.mapped('res_id'), invoices[:1].ids)
+
+    def test_dead_letter_replay(self):
+        self.remote.seed_products(2, code_prefix='PO')
+        invoices = self._create_invoices(self._create_local_products(['PO-000000', 'PO-000001']), count=2, lines=2)
+        self.remote.fail('purchase.order', 'omni_receive_purchases')
+        invoices.action_post()
+
+        letters = self.env['sync.dead.letter'].search([('config_id', '=', self.config.id)])
+        self.assertEqual(sorted(letters.mapped('res_id')), sorted(invoices.ids))
+        self.assertEqual(set(letters.mapped('error_class')), {'xmlrpc.client.Fault'})
+        self.assertEqual(set(letters.mapped('state')), {'pending'})
+        self.assertEqual(self.config.dead_letter_count, 2)
+
+        # Un reintento que vuelve a fallar suma un intento sin duplicar el registro
+        self.remote.fail('purchase.order', 'omni_receive_purchases')
+        letters.action_replay()
+        letters.invalidate_recordset()
+        self.assertEqual(letters.mapped('attempt_count'), [2, 2])
+        self.assertEqual(self.env['sync.dead.letter'].search_count([('config_id', '=', self.config.id)]), 2)
+
+        self.remote.reset_calls()
+        letters.action_replay()
+        letters.invalidate_recordset()
+        self.assertEqual(set(letters.mapped('state')), {'resolved'})
+        self.assertTrue(all(invoices.mapped('is_synced')))
+        # Autenticación y las dos OC en una sola llamada
+        self.assertEqual(self.remote.count_calls('purchase.order', 'omni_receive_purchases'), 1)
+        self.assertEqual(len(self.remote.records['purchase.order']), 2)
+
+    def test_consolidated_purchases(self):
+        self.config.write({'purchase_consolidation': True, 'purchase_consolidation_window': 60, 'auto_confirm_po': True})
+        self.remote.seed_products(2, code_prefix='PO')
+        products = self._create_local_products(['PO-000000', 'PO-000001'])
+        invoices = self._create_invoices(products, count=3, lines=2)
+        invoices[2].partner_id = self.partner_b
+        invoices.action_post()
+
+        # Las facturas se acumulan sin llamar al remoto: una OC por cliente
+        self.assertEqual(self.remote.count_calls(), 0)
+        batches = self.env['omni.sync.purchase.batch'].search([('config_id', '=', self.config.id)])
+        self.assertEqual(sorted(batches.mapped('line_count')), [2, 4])
+        self.assertEqual(self.config._flush_purchase_batches()['sent'], 0)
+        self.assertEqual(self.remote.count_calls(), 0)
+
+        self.assertEqual(self.config._flush_purchase_batches(force=True)['sent'], 2)
+        # Autenticación y las dos OC, ya confirmadas, en una sola llamada
+        self.assertEqual(self.remote.count_calls(), 2)
+        remote_orders = self.remote.records['purchase.order']
+        self.assertEqual({order['state'] for order in remote_orders.values()}, {'purchase'})
+        self.assertEqual(len(self.remote.records['purchase.order.line']), 6)
+        self.assertEqual(set(batches.mapped('state')), {'sent'})
+        for invoice in invoices:
+            self.assertTrue(invoice.is_synced)
+            self.assertEqual(invoice.remote_order_ref, invoice.sync_purchase_batch_id.remote_order_ref)
+            self.assertIn(invoice.name, remote_orders[invoice.remote_order_id]['partner_ref'])
+
+        # Un lote enviado ya no recibe facturas, y uno que otro envío tiene en curso no se vuelve a tomar
+        invoice = self._create_invoices(products, lines=1)
+        invoice.action_post()
+        batch = invoice.sync_purchase_batch_id
+        self.assertNotIn(batch, batches)
+        batch.state = 'sending'
+        self.assertFalse(batch._claim_for_flush())
+        self.assertFalse(self.config._get_due_purchase_batches(force=True))
+
+    def test_remote_status_back_sync(self):
+        self.remote.seed_products(1, code_prefix='ST')
+        products = self._create_local_products(['ST-000000'])
+        orders = self._create_sale_orders(products, count=3, lines=1)
+        for order in orders:
+            order.with_context(omni_sync_config_id=self.config.id).action_sync_order()
+        invoice = self._create_invoices(products, lines=1)
+        invoice.action_post()
+
+        remote_ids = orders.mapped('remote_order_id')
+        self.remote._rpc_write('sale.order', remote_ids[:2], {'state': 'sale', 'delivery_status': 'full'})
+        self.remote._rpc_write('sale.order', remote_ids[2:], {'state': 'cancel'})
+        # Los documentos enviados sin id remoto se encuentran por su referencia
+        orders[2].remote_order_id = False
+        self.remote.reset_calls()
+
+        result = self.config._sync_remote_status()
+        self.assertEqual((result['sales'], result['purchases']), (3, 1))
+        # Autenticación y, por modelo, fields_get y una sola search_read
+        self.assertEqual(self.remote.count_calls(), 5)
+        self.assertEqual(orders.mapped('remote_state'), ['sale', 'sale', 'cancel'])
+        self.assertEqual(orders.mapped('remote_delivery_status'), ['full', 'full', False])
+        self.assertEqual(orders.mapped('remote_order_id'), remote_ids)
+        self.assertEqual(invoice.remote_state, self.remote.records['purchase.order'][invoice.remote_order_id]['state'])
+
+        # Los pedidos cerrados en el remoto ya no se consultan y nada cambió
+        self.remote.reset_calls()
+        result = self.config._sync_remote_status()
+        self.assertEqual((result['sales'], result['purchases']), (0, 0))
+        self.assertEqual(self.remote.count_calls('sale.order'), 0)
+
+    def test_push_pricelist_retry(self):
+        self.remote.seed_products(3, code_prefix='PL')
+        products = self._create_local_products(['PL-000000', 'PL-000001', 'PL-000002'])
+        pricelist = self.env['product.pricelist'].create({
+            'name': 'Mayoristas',
+            'sync_to_remote': True,
+            'item_ids': [(0, 0, {'applied_on': '0_product_variant', 'product_id': product.id,
+                                 'compute_price': 'fixed', 'fixed_price': 100.0}) for product in products[:2]],
+        })
+        self.remote.seed('res.currency', [{'name': pricelist.currency_id.name}])
+        self.remote.seed('product.template', [{'name': product.name, 'default_code': product.default_code}
+                                              for product in products])
+        self.assertEqual(self.config._sync_pricelists_to_remote()['synced'], 1)
+
+        # Una regla nueva y una modificada; la escritura falla después de crear la nueva
+        pricelist.item_ids[0].fixed_price = 90.0
+        pricelist.write({'item_ids': [(0, 0, {'applied_on': '0_product_variant', 'product_id': products[2].id,
+                                              'compute_price': 'fixed', 'fixed_price': 80.0})]})
+        self.remote.fail('product.pricelist', 'write')
+        self.assertEqual(self.config._sync_pricelists_to_remote()['failed'], 1)
+        self.assertEqual(self.env['sync.pricelist.item.map'].search_count([('item_id', 'in', pricelist.item_ids.ids)]), 3)
+
+        # El reintento no duplica en el remoto lo que ya se había creado
+        res = self.config._sync_pricelists_to_remote()
+        self.assertEqual((res['synced'], res['failed']), (1, 0))
+        self.assertEqual(len(self.remote.records['product.pricelist']), 1)
+        remote_items = self.remote.records['product.pricelist.item'].values()
+        self.assertEqual(sorted(item['fixed_price'] for item in remote_items), [80.0, 90.0, 100.0])
+
+        # Una regla que ya no tiene correspondencia se borra del remoto; el nombre se actualiza
+        products[0].default_code = False
+        pricelist.name = 'Mayoristas 2025'
+        res = self.config._sync_pricelists_to_remote()
+        self.assertEqual(res['synced'], 1)
+        remote_items = self.remote.records['product.pricelist.item'].values()
+        self.assertEqual(sorted(item['fixed_price'] for item in remote_items), [80.0, 100.0])
+        self.assertEqual([remote['name'] for remote in self.remote.records['product.pricelist'].values()],
+                         ['Mayoristas 2025'])
+
+    def test_push_pricelist_base_first(self):
+        self.remote.seed('res.currency', [{'name': self.env.company.currency_id.name}])
+        derived = self.env['product.pricelist'].create({'name': 'Derivada', 'sync_to_remote': True})
+        base = self.env['product.pricelist'].create({'name': 'Base', 'sync_to_remote': True})
+        derived.write({'item_ids': [(0, 0, {'applied_on': '3_global', 'compute_price': 'formula', 'base': 'pricelist',
+                                            'base_pricelist_id': base.id, 'price_discount': 10.0})]})
+        # La lista base se envía primero, así la regla derivada se resuelve en la misma ejecución
+        self.assertEqual(self.config._sync_pricelists_to_remote()['synced'], 2)
+        remote_base = self.env['sync.pricelist.map'].search([('pricelist_id', '=', base.id)]).remote_pricelist_id
+        remote_items = list(self.remote.records['product.pricelist.item'].values())
+        self.assertEqual([item['base_pricelist_id'] for item in remote_items], [remote_base])
+
+    def test_pull_products(self):
+        self.remote.seed_products(25, code_prefix='PULL')
+        res = self.config._sync_products_from_remote(batch_size=10)
+        self.assertEqual(res['created'], 25)
+        self.assertEqual(self.env['product.product'].search_count([('default_code', '=like', 'PULL-%')]), 25)
+        res = self.config._sync_products_from_remote(batch_size=10)
+        self.assertEqual((res['created'], res['updated']), (0, 25))
+
+    def test_batch_size_override(self):
+        self.remote.seed_products(25, code_prefix='BATCH')
+        # El tamaño de lote del contexto (línea de comandos) no modifica la conexión
+        config = self.config.with_context(omni_sync_batch_size=10)
+        self.assertIsNone(config._scheduled_sync_products(None, None, 'manual'))
+        self.assertEqual(self.remote.count_calls('product.product', 'search_read'), 3)
+        self.assertEqual(self.config.batch_size, 50)
+        self.assertEqual(self.env['product.product'].search_count([('default_code', '=like', 'BATCH-%')]), 25)
+
+    def test_image_sync(self):
+        self.remote.seed_products(6, code_prefix='IMG', image_size=2000)
+        products = self._create_local_products([f'IMG-{i:06d}' for i in range(4)])
+        wizard = self.env['sync.pictures.wizard'].create({'config_id': self.config.id})
+        wizard.action_sync_pictures()
+        self.assertTrue(all(products.mapped('image_1920')))
+        log = self.env['sync.pictures.log'].search([('config_id', '=', self.config.id), ('sync_type', '=', 'images')])
+        self.assertEqual(sum(log.mapped('products_synced')), 4)
+        self.assertEqual(sum(log.mapped('products_skipped')), 2)
+
+    def test_sharded_product_pull(self):
+        self.config.write({'sync_sharding': True, 'shard_size': 10})
+        self.remote.seed_products(25, code_prefix='SHARD')
+        run = self.config._plan_sync_run('products')
+        self.assertEqual(run.unit_count, 3)
+        self.assertEqual(run.unit_ids.mapped('params'), [{'id_range': [1, 10]}, {'id_range': [11, 20]},
+                                                         {'id_range': [21, 25]}])
+        # Una ejecución en curso no se vuelve a planificar
+        self.assertEqual(self.config._plan_sync_run('products'), run)
+
+        # La primera toma bloquea la unidad: otra búsqueda la salta
+        Unit = self.env['sync.work.unit']
+        claimed = Unit._claim_next()
+        self.assertEqual(claimed, run.unit_ids[0])
+        self.assertEqual(Unit._claim_next([claimed.id]), run.unit_ids[1])
+
+        self.remote.reset_calls()
+        self.assertEqual(Unit.cron_process_work_units(), {'processed': 3, 'pending': 0})
+        run.invalidate_recordset()
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(set(run.unit_ids.mapped('state')), {'done'})
+        self.assertEqual(self.env['product.product'].search_count([('default_code', '=like', 'SHARD-%')]), 25)
+        # Un inicio de sesión por worker y un solo log para toda la ejecución
+        self.assertEqual(self.remote.count_calls('common', 'authenticate'), 1)
+        self.assertEqual(self.env['sync.pictures.log'].search([('config_id', '=', self.config.id),
+                                                              ('sync_type', '=', 'products')]), run.log_id)
+        self.assertEqual((run.log_id.status, run.log_id.products_synced), ('completed', 25))
+
+    def test_work_unit_connection_failure(self):
+        self.config.write({'sync_sharding': True, 'shard_size': 10})
+        self.remote.seed_products(15, code_prefix='CONN')
+        run = self.config._plan_sync_run('products')
+        # Sin conexión con el remoto el intento se cuenta y el worker sigue con las demás unidades
+        self.remote.fail('common', times=10)
+        self.assertEqual(self.env['sync.work.unit'].cron_process_work_units(), {'processed': 0, 'pending': 2})
+        run.invalidate_recordset()
+        self.assertEqual(run.unit_ids.mapped('attempt_count'), [1, 1])
+        self.assertTrue(all(run.unit_ids.mapped('error_message')))
+        self.assertEqual(set(run.unit_ids.mapped('state')), {'pending'})
+
+    def test_sharded_sync_date(self):
+        self.config.write({'sync_sharding': True, 'shard_size': 10, 'sync_images': False, 'last_sync_date': False})
+        self.remote.seed_products(15, code_prefix='DATE')
+        result = self.config._run_sync(use_budget=False)
+        # Planificar no es sincronizar: la fecha la fija la ejecución repartida al terminar
+        self.assertEqual(result['products']['status'], 'planned')
+        self.assertFalse(result['pending'])
+        self.assertFalse(self.config.last_sync_date)
+        self.env['sync.work.unit'].cron_process_work_units()
+        self.config.invalidate_recordset(['last_sync_date'])
+        self.assertTrue(self.config.last_sync_date)
+
+    def test_catalog_reconcile(self):
+        remote_ids = self.remote.seed_products(40, code_prefix='REC')
+        self.config._sync_products_from_remote(batch_size=50)
+        products = self.remote.records['product.product']
+        products[remote_ids[3]]['list_price'] = 999.0
+        products[remote_ids[7]]['active'] = False
+        self.remote.seed_products(1, code_prefix='NEW')
+        archived = self.env['product.product'].search([('default_code', '=', 'REC-000011')])
+        archived.active = False
+
+        self.remote.reset_calls()
+        report = self.env['sync.reconcile.report'].browse(self.config._reconcile_catalog()['report_id'])
+        lines = report.line_ids.filtered(lambda l: l.default_code.startswith(('REC-', 'NEW-')))
+        self.assertEqual(sorted((line.default_code, line.kind) for line in lines), [
+            ('NEW-000000', 'missing_local'), ('REC-000003', 'mismatch'), ('REC-000007', 'missing_remote'),
+            ('REC-000011', 'missing_local'),
+        ])
+        self.assertEqual(lines.filtered(lambda l: l.default_code == 'REC-000011').product_id, archived)
+        self.assertEqual(lines.filtered(lambda l: l.kind == 'mismatch').differences, 'list_price')
+        # Solo se piden al remoto las filas de las cubetas distintas
+        self.assertEqual(self.remote.count_calls('product.product', 'omni_catalog_bucket'), 1)
+        self.assertLessEqual(report.bucket_diff_count, 4)
+        # El filtro SQL de cubetas coincide con ``bucket_of``
+        Product = self.env['product.product']
+        self.assertEqual(Product.omni_catalog_bucket(report.bucket_count, [3, 5]),
+                         bucket_rows(Product._omni_catalog_rows(), report.bucket_count, [3, 5]))
+
+        lines.action_fix()
+        self.assertEqual(self.env['product.product'].search([('default_code', '=', 'REC-000003')]).list_price, 999.0)
+        # El archivado se reactiva en lugar de crear un duplicado
+        self.assertTrue(archived.active)
+        self.assertEqual(self.env['product.product'].with_context(active_test=False).search_count(
+            [('default_code', '=', 'REC-000011')]), 1)
+        report = self.env['sync.reconcile.report'].browse(self.config._reconcile_catalog()['report_id'])
+        self.assertFalse(report.line_ids.filtered(lambda l: l.default_code.startswith(('REC-', 'NEW-'))))
+        # Una referencia repetida en local cuenta una vez en ambos lados: no aparece como diferencia
+        self.env['product.product'].create({'name': 'Duplicado', 'default_code': 'REC-000005', 'list_price': 1.0})
+        report = self.env['sync.reconcile.report'].browse(self.config._reconcile_catalog()['report_id'])
+        self.assertFalse(report.line_ids.filtered(lambda l: l.default_code.startswith(('REC-', 'NEW-'))))
+
+    def test_push_notifications(self):
+        remote_ids = self.remote.seed_products(5, code_prefix='PUSH')
+        self.config._sync_products_from_remote(batch_size=50)
+        self.config.action_subscribe_remote()
+        subscription = self.remote.records['omni.sync.subscription'][self.config.remote_subscription_id]
+        self.assertTrue(subscription['callback_url'].startswith(self.env['ir.config_parameter'].get_param('web.base.url')))
+        self.assertEqual(self.config._find_by_notify_token(subscription['token']), self.config)
+        self.assertFalse(self.config._find_by_notify_token('otro'))
+
+        products = self.remote.records['product.product']
+        for remote_id in remote_ids[:3]:
+            products[remote_id]['list_price'] = 500.0
+        # Los avisos repetidos de un producto se juntan; el tercer cambio no se avisa
+        Notification = self.env['omni.sync.notification']
+        Notification._buffer(self.config, [{'model': 'product.product', 'ids': remote_ids[:2],
+                                            'write_date': '2024-01-01 10:00:00'}])
+        Notification._buffer(self.config, [{'model': 'product.product', 'ids': remote_ids[1:2],
+                                            'write_date': '2024-01-01 10:05:00'}])
+        self.assertEqual(Notification.search_count([('config_id', '=', self.config.id)]), 2)
+        # Los avisos mal formados se rechazan antes de guardar (el controlador responde 400)
+        for notifications in ([{'model': 'product.product', 'ids': ['x']}],
+                              [{'model': 'product.product', 'ids': [1], 'write_date': 'ayer'}], ['x'], {}):
+            with self.assertRaises((ValueError, TypeError)):
+                Notification._parse(notifications)
+        self.assertEqual(Notification._parse([{'model': 'product.product', 'ids': ['7']}]),
+                         [{'model': 'product.product', 'ids': [7], 'write_date': False}])
+
+        result = self.config._process_notifications()
+        self.assertEqual((result['products'], result['updated']), (2, 2))
+        local = self.env['product.product'].search([('default_code', '=like', 'PUSH-%')], order='default_code')
+        self.assertEqual(local.mapped('list_price')[:3], [500.0, 500.0, 12.0])
+        self.assertFalse(Notification.search_count([('config_id', '=', self.config.id)]))
+
+    def test_subscribe_access(self):
+        Subscription = self.env['omni.sync.subscription']
+        user = self.env['res.users'].create({
+            'name': 'Usuario sin permisos',
+            'login': 'omni_sync_basic',
+            'groups_id': [Command.set(self.env.ref('base.group_user').ids)],
+        })
+        with self.assertRaises(AccessError):
+            Subscription.with_user(user).omni_subscribe('https://otra.example.com/omni_sync/notify', 't', ['product.product'])
+        with self.assertRaises(AccessError):
+            Subscription.with_user(user).omni_unsubscribe(1)
+        # La base solo avisa a URLs http(s)
+        with self.assertRaises(UserError):
+            Subscription.omni_subscribe('file:///etc/passwd', 't', ['product.product'])
+        self.assertTrue(Subscription.omni_subscribe('https://otra.example.com/omni_sync/notify', 't', ['product.product']))
+
+    def test_push_notifications_outbox(self):
+        Subscription = self.env['omni.sync.subscription']
+        subscription = Subscription.browse(Subscription.omni_subscribe('http://suscriptor/omni_sync/notify', 'token',
+                                                                       ['product.product']))
+        products = self._create_local_products(['OUT-1', 'OUT-2'])
+        Outbox = self.env['omni.sync.outbox']
+        self.assertEqual(sorted(Outbox.search([('subscription_id', '=', subscription.id)]).mapped('res_id')),
+                         products.ids)
+        Outbox.search([]).unlink()
+        cron = self.env.ref('omni_sync_odoo.ir_cron_omni_sync_send_notifications')
+        self.env['ir.cron.trigger'].search([('cron_id', '=', cron.id)]).unlink()
+        products[0].list_price = 30.0
+        products[0].list_price = 40.0
+        products[1].description_sale = 'Sin aviso'
+        self.assertEqual(Outbox.search([('subscription_id', '=', subscription.id)]).mapped('res_id'), products[:1].ids)
+        # Los cambios dejan un solo disparo pendiente del envío
+        self.assertEqual(self.env['ir.cron.trigger'].search_count([('cron_id', '=', cron.id)]), 1)
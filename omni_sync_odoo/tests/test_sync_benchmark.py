@@ -0,0 +1,104 @@
+import contextlib
+import logging
+import os
+import time
+import tracemalloc
+
+from odoo.tests import tagged
+
+from .common import SyncRemoteCase
+
+_logger = logging.getLogger(__name__)
+
+
+def get_bench_params():
+    """Escala del benchmark, ajustable con ``OMNI_SYNC_BENCH`` (por ejemplo
+    ``"orders=50,invoices=50,lines=10,products=2000,images=200,latency=0.01,protocol=jsonrpc,gzip=1,receive=0"``).
+
+    ``receive=0`` simula un remoto sin los endpoints de recepción de pedidos y compras."""
+    params = {'orders': 200, 'invoices': 200, 'lines': 5, 'products': 5000, 'images': 500,
+              'image_size': 50000, 'latency': 0.005, 'protocol': 'xmlrpc', 'gzip': 0, 'receive': 1}
+    for item in filter(None, (os.environ.get('OMNI_SYNC_BENCH') or '').split(',')):
+        key, value = (part.strip() for part in item.split('='))
+        params[key] = type(params[key])(value) if key in params else value
+    return params
+
+
+@tagged('post_install', '-at_install', '-standard', 'omni_sync_benchmark')
+class TestSyncBenchmark(SyncRemoteCase):
+    """Mide llamadas RPC, tiempo y memoria de los flujos de sincronización
+    contra la instancia remota simulada.
+
+    No forma parte de la ejecución estándar: ``--test-tags omni_sync_benchmark``.
+    """
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.params = get_bench_params()
+
+    def setUp(self):
+        super().setUp()
+        self.remote.set_latency(self.params['latency'])
+        self.remote.receive_endpoints = bool(self.params['receive'])
+        self.config.write({'rpc_protocol': self.params['protocol'], 'rpc_gzip': bool(self.params['gzip'])})
+
+    @contextlib.contextmanager
+    def _measure(self, label, units):
+        self.env.flush_all()
+        self.remote.reset_calls()
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            calls = self.remote.count_calls()
+            received = sum(call['bytes_received'] for call in self.remote.calls)
+            _logger.info(
+                "Benchmark %s [%s%s]: %s unidades en %.2fs (%.1f ms/unidad), %s llamadas RPC (%.2f/unidad), "
+                "%.1f KiB enviados, pico de memoria %.1f MiB",
+                label, self.params['protocol'], '+gzip' if self.params['gzip'] else '',
+                units, elapsed, 1000 * elapsed / max(units, 1), calls, calls / max(units, 1),
+                received / 1024, peak / 1024 / 1024,
+            )
+
+    def test_benchmark_order_push(self):
+        count, lines = self.params['orders'], self.params['lines']
+        self.remote.seed_products(lines * 4, code_prefix='SO')
+        products = self._create_local_products([f'SO-{i:06d}' for i in range(lines * 4)])
+        orders = self._create_sale_orders(products, count=count, lines=lines)
+        with self._measure('envío de pedidos', count):
+            for order in orders:
+                order.with_context(omni_sync_config_id=self.config.id).action_sync_order()
+        self.assertTrue(all(orders.mapped('is_synced')))
+        self.assertEqual(len(self.remote.records['sale.order']), count)
+
+    def test_benchmark_invoice_to_purchase(self):
+        count, lines = self.params['invoices'], self.params['lines']
+        self.remote.seed_products(lines * 4, code_prefix='PO')
+        products = self._create_local_products([f'PO-{i:06d}' for i in range(lines * 4)])
+        invoices = self._create_invoices(products, count=count, lines=lines)
+        with self._measure('factura a orden de compra', count):
+            invoices.action_post()
+        self.assertTrue(all(invoices.mapped('is_synced')))
+        self.assertEqual(len(self.remote.records['purchase.order']), count)
+
+    def test_benchmark_product_pull(self):
+        count = self.params['products']
+        self.remote.seed_products(count, code_prefix='PULL')
+        with self._measure('descarga de productos', count):
+            res = self.config._sync_products_from_remote(batch_size=self.config.batch_size)
+        self.assertEqual(res['created'], count)
+
+    def test_benchmark_image_sync(self):
+        count = self.params['images']
+        self.remote.seed_products(count, code_prefix='IMG', image_size=self.params['image_size'])
+        self._create_local_products([f'IMG-{i:06d}' for i in range(count)])
+        wizard = self.env['sync.pictures.wizard'].create({'config_id': self.config.id})
+        with self._measure('sincronización de imágenes', count):
+            wizard.action_sync_pictures()
+        logs = self.env['sync.pictures.log'].search([('config_id', '=', self.config.id), ('sync_type', '=', 'images')])
+        self.assertEqual(sum(logs.mapped('products_synced')), count)
@@ -0,0 +1,2 @@
+from . import rpc_client
+from . import profiling
@@ -0,0 +1,60 @@
+"""Huellas del catálogo por cubetas para conciliar productos entre instancias.
+
+Cada producto cae en una cubeta según un hash de su ``default_code``; la
+huella de una cubeta resume los valores comparados de todos sus productos.
+Ambas instancias calculan lo mismo con estas funciones, así que solo hay que
+revisar producto por producto las cubetas cuya huella no coincide.
+"""
+import hashlib
+
+# Campos que se comparan (además de ``default_code``), en el orden de las filas
+CATALOG_FIELDS = ('name', 'barcode', 'list_price', 'standard_price')
+
+
+def catalog_row(values):
+    """Fila normalizada ``[default_code, *CATALOG_FIELDS]`` de un producto leído con ``read``."""
+    return [
+        values['default_code'],
+        values.get('name') or '',
+        values.get('barcode') or '',
+        '%.2f' % (values.get('list_price') or 0.0),
+        '%.2f' % (values.get('standard_price') or 0.0),
+    ]
+
+
+# Equivalente SQL de ``bucket_of`` sobre ``default_code``, para filtrar cubetas en la base
+BUCKET_SQL = "(('x' || substr(md5(default_code), 1, 8))::bit(32)::bigint %% %s)"
+
+
+def unique_rows(rows):
+    """Una fila por ``default_code`` (la primera): las referencias repetidas
+    cuentan una sola vez en la huella y en el detalle, en ambas instancias."""
+    seen = set()
+    unique = []
+    for row in rows:
+        if row[0] not in seen:
+            seen.add(row[0])
+            unique.append(row)
+    return unique
+
+
+def bucket_of(code, bucket_count):
+    # md5 y no sha1: PostgreSQL lo calcula sin extensiones (ver ``BUCKET_SQL``)
+    return int(hashlib.md5(code.encode()).hexdigest()[:8], 16) % bucket_count
+
+
+def bucket_digests(rows, bucket_count):
+    """Huella de cada cubeta no vacía, con la cubeta como texto (XML-RPC no acepta claves enteras)."""
+    buckets = {}
+    for row in rows:
+        buckets.setdefault(bucket_of(row[0], bucket_count), []).append('\x1f'.join(row))
+    return {
+        str(bucket): hashlib.sha1('\n'.join(sorted(lines)).encode()).hexdigest()
+        for bucket, lines in buckets.items()
+    }
+
+
+def bucket_rows(rows, bucket_count, buckets):
+    """Filas de los productos que caen en ``buckets``."""
+    buckets = {int(bucket) for bucket in buckets}
+    return [row for row in rows if bucket_of(row[0], bucket_count) in buckets]
@@ -0,0 +1,146 @@
+import http.client
+import random
+import threading
+import time
+import xmlrpc.client
+
+from odoo import _
+from odoo.exceptions import UserError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Métodos que se pueden reintentar sin riesgo de duplicar datos: los de solo
+# lectura, los endpoints de recepción, que deduplican por clave de idempotencia,
+# y la subida de adjuntos, que deduplica por checksum
+SAFE_METHODS = frozenset({
+    'authenticate', 'version', 'fields_get', 'search', 'search_read', 'search_count',
+    'read', 'read_group', 'name_search', 'name_get',
+    'omni_receive_orders', 'omni_receive_purchases',
+    'omni_upload_begin', 'omni_upload_chunk', 'omni_upload_finish',
+})
+
+
+class CircuitOpenError(UserError):
+    """La conexión está suspendida por fallos repetidos; la llamada no se envía."""
+
+
+def is_transient_error(error):
+    """Errores de red o del servidor remoto (no de la lógica de negocio)."""
+    if isinstance(error, xmlrpc.client.ProtocolError):
+        return error.errcode >= 500 or error.errcode in (408, 429)
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+def backoff_delay(attempt, base=0.5, cap=10.0):
+    """Espera antes del reintento ``attempt`` (desde 0): exponencial con jitter completo."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Corta las llamadas a un remoto caído en lugar de esperar el timeout en cada una.
+
+    - ``closed``: las llamadas pasan; tras ``threshold`` fallos seguidos se abre.
+    - ``open``: toda llamada falla de inmediato con ``CircuitOpenError`` hasta
+      que pasan ``reset_timeout`` segundos.
+    - ``half_open``: se deja pasar una única llamada de prueba; si funciona se
+      cierra, si falla vuelve a abrirse por otro ``reset_timeout``.
+
+    ``on_change`` se llama (fuera del lock) cada vez que cambia el estado o el
+    contador de fallos, para persistirlo.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=60, on_change=None):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.on_change = on_change
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None  # time.time() de la última apertura
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def restore(self, state, failures, opened_at):
+        """Adopta un estado persistido más reciente que el que se tiene en memoria."""
+        with self._lock:
+            if state == CLOSED or not opened_at:
+                return
+            if self.opened_at is None or opened_at > self.opened_at:
+                self.state = OPEN
+                self.failures = failures
+                self.opened_at = opened_at
+
+    def retry_in(self):
+        """Segundos que faltan para la próxima llamada de prueba."""
+        if self.state != OPEN or self.opened_at is None:
+            return 0
+        return max(0, self.opened_at + self.reset_timeout - time.time())
+
+    def before_call(self, label=''):
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and self.retry_in() <= 0:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            wait = self.retry_in()
+        raise CircuitOpenError(_(
+            'La conexión %(label)s está suspendida por fallos repetidos del servidor remoto. '
+            'Próximo intento en %(seconds)s segundos.'
+        ) % {'label': label, 'seconds': int(wait) + 1})
+
+    def record_success(self):
+        with self._lock:
+            changed = self.state != CLOSED or self.failures
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+        if changed:
+            self._notify()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self.state = OPEN
+                self.opened_at = time.time()
+            self._probing = False
+        self._notify()
+
+    def reset(self):
+        """Cierra el circuito a mano; siempre notifica para sobrescribir el estado guardado."""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+        self._notify()
+
+    def _notify(self):
+        if self.on_change:
+            self.on_change(self)
+
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_breaker(key, threshold, reset_timeout):
+    """Breaker compartido por todos los hilos del proceso para ``key``.
+
+    Devuelve ``(breaker, created)``; los umbrales se actualizan si la
+    configuración cambió.
+    """
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(key)
+        created = breaker is None
+        if created:
+            breaker = _BREAKERS[key] = CircuitBreaker(threshold, reset_timeout)
+        breaker.threshold = threshold
+        breaker.reset_timeout = reset_timeout
+        return breaker, created
@@ -0,0 +1,53 @@
+import contextlib
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# Desde Python 3.12 solo puede haber un perfilador activo por proceso: las
+# ejecuciones en paralelo se perfilan de a una
+_PROFILE_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def profiled(enabled):
+    """Ejecuta el bloque bajo cProfile solo si ``enabled``; si no, no añade ningún coste.
+
+    Si ya hay otro perfil en curso el bloque se ejecuta sin perfilar (se
+    entrega ``None``): un perfil nunca hace fallar la sincronización.
+    """
+    profiler = None
+    if enabled and _PROFILE_LOCK.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Otra herramienta (depurador, cobertura) ya ocupa el perfilador
+            _logger.warning("No se pudo activar el perfil: %s", e)
+            profiler = None
+            _PROFILE_LOCK.release()
+    elif enabled:
+        _logger.warning("Perfil omitido: otra ejecución se está perfilando")
+    try:
+        yield profiler
+    finally:
+        if profiler:
+            profiler.disable()
+            _PROFILE_LOCK.release()
+
+
+def dump_profile(profiler, limit=60):
+    """Devuelve ``(datos_pstats, resumen_texto)`` de un perfil terminado.
+
+    Los datos tienen el mismo formato que ``pstats.dump_stats`` y se pueden
+    abrir con ``python -m pstats``, snakeviz o similares.
+    """
+    profiler.create_stats()
+    data = marshal.dumps(profiler.stats)
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+    return data, stream.getvalue()
@@ -0,0 +1,631 @@
+import codecs
+import collections
+import contextlib
+import datetime
+import gzip
+import http.client
+import itertools
+import json
+import logging
+import re
+import time
+import urllib.parse
+import xmlrpc.client
+import zlib
+from xml.parsers import expat
+
+from odoo import _
+from odoo.exceptions import UserError
+
+from .circuit_breaker import CLOSED, SAFE_METHODS, backoff_delay, is_transient_error
+
+_logger = logging.getLogger(__name__)
+
+# Tamaño mínimo de petición a partir del cual se comprime con gzip
+GZIP_THRESHOLD = 1024
+# Bytes leídos de la red por iteración en las lecturas en streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class RpcStats:
+    """Acumula las llamadas RPC de una ejecución agrupadas por ``modelo.método``."""
+
+    def __init__(self):
+        self.calls = {}
+
+    def record(self, model, method, elapsed, bytes_sent=0, bytes_received=0, error=False):
+        entry = self.calls.setdefault(f'{model}.{method}', {
+            'count': 0,
+            'errors': 0,
+            'time': 0.0,
+            'max_time': 0.0,
+            'bytes_sent': 0,
+            'bytes_received': 0,
+        })
+        entry['count'] += 1
+        entry['errors'] += int(bool(error))
+        entry['time'] += elapsed
+        entry['max_time'] = max(entry['max_time'], elapsed)
+        entry['bytes_sent'] += bytes_sent
+        entry['bytes_received'] += bytes_received
+
+    def merge(self, other):
+        for key, values in other.calls.items():
+            entry = self.calls.setdefault(key, dict.fromkeys(values, 0))
+            for name, value in values.items():
+                entry[name] = max(entry[name], value) if name == 'max_time' else entry[name] + value
+        return self
+
+    @property
+    def totals(self):
+        calls = self.calls.values()
+        return {
+            'call_count': sum(c['count'] for c in calls),
+            'error_count': sum(c['errors'] for c in calls),
+            'time': sum(c['time'] for c in calls),
+            'bytes_sent': sum(c['bytes_sent'] for c in calls),
+            'bytes_received': sum(c['bytes_received'] for c in calls),
+        }
+
+    def as_dict(self):
+        return {'totals': self.totals, 'calls': self.calls}
+
+
+class _CountingResponse:
+    """Envuelve la respuesta HTTP para contar los bytes recibidos por la red."""
+
+    def __init__(self, response):
+        self._response = response
+        self.bytes_read = 0
+
+    def read(self, amt=None):
+        data = self._response.read(amt) if amt is not None else self._response.read()
+        self.bytes_read += len(data)
+        return data
+
+    def getheader(self, name, default=None):
+        return self._response.getheader(name, default)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class InstrumentedTransportMixin:
+    """Transporte XML-RPC con timeout que registra el tamaño de cada petición y respuesta.
+
+    Con ``gzip_threshold`` comprime las peticiones de mayor tamaño.
+    """
+
+    def __init__(self, timeout=None, gzip_threshold=None, **kwargs):
+        super().__init__(**kwargs)
+        self.timeout = timeout
+        self.gzip_threshold = gzip_threshold
+        self.last_bytes_sent = 0
+        self.last_bytes_received = 0
+
+    def make_connection(self, host):
+        conn = super().make_connection(host)
+        if self.timeout:
+            conn.timeout = self.timeout
+        return conn
+
+    def send_content(self, connection, request_body):
+        if self.gzip_threshold is not None and len(request_body) > self.gzip_threshold:
+            request_body = gzip.compress(request_body)
+            connection.putheader('Content-Encoding', 'gzip')
+        self.last_bytes_sent = len(request_body)
+        return super().send_content(connection, request_body)
+
+    def parse_response(self, response):
+        counting = _CountingResponse(response)
+        try:
+            return super().parse_response(counting)
+        finally:
+            self.last_bytes_received = counting.bytes_read
+
+
+class InstrumentedTransport(InstrumentedTransportMixin, xmlrpc.client.Transport):
+    pass
+
+
+class InstrumentedSafeTransport(InstrumentedTransportMixin, xmlrpc.client.SafeTransport):
+    pass
+
+
+def _iter_body(response, meter):
+    """Lee el cuerpo de la respuesta por bloques, descomprimiendo gzip al vuelo."""
+    decoder = None
+    if response.getheader('Content-Encoding', '') == 'gzip':
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    while True:
+        chunk = response.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        meter['received'] += len(chunk)
+        yield decoder.decompress(chunk) if decoder else chunk
+    if decoder:
+        yield decoder.flush()
+
+
+class _XmlRpcArrayReader:
+    """Handlers de expat que entregan uno a uno los elementos de una respuesta lista.
+
+    Cada elemento se arma con su propio ``Unmarshaller`` y se descarta en
+    cuanto se entrega, de modo que nunca se mantiene la respuesta completa.
+    """
+
+    def __init__(self):
+        self.items = collections.deque()
+        self._depth = 0
+        self._is_array = False
+        self._item = None
+        self._fault = None
+
+    @staticmethod
+    def _unmarshaller():
+        unmarshaller = xmlrpc.client.Unmarshaller(use_builtin_types=True)
+        unmarshaller.xml(None, None)  # expat ya entrega texto decodificado, como en ExpatParser
+        return unmarshaller
+
+    def start(self, tag, attrs):
+        if tag == 'fault':
+            self._fault = self._unmarshaller()
+        if self._fault is not None:
+            self._fault.start(tag, attrs)
+            return
+        if tag == 'value':
+            self._depth += 1
+            if self._depth == 2 and self._is_array:
+                self._item = self._unmarshaller()
+        elif self._depth == 1 and not self._is_array:
+            if tag != 'array':
+                raise xmlrpc.client.ResponseError('La respuesta no es una lista')
+            self._is_array = True
+        if self._item is not None:
+            self._item.start(tag, attrs)
+
+    def data(self, text):
+        target = self._fault if self._fault is not None else self._item
+        if target is not None:
+            target.data(text)
+
+    def end(self, tag):
+        if self._fault is not None:
+            self._fault.end(tag)
+            if tag == 'fault':
+                self._fault.close()  # eleva xmlrpc.client.Fault
+            return
+        if self._item is not None:
+            self._item.end(tag)
+        if tag == 'value':
+            if self._depth == 2 and self._item is not None:
+                self._item.end('params')
+                self.items.extend(self._item.close())
+                self._item = None
+            self._depth -= 1
+
+
+def _iter_xmlrpc_array(chunks):
+    reader = _XmlRpcArrayReader()
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = reader.start
+    parser.EndElementHandler = reader.end
+    parser.CharacterDataHandler = reader.data
+    for chunk in chunks:
+        parser.Parse(chunk, False)
+        while reader.items:
+            yield reader.items.popleft()
+    parser.Parse(b'', True)
+    while reader.items:
+        yield reader.items.popleft()
+
+
+_JSONRPC_RESULT = re.compile(r'"(result|error)"\s*:\s*')
+_JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def _iter_jsonrpc_array(chunks):
+    """Recorre el ``result`` lista de una respuesta JSON-RPC decodificando un elemento por vez."""
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    json_decoder = json.JSONDecoder()
+    buffer = ''
+    position = None
+    # Tras un elemento incompleto se espera a duplicar el buffer antes de
+    # reintentar, para no decodificar una y otra vez un registro grande
+    retry_size = 0
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        buffer += text_decoder.decode(chunk or b'', final)
+        if len(buffer) < retry_size and not final:
+            continue
+        if position is None:
+            match = _JSONRPC_RESULT.search(buffer)
+            if not match or match.end() >= len(buffer):
+                if final:
+                    raise xmlrpc.client.ResponseError('Respuesta JSON-RPC inválida')
+                continue
+            if match.group(1) == 'error':
+                if not final:
+                    continue
+                error = json.loads(buffer).get('error') or {}
+                details = error.get('data') or {}
+                raise xmlrpc.client.Fault(error.get('code', 1), details.get('message') or error.get('message'))
+            if buffer[match.end()] != '[':
+                raise xmlrpc.client.ResponseError('La respuesta no es una lista')
+            buffer = buffer[match.end() + 1:]
+            position = 0
+        while True:
+            position = _JSON_SEPARATORS.match(buffer, position).end()
+            if position >= len(buffer):
+                break
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = json_decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # elemento incompleto: se espera el siguiente bloque
+            yield item
+        buffer = buffer[position:]
+        position = 0
+        retry_size = 2 * len(buffer)
+    raise xmlrpc.client.ResponseError('Respuesta JSON-RPC incompleta')
+
+
+class XmlRpcConnection:
+    """Llamadas por ``/xmlrpc/2/<servicio>`` con un proxy por servicio."""
+
+    def __init__(self, url, timeout=None, gzip_requests=False):
+        self.url = url
+        self.timeout = timeout
+        self.gzip_requests = gzip_requests
+        self._proxies = {}
+
+    def _get_proxy(self, service):
+        entry = self._proxies.get(service)
+        if entry is None:
+            transport_class = InstrumentedSafeTransport if self.url.startswith('https') else InstrumentedTransport
+            transport = transport_class(timeout=self.timeout,
+                                        gzip_threshold=GZIP_THRESHOLD if self.gzip_requests else None)
+            proxy = xmlrpc.client.ServerProxy(
+                f'{self.url}/xmlrpc/2/{service}',
+                transport=transport,
+                allow_none=True,
+            )
+            entry = self._proxies[service] = (proxy, transport)
+        return entry
+
+    def call(self, service, method, params):
+        """Ejecuta la llamada y devuelve ``(resultado, bytes_enviados, bytes_recibidos)``."""
+        proxy, transport = self._get_proxy(service)
+        transport.last_bytes_sent = transport.last_bytes_received = 0
+        try:
+            return getattr(proxy, method)(*params), transport.last_bytes_sent, transport.last_bytes_received
+        except Exception as e:
+            e.rpc_bytes = (transport.last_bytes_sent, transport.last_bytes_received)
+            raise
+
+    def iter_call(self, service, method, params, meter):
+        """Ejecuta una llamada que devuelve una lista y entrega sus elementos a
+        medida que se parsean. Los bytes transferidos se acumulan en ``meter``."""
+        _proxy, transport = self._get_proxy(service)
+        parts = urllib.parse.urlsplit(f'{self.url}/xmlrpc/2/{service}')
+        body = xmlrpc.client.dumps(tuple(params), method, allow_none=True).encode('utf-8', 'xmlcharrefreplace')
+        complete = False
+        try:
+            try:
+                response = transport.send_request(parts.netloc, parts.path, body, False).getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Igual que xmlrpc.client: la conexión persistente expiró, se reintenta una vez
+                transport.close()
+                response = transport.send_request(parts.netloc, parts.path, body, False).getresponse()
+            meter['sent'] += transport.last_bytes_sent
+            if response.status != 200:
+                meter['received'] += len(response.read())
+                raise xmlrpc.client.ProtocolError(parts.netloc + parts.path, response.status, response.reason,
+                                                  response.msg)
+            yield from _iter_xmlrpc_array(_iter_body(response, meter))
+            complete = response.isclosed() or not response.read()
+        finally:
+            if not complete:
+                # Respuesta sin consumir o error: la conexión no se puede reutilizar
+                transport.close()
+
+
+def _json_default(value):
+    if isinstance(value, bytes):
+        return value.decode('ascii')
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} no es serializable a JSON')
+
+
+class JsonRpcConnection:
+    """Llamadas por el endpoint ``/jsonrpc`` de Odoo sobre una conexión HTTP persistente.
+
+    Acepta respuestas gzip y, con ``gzip_requests``, comprime las peticiones
+    grandes (el servidor o el proxy deben aceptar ``Content-Encoding: gzip``).
+    Los errores se elevan como ``xmlrpc.client.Fault`` / ``ProtocolError`` para
+    que el código que llama no dependa del protocolo.
+    """
+
+    def __init__(self, url, timeout=None, gzip_requests=False):
+        self.url = url
+        self.timeout = timeout
+        self.gzip_requests = gzip_requests
+        parts = urllib.parse.urlsplit(url)
+        self._https = parts.scheme == 'https'
+        self._host = parts.netloc
+        self._path = (parts.path or '') + '/jsonrpc'
+        self._connection = None
+        self._ids = itertools.count(1)
+
+    def _get_connection(self):
+        if self._connection is None:
+            connection_class = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            self._connection = connection_class(self._host, timeout=self.timeout)
+        return self._connection
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _prepare_request(self, service, method, params):
+        body = json.dumps({
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {'service': service, 'method': method, 'args': list(params)},
+            'id': next(self._ids),
+        }, default=_json_default).encode()
+        headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'}
+        if self.gzip_requests and len(body) > GZIP_THRESHOLD:
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        return body, headers
+
+    def _post(self, body, headers):
+        connection = self._get_connection()
+        try:
+            connection.request('POST', self._path, body, headers)
+            return connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # La conexión persistente expiró en el servidor: se reintenta una vez
+            self._close()
+            connection = self._get_connection()
+            connection.request('POST', self._path, body, headers)
+            return connection.getresponse()
+
+    def _protocol_error(self, response):
+        return xmlrpc.client.ProtocolError(self.url + self._path, response.status, response.reason,
+                                           dict(response.getheaders()))
+
+    def call(self, service, method, params):
+        """Ejecuta la llamada y devuelve ``(resultado, bytes_enviados, bytes_recibidos)``."""
+        body, headers = self._prepare_request(service, method, params)
+        bytes_received = 0
+        try:
+            response = self._post(body, headers)
+            data = response.read()
+            bytes_received = len(data)
+            if response.status != 200:
+                raise self._protocol_error(response)
+            if response.getheader('Content-Encoding', '') == 'gzip':
+                data = gzip.decompress(data)
+            reply = json.loads(data)
+            error = reply.get('error')
+            if error:
+                details = error.get('data') or {}
+                raise xmlrpc.client.Fault(error.get('code', 1), details.get('message') or error.get('message'))
+            return reply.get('result'), len(body), bytes_received
+        except Exception as e:
+            if not isinstance(e, xmlrpc.client.Fault):
+                self._close()
+            e.rpc_bytes = (len(body), bytes_received)
+            raise
+
+    def iter_call(self, service, method, params, meter):
+        """Ejecuta una llamada que devuelve una lista y entrega sus elementos a
+        medida que se decodifican. Los bytes transferidos se acumulan en ``meter``."""
+        body, headers = self._prepare_request(service, method, params)
+        meter['sent'] += len(body)
+        complete = False
+        try:
+            response = self._post(body, headers)
+            if response.status != 200:
+                meter['received'] += len(response.read())
+                raise self._protocol_error(response)
+            yield from _iter_jsonrpc_array(_iter_body(response, meter))
+            complete = response.isclosed() or not response.read()
+        except xmlrpc.client.Fault:
+            complete = True
+            raise
+        finally:
+            if not complete:
+                self._close()
+
+
+RPC_CONNECTIONS = {
+    'xmlrpc': XmlRpcConnection,
+    'jsonrpc': JsonRpcConnection,
+}
+
+
+class RemoteClient:
+    """Conexión autenticada a una instancia Odoo remota.
+
+    El protocolo (XML-RPC o JSON-RPC, ver ``RPC_CONNECTIONS``) es transparente
+    para quien llama. Todas las llamadas pasan por ``_call``, que mide la
+    latencia, los bytes enviados y recibidos y los errores, y los acumula en
+    ``stats`` (y en las mediciones abiertas con ``track``). Las llamadas que
+    superan ``slow_threshold`` segundos se registran en el log.
+
+    Con un ``breaker`` (ver ``circuit_breaker.CircuitBreaker``) las llamadas
+    fallan de inmediato mientras el remoto está caído, y los métodos de
+    lectura se reintentan hasta ``max_retries`` veces ante errores de red.
+    """
+
+    def __init__(self, url, database, username, password, timeout=None, slow_threshold=None, label=None,
+                 protocol='xmlrpc', gzip_requests=False, breaker=None, max_retries=0):
+        url = (url or '').strip().rstrip('/')
+        if not url.startswith('http'):
+            url = 'https://' + url
+        self.url = url
+        self.database = database
+        self.username = username
+        self.password = password
+        self.timeout = timeout or None
+        self.slow_threshold = slow_threshold
+        self.label = label or url
+        self.uid = None
+        self.stats = RpcStats()
+        self._trackers = []
+        self.protocol = protocol
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self._connection = RPC_CONNECTIONS[protocol](url, timeout=self.timeout, gzip_requests=gzip_requests)
+
+    # ------------------------------------------------------------------
+    # Transporte
+    # ------------------------------------------------------------------
+    def _send(self, service, method, params):
+        """Ejecuta la llamada y devuelve ``(resultado, bytes_enviados, bytes_recibidos)``."""
+        return self._connection.call(service, method, params)
+
+    # ------------------------------------------------------------------
+    # Instrumentación
+    # ------------------------------------------------------------------
+    @contextlib.contextmanager
+    def track(self):
+        """Abre una medición parcial (por ejemplo un pedido o una marca)."""
+        stats = RpcStats()
+        self._trackers.append(stats)
+        try:
+            yield stats
+        finally:
+            self._trackers.remove(stats)
+
+    def _record(self, model, method, elapsed, bytes_sent, bytes_received, error):
+        for stats in [self.stats] + self._trackers:
+            stats.record(model, method, elapsed, bytes_sent, bytes_received, error)
+        if self.slow_threshold and elapsed >= self.slow_threshold:
+            _logger.warning(
+                "Llamada RPC lenta [%s] %s.%s: %.2fs (enviado %s bytes, recibido %s bytes)",
+                self.label, model, method, elapsed, bytes_sent, bytes_received,
+            )
+
+    def _call(self, service, method, params, model, label):
+        attempt = 0
+        while True:
+            if self.breaker:
+                self.breaker.before_call(self.label)
+            try:
+                result = self._call_once(service, method, params, model, label)
+            except Exception as e:
+                transient = is_transient_error(e)
+                if self.breaker:
+                    # Un Fault es un error de negocio: el remoto responde
+                    (self.breaker.record_failure if transient else self.breaker.record_success)()
+                if not transient or label not in SAFE_METHODS or attempt >= self.max_retries:
+                    raise
+                if self.breaker and self.breaker.state != CLOSED:
+                    raise  # el circuito se acaba de abrir: no tiene sentido reintentar
+                delay = backoff_delay(attempt)
+                _logger.info("Reintentando %s.%s en %.2fs tras error: %s", model, label, delay, e)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if self.breaker:
+                self.breaker.record_success()
+            return result
+
+    def _call_once(self, service, method, params, model, label):
+        start = time.perf_counter()
+        bytes_sent = bytes_received = 0
+        error = False
+        try:
+            result, bytes_sent, bytes_received = self._send(service, method, params)
+            return result
+        except Exception as e:
+            error = True
+            bytes_sent, bytes_received = getattr(e, 'rpc_bytes', (0, 0))
+            raise
+        finally:
+            self._record(model, label, time.perf_counter() - start, bytes_sent, bytes_received, error)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+    def authenticate(self):
+        self.uid = self._call(
+            'common', 'authenticate',
+            (self.database, self.username, self.password, {}),
+            'common', 'authenticate',
+        )
+        return self.uid
+
+    def execute_kw(self, model, method, args, kwargs=None):
+        if self.uid is None and not self.authenticate():
+            raise UserError(_('Autenticación fallida contra la base remota. Verifique URL, Base de Datos, Usuario y Contraseña.'))
+        params = [self.database, self.uid, self.password, model, method, args]
+        if kwargs:
+            params.append(kwargs)
+        return self._call('object', 'execute_kw', params, model, method)
+
+    def iter_execute_kw(self, model, method, args, kwargs=None):
+        """Como ``execute_kw`` para métodos que devuelven una lista, pero entrega
+        cada elemento en cuanto se recibe en lugar de cargar la respuesta entera.
+
+        El tiempo registrado es solo el de red y parseo, sin el que se pasa
+        procesando cada elemento. Si se deja de iterar antes del final se
+        descarta la conexión.
+        """
+        if self.uid is None and not self.authenticate():
+            raise UserError(_('Autenticación fallida contra la base remota. Verifique URL, Base de Datos, Usuario y Contraseña.'))
+        params = [self.database, self.uid, self.password, model, method, args]
+        if kwargs:
+            params.append(kwargs)
+        if self.breaker:
+            self.breaker.before_call(self.label)
+        meter = {'sent': 0, 'received': 0}
+        items = self._connection.iter_call('object', 'execute_kw', params, meter)
+        elapsed = 0.0
+        error = False
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        except Exception as e:
+            error = True
+            if self.breaker:
+                (self.breaker.record_failure if is_transient_error(e) else self.breaker.record_success)()
+            raise
+        finally:
+            items.close()
+            self._record(model, method, elapsed, meter['sent'], meter['received'], error)
+            if self.breaker and not error:
+                # También al cortar la iteración: el remoto respondió
+                self.breaker.record_success()
+
+    def iter_search_read(self, model, domain, fields, offset=0, limit=None, order=None):
+        """``search_read`` en streaming: peak de memoria de un registro, no de una página."""
+        kwargs = {'fields': fields, 'offset': offset}
+        if limit:
+            kwargs['limit'] = limit
+        if order:
+            kwargs['order'] = order
+        return self.iter_execute_kw(model, 'search_read', [domain], kwargs)
+
+    def iter_read(self, model, ids, fields):
+        """``read`` en streaming de los ``ids`` indicados."""
+        if not ids:
+            return iter(())
+        return self.iter_execute_kw(model, 'read', [list(ids)], {'fields': fields})
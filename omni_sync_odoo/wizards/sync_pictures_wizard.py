@@ -1,18 +1,8 @@
-import xmlrpc.client
 import time
 from odoo import models, fields, api
 from odoo.exceptions import UserError
 
-class TimeoutTransport(xmlrpc.client.Transport):
-    def __init__(self, timeout=None):
-        super().__init__()
-        self.timeout = timeout
-
-    def make_connection(self, host):
-        conn = super().make_connection(host)
-        if self.timeout:
-            conn.timeout = self.timeout
-        return conn
+from ..tools.profiling import profiled
 
 class SyncPicturesWizard(models.TransientModel):
     _name = 'sync.pictures.wizard'
@@ -35,112 +25,177 @@ class SyncPicturesWizard(models.TransientModel):
         
         start_time = time.time()
         try:
-            if self.sync_all_brands:
-                marcas = [m.strip() for m in (self.config_id.brands_to_sync or '').split(',') if m.strip()]
-            else:
-                marcas = [self.brand_to_sync.strip()] if self.brand_to_sync else []
-            
-            if not marcas:
-                marcas = ['TOTAL']
-
-            timeout_transport = TimeoutTransport(timeout=self.config_id.timeout)
-            
             # Conexión Remota (Origen de las imágenes)
-            common_remote = xmlrpc.client.ServerProxy(f'{self.config_id.remote_url}/xmlrpc/2/common')
-            uid_remote = common_remote.authenticate(self.config_id.remote_database, self.config_id.remote_username, self.config_id.remote_password, {})
+            client = self.config_id._get_rpc_client()
             
-            if not uid_remote:
+            if not client.authenticate():
                 raise UserError('No se pudo autenticar con el servidor remoto')
             
-            models_remote = xmlrpc.client.ServerProxy(f'{self.config_id.remote_url}/xmlrpc/2/object', transport=timeout_transport)
-            
-            for marca in marcas:
-                self._procesar_marca(marca, models_remote, uid_remote)
+            self._run_image_sync(client)
             
             duration = time.time() - start_time
+            totals = client.stats.totals
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
                 'params': {
                     'title': 'Éxito',
-                    'message': f'Sincronización completada en {duration:.2f} segundos',
+                    'message': f'Sincronización completada en {duration:.2f} segundos '
+                               f'({totals["call_count"]} llamadas RPC, {totals["bytes_received"] / 1048576:.1f} MB recibidos)',
                     'type': 'success',
                 }
             }
         except Exception as e:
             raise UserError(f'Error durante la sincronización: {str(e)}')
 
-    def _procesar_marca(self, marca, models_remote, uid_remote):
+    def _get_brands(self):
+        if self.sync_all_brands:
+            marcas = [m.strip() for m in (self.config_id.brands_to_sync or '').split(',') if m.strip()]
+        else:
+            marcas = [self.brand_to_sync.strip()] if self.brand_to_sync else []
+        return marcas or ['TOTAL']
+
+    def _run_image_sync(self, client, deadline=None, resume=None):
+        """Procesa todas las marcas, retomando desde ``resume`` si se indica.
+
+        Si se alcanza ``deadline`` (timestamp) devuelve el punto de continuación
+        ``{'brand', 'brand_index', 'offset'}``; si termina devuelve ``None``.
+        """
+        marcas = self._get_brands()
+        start_index, start_offset = 0, 0
+        if resume and resume.get('brand') in marcas:
+            start_index = marcas.index(resume['brand'])
+            start_offset = resume.get('offset', 0)
+
+        profile = self.config_id._consume_profile_flag()
+        for index in range(start_index, len(marcas)):
+            marca = marcas[index]
+            offset = start_offset if index == start_index else 0
+            with client.track() as rpc_stats, profiled(profile) as profiler:
+                log, next_offset = self._procesar_marca(marca, client, rpc_stats, offset=offset, deadline=deadline)
+            if profiler:
+                log._attach_profile(profiler)
+            if next_offset is not None:
+                return {'brand': marca, 'brand_index': index, 'offset': next_offset}
+        return None
+
+    def _procesar_marca(self, marca, client, rpc_stats, offset=0, deadline=None, domain=None):
+        """Sincroniza las imágenes de una marca por lotes de ``batch_size`` productos.
+
+        Devuelve ``(log, next_offset)``; ``next_offset`` es ``None`` salvo que se haya
+        agotado el tiempo disponible antes de terminar la marca. ``domain``
+        acota los productos remotos de la marca (un tramo o una lista de ids).
+        """
+        start_time = time.time()
         log = self.env['sync.pictures.log'].create({
             'config_id': self.config_id.id,
+            'sync_type': 'images',
             'brand': marca,
             'status': 'in_progress',
             'execution_type': self.execution_type,
         })
         
+        batch_size = self.config_id._get_batch_size(50)
+        next_offset = None
         line_vals = []
         try:
             # Buscar productos en remoto
-            domain = [] if marca == 'TOTAL' else [('product_brand_id.name', '=', marca)]
+            domain = ([] if marca == 'TOTAL' else [('product_brand_id.name', '=', marca)]) + (domain or [])
             
-            productos_remotos = models_remote.execute_kw(
-                self.config_id.remote_database, uid_remote, self.config_id.remote_password,
-                'product.product', 'search_read', [domain],
-                {'fields': ['id', 'default_code', 'image_1920', 'name']}
-            )
-            
-            log.write({'total_products': len(productos_remotos)})
+            total_products = client.execute_kw('product.product', 'search_count', [domain])
+            log.write({'total_products': total_products})
             
             synced_count = 0
             skipped_count = 0
             
-            for prod_remoto in productos_remotos:
-                ref = prod_remoto.get('default_code')
-                name = prod_remoto.get('name')
-                
-                line_val = {
-                    'product_name': name,
-                    'product_code': ref,
-                }
-                
-                if not ref:
-                    skipped_count += 1
-                    line_val.update({'status': 'skipped', 'comment': 'Sin código de referencia'})
+            while True:
+                # Primero solo referencias y nombres; las imágenes se descargan después,
+                # únicamente para los productos locales que todavía no tienen una
+                productos_remotos = client.execute_kw(
+                    'product.product', 'search_read', [domain],
+                    {
+                        'fields': ['id', 'default_code', 'name'],
+                        'limit': batch_size,
+                        'offset': offset,
+                        'order': 'id',
+                    }
+                )
+                if not productos_remotos:
+                    break
+
+                # Una sola búsqueda local por lote en lugar de una por producto.
+                # Con bin_size no se cargan las imágenes locales solo para saber si existen.
+                codes = [p['default_code'] for p in productos_remotos if p.get('default_code')]
+                local_by_code = {}
+                for product in self.env['product.product'].with_context(bin_size=True).search([('default_code', 'in', codes)]):
+                    local_by_code.setdefault(product.default_code, product)
+
+                pendientes = {}
+                for prod_remoto in productos_remotos:
+                    ref = prod_remoto.get('default_code')
+                    name = prod_remoto.get('name')
+                    
+                    line_val = {
+                        'product_name': name,
+                        'product_code': ref,
+                    }
+                    
+                    if not ref:
+                        skipped_count += 1
+                        line_val.update({'status': 'skipped', 'comment': 'Sin código de referencia'})
+                        line_vals.append((0, 0, line_val))
+                        continue
+                    
+                    prod_local = local_by_code.get(ref)
+                    
+                    if not prod_local:
+                        skipped_count += 1
+                        line_val.update({'status': 'skipped', 'comment': 'No existe en base local'})
+                        line_vals.append((0, 0, line_val))
+                    elif prod_local.image_1920:
+                        skipped_count += 1
+                        line_val.update({'status': 'skipped', 'comment': 'Ya tiene imagen cargada'})
+                        line_vals.append((0, 0, line_val))
+                    else:
+                        pendientes[prod_remoto['id']] = (prod_local, line_val)
+
+                # Las imágenes se leen en streaming: en memoria solo hay una a la vez
+                for imagen in client.iter_read('product.product', list(pendientes), ['image_1920']):
+                    prod_local, line_val = pendientes.pop(imagen['id'])
+                    if imagen.get('image_1920'):
+                        prod_local.with_context(bin_size=False).write({'image_1920': imagen['image_1920']})
+                        synced_count += 1
+                        line_val.update({'status': 'synced', 'comment': 'Sincronizado correctamente'})
+                    else:
+                        skipped_count += 1
+                        line_val.update({'status': 'skipped', 'comment': 'Sin imagen en origen'})
                     line_vals.append((0, 0, line_val))
-                    continue
-                
-                if not prod_remoto.get('image_1920'):
+                # Productos borrados en el remoto entre ambas lecturas
+                for prod_local, line_val in pendientes.values():
                     skipped_count += 1
                     line_val.update({'status': 'skipped', 'comment': 'Sin imagen en origen'})
                     line_vals.append((0, 0, line_val))
-                    continue
-                
-                prod_local = self.env['product.product'].search([('default_code', '=', ref)], limit=1)
-                
-                if not prod_local:
-                    skipped_count += 1
-                    line_val.update({'status': 'skipped', 'comment': 'No existe en base local'})
-                    line_vals.append((0, 0, line_val))
-                    continue
-                    
-                if prod_local.image_1920:
-                    skipped_count += 1
-                    line_val.update({'status': 'skipped', 'comment': 'Ya tiene imagen cargada'})
-                    line_vals.append((0, 0, line_val))
-                else:
-                    prod_local.write({'image_1920': prod_remoto['image_1920']})
-                    synced_count += 1
-                    line_val.update({'status': 'synced', 'comment': 'Sincronizado correctamente'})
-                    line_vals.append((0, 0, line_val))
+
+                offset += len(productos_remotos)
+                if len(productos_remotos) < batch_size:
+                    break
+                if deadline and time.time() >= deadline:
+                    next_offset = offset
+                    break
             
             log.write({
-                'status': 'completed',
+                'status': 'partial' if next_offset is not None else 'completed',
                 'products_synced': synced_count,
                 'products_skipped': skipped_count,
-                'line_ids': line_vals
+                'line_ids': line_vals,
+                'duration': time.time() - start_time,
+                **log._rpc_stats_values(rpc_stats),
             })
         except Exception as e:
             log.write({
                 'status': 'failed', 
                 'error_message': str(e),
+                'duration': time.time() - start_time,
+                **log._rpc_stats_values(rpc_stats),
             })
+        return log, next_offset